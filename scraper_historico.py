@@ -6,17 +6,34 @@ import certifi
 ssl._create_default_https_context = lambda: ssl.create_default_context(cafile=certifi.where())
 
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from bs4 import BeautifulSoup, FeatureNotFound, SoupStrainer
+try:
+    import lxml.html as lxml_html
+except ImportError:  # sin lxml los scrapers JSON-LD construyen el árbol con crear_soup
+    lxml_html = None
 import json
 import time
 import hashlib
+import io
+import gzip
+import shutil
+import socket
+import tempfile
+from contextlib import closing
+from functools import lru_cache
 from urllib.parse import urljoin, urlparse
 import xml.etree.ElementTree as ET
 import urllib.robotparser
 import re
 from datetime import datetime, timedelta
 import os
-from typing import Dict, Set, List, Tuple, Optional
+import threading
+import sqlite3
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, Set, List, Tuple, Optional, Union
 
 # CONFIGURACIÓN GLOBAL
 PRODUCCION = True  # Cambiar a True para scrapear sin límites
@@ -28,30 +45,140 @@ os.makedirs(DATA_DIR, exist_ok=True)
 
 ARCHIVO_PROPIEDADES = os.getenv('ARCHIVO_PROPIEDADES', os.path.join(DATA_DIR, 'propiedades_menorca_estandarizado.json'))
 ARCHIVO_REGISTRO    = os.getenv('ARCHIVO_REGISTRO',    os.path.join(DATA_DIR, 'registro_scraping.json'))
-ARCHIVO_TEMP        = os.getenv('ARCHIVO_TEMP',        os.path.join(DATA_DIR, 'propiedades_temp.json'))
+ARCHIVO_TEMP        = os.getenv('ARCHIVO_TEMP',        os.path.join(DATA_DIR, 'propiedades_temp.jsonl'))  # diario de progreso
+
+# CONCURRENCIA
+MAX_HILOS_DETALLE = int(os.getenv('MAX_HILOS_DETALLE', '4'))                      # descargas simultáneas por inmobiliaria
+MAX_INMOBILIARIAS_PARALELAS = int(os.getenv('MAX_INMOBILIARIAS_PARALELAS', '6'))  # inmobiliarias procesadas a la vez
+
+# LÍMITE DE PETICIONES POR HOST (token bucket)
+TASA_POR_HOST = float(os.getenv('TASA_POR_HOST', '1.0'))    # peticiones por segundo sostenidas
+RAFAGA_POR_HOST = int(os.getenv('RAFAGA_POR_HOST', '2'))    # peticiones seguidas sin esperar
+MAX_FACTOR_BACKOFF = 16.0                                   # máxima ralentización tras 429/503
+LIMITES_POR_HOST = {
+    # 'www.portalmenorca.com': (2.0, 4),   # host: (tasa, ráfaga) para inmobiliarias que aguanten más
+}
+
+# CLIENTE HTTP
+TIMEOUT_CONEXION = float(os.getenv('TIMEOUT_CONEXION', '10'))
+TIMEOUT_LECTURA = float(os.getenv('TIMEOUT_LECTURA', '30'))
+REINTENTOS_HTTP = int(os.getenv('REINTENTOS_HTTP', '3'))    # errores de red y 500/502/504
+BACKOFF_HTTP = float(os.getenv('BACKOFF_HTTP', '1.0'))      # espera base entre reintentos (exponencial)
+
+# PARSER HTML
+PARSER_HTML = os.getenv('PARSER_HTML', 'lxml')   # 'lxml' (en C, por defecto), 'html.parser' o 'html5lib'
+
+# GET CONDICIONAL (ETag / Last-Modified)
+CACHE_HTTP = os.getenv('CACHE_HTTP', '1') == '1'
+DIR_CACHE_HTTP = os.getenv('DIR_CACHE_HTTP', '.cache_http')  # fuera de DATA_DIR: ni se commitea ni se publica
+ARCHIVO_VALIDADORES = os.getenv('ARCHIVO_VALIDADORES', os.path.join(DIR_CACHE_HTTP, 'validadores.json'))
+DIR_CUERPOS_HTTP = os.getenv('DIR_CUERPOS_HTTP', os.path.join(DIR_CACHE_HTTP, 'cuerpos'))  # cuerpos de sitemaps
+
+# ROBOTS.TXT
+ROBOTS_TTL = float(os.getenv('ROBOTS_TTL_HORAS', '24')) * 3600      # validez de un robots.txt descargado
+ROBOTS_TTL_ERROR = 300                                              # reintentar pronto si el host falló
+ARCHIVO_ROBOTS = os.getenv('ARCHIVO_ROBOTS', os.path.join(DIR_CACHE_HTTP, 'robots_cache.json'))
+ROBOTS_EN_DISCO = os.getenv('ROBOTS_EN_DISCO', '0') == '1'          # persistir la caché entre ejecuciones
+
+# ALMACENAMIENTO
+MOTOR_ALMACENAMIENTO = os.getenv('MOTOR_ALMACENAMIENTO', 'json')    # 'json' (archivos) o 'sqlite'
+ARCHIVO_BD = os.getenv('ARCHIVO_BD', 'scraper.sqlite3')  # fuera de DATA_DIR (con sus -wal/-shm): no se publica
+
+# ESCANEO COMPLETO
+MAX_DIAS_SIN_VERIFICAR = float(os.getenv('MAX_DIAS_SIN_VERIFICAR', '7'))  # con lastmod sin cambios, re-verificar igualmente tras N días
+
+
+# INMOBILIARIAS EN PROCESOS SEPARADOS
+PROCESOS_INMOBILIARIAS = int(os.getenv('PROCESOS_INMOBILIARIAS', '1'))  # >1: cada inmobiliaria en su proceso
+DIR_PARTICIONES = os.getenv('DIR_PARTICIONES', '')  # foto común + diario por proceso; vacío = temporal (fuera de DATA_DIR)
+
+
+# COLA DE TRABAJO COMPARTIDA (varias máquinas)
+COLA_TRABAJO = os.getenv('COLA_TRABAJO', '')                 # ruta de la cola SQLite; vacío = todo en este proceso
+ROL_COLA = os.getenv('ROL_COLA', 'coordinador')              # 'coordinador' (ejecuta main) o 'trabajador' (solo descarga)
+LEASE_COLA = float(os.getenv('LEASE_COLA', '300'))            # segundos que una tarea tomada queda reservada
+REINTENTOS_COLA = int(os.getenv('REINTENTOS_COLA', '3'))      # intentos antes de dar una tarea por fallida
+VIGENCIA_RESULTADOS = float(os.getenv('VIGENCIA_RESULTADOS', '21600'))  # un resultado sin fusionar se reutiliza hasta N s
+INACTIVIDAD_MAX_TRABAJADOR = float(os.getenv('INACTIVIDAD_MAX_TRABAJADOR', '600'))  # el trabajador sale tras N s sin tareas
+
+
+# LISTADOS PAGINADOS
+MAX_PAGINAS_PARALELAS = int(os.getenv('MAX_PAGINAS_PARALELAS', '4'))  # páginas de un listado pedidas a la vez
+
+
+# PIPELINE DESCARGA / PARSEO
+PROCESOS_PARSEO = int(os.getenv('PROCESOS_PARSEO', '1'))  # 1 = parsear en el hilo de descarga; >1 = pool de procesos
+COLA_PARSEO = int(os.getenv('COLA_PARSEO', '0')) or PROCESOS_PARSEO * 2  # páginas descargadas en espera
+
 
+# NORMALIZACIÓN DE UBICACIONES
+MAX_CACHE_UBICACIONES = int(os.getenv('MAX_CACHE_UBICACIONES', '4096'))  # textos de ubicación distintos recordados
 
-# Diccionario global para almacenar estados desde el listado
-_estados_fincasseminari = {}
-_estados_inmocampsbosch = {}
+
+# Diccionario global para almacenar estados desde el listado (Fincas Seminari, Camps Bosch): {url_detalle: estado}.
+# Los procesos de parseo no lo comparten: el estado de cada URL se les pasa junto con la página
+_estados_listado = {}
+
+# <lastmod> de cada URL vista en los sitemaps durante esta ejecución: {url_detalle: lastmod}
+_lastmod_sitemap = {}
 
 
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115 Safari/537.36"
 }
 
+class BuscadorClaves:
+    """Busca un conjunto fijo de palabras clave en un texto (ya en mayúsculas).
+
+    Es el motor común de detectar_flags, detectar_tipo y los bucles de palabras clave
+    de los scrapers. Conserva el orden de definición como prioridad. Todas las claves van
+    en una sola regex compilada y el texto se recorre una vez: la alternancia va dentro de
+    un lookahead para que también salgan las claves que se solapan, y en cada posición gana
+    la más larga, que ya implica las que contiene (CASA en CASA CAMPO).
+    """
+
+    def __init__(self, claves):
+        self.claves = list(dict.fromkeys(claves))
+        self._contenidas = {c: {o for o in self.claves if o in c} for c in self.claves}
+        alternativas = '|'.join(re.escape(c) for c in sorted(self.claves, key=len, reverse=True) if c)
+        self._patron = re.compile(f'(?=({alternativas}))') if alternativas else None
+
+    def encontrar(self, texto):
+        """Conjunto de claves presentes en el texto"""
+        encontradas = set()
+        if not texto or self._patron is None:
+            return encontradas
+        for m in self._patron.finditer(texto):
+            clave = m.group(1)
+            if clave not in encontradas:
+                encontradas |= self._contenidas[clave]
+        return encontradas
+
+    def contiene(self, texto):
+        """True si aparece alguna de las claves"""
+        return bool(texto) and self._patron is not None and self._patron.search(texto) is not None
+
+    def primera(self, texto):
+        """Primera clave presente según el orden en que se definieron (prioridad)"""
+        encontradas = self.encontrar(texto)
+        return next((clave for clave in self.claves if clave in encontradas), None)
+
+
+FLAGS_CLAVES = {
+    'piscina': ['PISCINA', 'POOL'],
+    'garaje': ['GARAJE', 'PARKING', 'COCHERA'],
+    'ascensor': ['ASCENSOR'],
+    'vistas_mar': ['VISTAS AL MAR', 'VISTA AL MAR', 'FRENTE AL MAR', 'PRIMERA LINEA', 'SEA VIEWS'],
+    'alquiler': ['ALQUILER'],
+}
+_buscador_flags = BuscadorClaves([c for claves in FLAGS_CLAVES.values() for c in claves])
+
 def detectar_flags(texto):
-    """Detecta flags especiales en el texto"""
+    """Detecta flags especiales en el texto (str o TextoPagina, que ya guarda su versión en mayúsculas)"""
     if not texto:
         return dict(piscina=False, garaje=False, ascensor=False, vistas_mar=False, alquiler=False)
-    t = texto.upper()
-    return {
-        'piscina': 'PISCINA' in t or 'POOL' in t,
-        'garaje': 'GARAJE' in t or 'PARKING' in t or 'COCHERA' in t,
-        'ascensor': 'ASCENSOR' in t,
-        'vistas_mar': any(term in t for term in ['VISTAS AL MAR', 'VISTA AL MAR', 'FRENTE AL MAR', 'PRIMERA LINEA', 'SEA VIEWS']),
-        'alquiler': 'ALQUILER' in t
-    }
+    encontradas = _buscador_flags.encontrar(texto.mayusculas() if isinstance(texto, TextoPagina) else texto.upper())
+    return {flag: any(c in encontradas for c in claves) for flag, claves in FLAGS_CLAVES.items()}
 
 TIPOS_MAP = {
     'CHALET': 'Chalet',
@@ -88,154 +215,943 @@ TIPOS_MAP = {
     'HOTEL': 'Edificio',
     'EDIFICIO': 'Edificio'
 }
+_buscador_tipos = BuscadorClaves(TIPOS_MAP)
 
 def detectar_tipo(texto):
     """Detecta tipo de propiedad en base al título u otro texto"""
     if not texto:
         return None
-    upper = texto.upper()
-    for key, value in TIPOS_MAP.items():
-        if key in upper:
-            return value
-    return None
+    key = _buscador_tipos.primera(texto.upper())
+    return TIPOS_MAP[key] if key else None
+
+MAPEO_LOCALIDADES = {
+    'ciutadella de menorca': 'Ciutadella',
+    'ciutadella': 'Ciutadella',
+    'ciudadela': 'Ciutadella',
+    'mahon': 'Maó',
+    'mahón': 'Maó',
+    'mao': 'Maó',
+    'camí de maó': 'Ciutadella',
+    'Maó/Mahón': 'Maó',
+    'llumesanes': 'Maó; Llumesanes',
+    'san clemente': 'Maó; Sant Climent',
+    'san antonio': 'Maó; Port',
+    'mahon puerto': 'Maó; Port',
+    'cala llonga': 'Maó; Cala Llonga',
+    'jardíns de malbuger': 'Maó',
+    'es grau': 'Maó; Es grau',
+    'ferrerias': 'Ferreries',
+    'alayor': 'Alaior',
+    'camí d\'en kane': 'Alaior',
+    'son vilar': 'Maó',
+    'son vilar con licencia turística': 'Maó',
+    'son parc': 'Es Mercadal; Son Parc',
+    'biniparratx': 'Sant Lluís',
+    'san luis': 'Sant Lluís',
+    'addaya': 'Es Mercadal; Addaia',
+    'coves noves': 'Es Mercadal; Coves noves',
+    'arenal': 'Es Mercadal; Arenal',
+    'arenal d’en castell': 'Es Mercadal; Arenal',
+    'biniancolla': 'Maó; Biniancolla',
+    'binisafua': 'Sant Lluís',
+    'suestra': 'Sant Lluís',
+    'son ganxo | son remei': 'Sant Lluís',
+    'torret': 'Sant Lluís',
+    'alcaufar': 'Sant Lluís',
+    'cap den font': 'Sant Lluís',
+    'salgar': 'Sant Lluís; Salgar',
+    'binibeca': 'Sant Lluís; Binibeca',
+    'binibeca vell': 'Sant Lluís; Binibeca',
+    'l\'argentina': 'Alaior',
+    'cala morell': 'Ciutadella; Cala Morell',
+    'los delfines': 'Ciutadella; Cala\'n Blanes',
+    'dalt es penyals': 'Ciutadella',
+    'sa caleta': 'Ciutadella; Sa caleta',
+    'cala\'n bosch': 'Ciutadella; Cap d\'Artrutx'
+}
 
+TERMINOS_ELIMINAR_UBICACION = frozenset({
+    'centro',
+    'casco antiguo',
+    'zonas rurales',
+    'de menorca'
+})
+
+@lru_cache(maxsize=MAX_CACHE_UBICACIONES)
 def estandarizar_ubicacion(ubicacion_raw):
     """
-    Estandariza las ubicaciones según las reglas definidas
+    Estandariza las ubicaciones según las reglas definidas.
+    Los mismos textos se repiten en miles de anuncios: el resultado se cachea (cache_info() da aciertos/fallos)
     """
     if not ubicacion_raw:
         return None
-    
-    mapeo_localidades = {
-        'ciutadella de menorca': 'Ciutadella',
-        'ciutadella': 'Ciutadella',
-        'ciudadela': 'Ciutadella',
-        'mahon': 'Maó',
-        'mahón': 'Maó',
-        'mao': 'Maó',
-        'camí de maó': 'Ciutadella',
-        'Maó/Mahón': 'Maó',
-        'llumesanes': 'Maó; Llumesanes',
-        'san clemente': 'Maó; Sant Climent',
-        'san antonio': 'Maó; Port',
-        'mahon puerto': 'Maó; Port',
-        'cala llonga': 'Maó; Cala Llonga',
-        'jardíns de malbuger': 'Maó',
-        'es grau': 'Maó; Es grau',
-        'ferrerias': 'Ferreries',
-        'alayor': 'Alaior',
-        'camí d\'en kane': 'Alaior',
-        'son vilar': 'Maó',
-        'son vilar con licencia turística': 'Maó',
-        'son parc': 'Es Mercadal; Son Parc',
-        'biniparratx': 'Sant Lluís',
-        'san luis': 'Sant Lluís',
-        'addaya': 'Es Mercadal; Addaia',
-        'coves noves': 'Es Mercadal; Coves noves',
-        'arenal': 'Es Mercadal; Arenal',
-        'arenal d’en castell': 'Es Mercadal; Arenal',
-        'biniancolla': 'Maó; Biniancolla',
-        'binisafua': 'Sant Lluís',
-        'suestra': 'Sant Lluís',
-        'son ganxo | son remei': 'Sant Lluís',
-        'torret': 'Sant Lluís',
-        'alcaufar': 'Sant Lluís',
-        'cap den font': 'Sant Lluís',
-        'salgar': 'Sant Lluís; Salgar',
-        'binibeca': 'Sant Lluís; Binibeca',
-        'binibeca vell': 'Sant Lluís; Binibeca',
-        'l\'argentina': 'Alaior',
-        'cala morell': 'Ciutadella; Cala Morell',
-        'los delfines': 'Ciutadella; Cala\'n Blanes',
-        'dalt es penyals': 'Ciutadella',
-        'sa caleta': 'Ciutadella; Sa caleta',
-        'cala\'n bosch': 'Ciutadella; Cap d\'Artrutx'
-    }
-    
-    terminos_eliminar = {
-        'centro',
-        'casco antiguo',
-        'zonas rurales',
-        'de menorca'
-    }
-    
-    partes = []
-    for separador in [';', ',']:
-        if separador in ubicacion_raw:
-            partes = [parte.strip() for parte in ubicacion_raw.split(separador)]
-            break
-    
-    if not partes:
-        partes = [ubicacion_raw.strip()]
-    
-    ubicacion_estandarizada = []
-    for i, parte in enumerate(partes):
-        parte_lower = parte.lower().strip()
-        if i == 0:
-            localidad_estandarizada = mapeo_localidades.get(parte_lower, parte.title())
-            ubicacion_estandarizada.append(localidad_estandarizada)
-        else:
-            if parte_lower not in terminos_eliminar and parte.strip():
-                localidad_estandarizada = mapeo_localidades.get(parte_lower, parte.title())
-                ubicacion_estandarizada.append(localidad_estandarizada)
-    
+
+    separador = ';' if ';' in ubicacion_raw else ',' if ',' in ubicacion_raw else None
+    partes = ubicacion_raw.split(separador) if separador else [ubicacion_raw]
+
     resultado = []
-    for item in ubicacion_estandarizada:
-        if item not in resultado:
-            resultado.append(item)
-    
+    for i, parte in enumerate(partes):
+        parte = parte.strip()
+        parte_lower = parte.lower()
+        if i > 0 and (not parte or parte_lower in TERMINOS_ELIMINAR_UBICACION):
+            continue
+        localidad_estandarizada = MAPEO_LOCALIDADES.get(parte_lower)
+        if localidad_estandarizada is None:
+            localidad_estandarizada = parte.title()
+        if localidad_estandarizada not in resultado:
+            resultado.append(localidad_estandarizada)
+
     return '; '.join(resultado) if len(resultado) > 1 else resultado[0] if resultado else None
 
+def _elegir_parser(nombre: str) -> str:
+    """Comprueba que el parser configurado está instalado; si no, se usa html.parser"""
+    try:
+        BeautifulSoup('', nombre)
+        return nombre
+    except FeatureNotFound:
+        print(f"⚠️ Parser HTML '{nombre}' no disponible, se usa html.parser")
+        return 'html.parser'
+
+PARSER_ACTIVO = _elegir_parser(PARSER_HTML)
+
+def crear_soup(html, region: Optional[SoupStrainer] = None, fuera_de_region: Tuple[str, ...] = ()) -> BeautifulSoup:
+    """Construye el árbol de una página con el parser configurado (todos los scrapers pasan por aquí).
+    Con region solo se construye esa parte; si la página no la tiene, se construye entera sin los
+    selectores de fuera_de_region (cabecera, pie...)."""
+    if region is not None:
+        soup = BeautifulSoup(html, PARSER_ACTIVO, parse_only=region)
+        if soup.find(True) is not None:
+            return soup
+    soup = BeautifulSoup(html, PARSER_ACTIVO)
+    for selector in fuera_de_region:
+        for tag in soup.select(selector):
+            tag.decompose()
+    return soup
+
+# Regiones que declaran los scrapers que solo leen una parte de la página
+REGION_CONTENIDO = SoupStrainer("div", id="contenido")  # ficha de Bonnin Sanso y Fincas Faro
+# Ficha y galería de Artrutx (sin cabecera, menú móvil, barra lateral ni pie)
+REGION_FICHA_ARTRUTX = SoupStrainer(attrs={"class": ["ltn__shop-details-inner", "ltn__img-slider-area"]})
+# Precio, descripción, características y galería de Fincas Seminari
+REGION_FICHA_SEMINARI = SoupStrainer(attrs={"class": ["detail-bar", "property-description", "detail-amenities-list",
+                                                      "slideshow", "slideshow-nav"]})
+
+# JSON-LD Y TEXTO SIN ÁRBOL DE BEAUTIFULSOUP (plataforma de Casas en Menorca, SA Inmobiliaria y 3Villas)
+_RE_JSON_LD = re.compile(
+    r'<script\b[^>]*?\stype\s*=\s*["\']?application/ld\+json["\']?[^>]*>(.*?)</script\s*>',
+    re.IGNORECASE | re.DOTALL
+)
+
+def extraer_json_ld(html: str) -> Dict[str, Dict]:
+    """Bloques JSON-LD de la página por @type, leídos del HTML en bruto (con varios del mismo tipo manda el último)"""
+    bloques = {}
+    for m in _RE_JSON_LD.finditer(html):
+        try:
+            data = json.loads(m.group(1))
+        except Exception:
+            continue
+        if isinstance(data, dict) and isinstance(data.get("@type"), str):
+            bloques[data["@type"]] = data
+    return bloques
+
+def propiedad_desde_json_ld(data_listing: Dict, data_breadcrumb: Optional[Dict],
+                            referencia=None, url_respaldo: str = "") -> Dict:
+    """Campos estándar de un RealEstateListing (+ BreadcrumbList para la ubicación)"""
+    if not referencia:
+        match = _RE_ID_FINAL_URL_ESTRICTO.search(data_listing.get("url", "") or url_respaldo)
+        if match:
+            referencia = match.group(1)
+
+    titulo = data_listing.get("name")
+    descripcion = data_listing.get("description")
+
+    precio = None
+    offers = data_listing.get("offers", {})
+    if isinstance(offers, dict):
+        precio_str = offers.get("price")
+        if precio_str and str(precio_str).isdigit():
+            precio = int(precio_str)
+
+    # Ubicación: breadcrumb sin los niveles genéricos ni el último (título)
+    ubicacion = None
+    if data_breadcrumb:
+        items = [it.get("name") for it in data_breadcrumb.get("itemListElement", []) if it.get("name")]
+        if len(items) > 2:
+            items = items[2:-1]
+        seen, ubic_list = set(), []
+        for it in items:
+            if it not in seen:
+                ubic_list.append(it)
+                seen.add(it)
+        if ubic_list:
+            ubicacion = estandarizar_ubicacion("; ".join(ubic_list))
+
+    # Características (desde la descripción)
+    habitaciones = banos = metros = metros_parcela = None
+    if descripcion:
+        desc = descripcion.lower()
+        habitaciones = primer_entero(desc, _RE_DESC_HABITACIONES)
+        banos = primer_entero(desc, _RE_DESC_BANOS)
+        metros = numero_con_miles(desc, _RE_DESC_METROS)
+        metros_parcela = numero_con_miles(desc, _RE_DESC_PARCELA)
+
+    galeria = []
+    if data_listing.get("image"):
+        galeria = data_listing["image"] if isinstance(data_listing["image"], list) else [data_listing["image"]]
+
+    return {
+        "referencia": referencia, "titulo": titulo, "descripcion": descripcion, "precio": precio,
+        "ubicacion": ubicacion, "habitaciones": habitaciones, "banos": banos, "metros": metros,
+        "metros_parcela": metros_parcela, "galeria": galeria,
+    }
+
+class PaginaLigera:
+    """Texto visible y textos por clase de una página sin construir el árbol de BeautifulSoup.
+    Con lxml recorre su árbol en C; con otro parser (o si lxml falla) usa crear_soup y da lo mismo que get_text."""
+
+    _SIN_TEXTO = {'script', 'style', 'template', 'rt', 'rp'}  # cadenas que get_text ignora
+    _CONSERVAN_ESPACIOS = {'pre', 'textarea'}
+    _ESPACIOS_ASCII = str.maketrans('', '', ' \n\t\x0c\r')
+    _XPATHS: Dict[str, str] = {}  # selector -> XPath, compartido por todas las páginas
+
+    def __init__(self, html: str):
+        self._raiz = None
+        self._soup = None
+        if lxml_html is not None and PARSER_ACTIVO == 'lxml':
+            try:
+                # Misma entrada que el constructor lxml de bs4 (parser incremental con todo el HTML de una vez)
+                parser = lxml_html.HTMLParser()
+                parser.feed(html)
+                self._raiz = parser.close()
+            except Exception:
+                self._raiz = None
+        if self._raiz is None:
+            self._soup = crear_soup(html)
+
+    def _cadenas(self, elemento) -> List[str]:
+        """Cadenas del subárbol en orden de documento (texto propio, hijos y colas de los hijos)"""
+        cadenas = []
+        pila = [(elemento, elemento.tag in self._CONSERVAN_ESPACIOS)]
+        while pila:
+            el, conservar = pila.pop()
+            if isinstance(el, str):
+                # Como bs4: una cadena solo de espacios queda en '\n' o ' ' (salvo dentro de pre/textarea)
+                if not conservar and not el.translate(self._ESPACIOS_ASCII):
+                    el = '\n' if '\n' in el else ' '
+                cadenas.append(el)
+                continue
+            if isinstance(el.tag, str) and el.tag not in self._SIN_TEXTO:  # comentarios: solo su cola
+                conservar_dentro = conservar or el.tag in self._CONSERVAN_ESPACIOS
+                for hijo in reversed(el):
+                    if hijo.tail:
+                        pila.append((hijo.tail, conservar_dentro))
+                    pila.append((hijo, conservar_dentro))
+                if el.text:
+                    pila.append((el.text, conservar_dentro))
+        return cadenas
+
+    def texto(self, separador: str = '', strip: bool = False) -> str:
+        """Equivalente a soup.get_text(separador, strip=strip) del documento completo"""
+        if self._soup is not None:
+            return self._soup.get_text(separador, strip=strip)
+        # libxml2 deja lo que va tras </html> en nodos hermanos de la raíz
+        nodos = list(reversed(list(self._raiz.itersiblings(preceding=True))))
+        nodos += [self._raiz] + list(self._raiz.itersiblings())
+        return self._unir([c for nodo in nodos for c in self._cadenas(nodo)], separador, strip)
+
+    @classmethod
+    def xpath_de_selector(cls, selector: str) -> str:
+        """XPath de un selector de clases descendientes ('.a .b'); cada selector se traduce una sola vez"""
+        xpath = cls._XPATHS.get(selector)
+        if xpath is None:
+            xpath = cls._XPATHS[selector] = ''.join(
+                f"//*[contains(concat(' ', normalize-space(@class), ' '), ' {clase.lstrip('.')} ')]"
+                for clase in selector.split()
+            )
+        return xpath
+
+    def textos(self, selector: str, strip: bool = True) -> List[str]:
+        """get_text(strip=strip) de cada elemento de un selector de clases descendientes ('.a .b')"""
+        if self._soup is not None:
+            return [el.get_text(strip=strip) for el in self._soup.select(selector)]
+        return [self._unir(self._cadenas(el), '', strip) for el in self._raiz.xpath(self.xpath_de_selector(selector))]
+
+    @staticmethod
+    def _unir(cadenas: List[str], separador: str, strip: bool) -> str:
+        if strip:
+            cadenas = [c.strip() for c in cadenas]
+            cadenas = [c for c in cadenas if c]
+        return separador.join(cadenas)
+
+class TextoPagina:
+    """Texto aplanado de una página (o de una región suya), calculado una sola vez por página.
+    Lo comparten la búsqueda de precio, detectar_flags y las comprobaciones de estado del scraper en vez de
+    repetir get_text() sobre todo el árbol. Se calcula en el primer uso: crearla con el árbol ya limpio."""
+
+    def __init__(self, elemento, separador: str = '', strip: bool = False):
+        self._elemento = elemento
+        self._separador = separador
+        self._strip = strip
+        self._texto = None
+        self._mayusculas = None
+
+    def texto(self) -> str:
+        """get_text(separador, strip=strip) del elemento"""
+        if self._texto is None:
+            self._texto = self._elemento.get_text(self._separador, strip=self._strip) if self._elemento is not None else ''
+        return self._texto
+
+    def mayusculas(self) -> str:
+        """El mismo texto en mayúsculas (lo que usan los detectores de palabras clave)"""
+        if self._mayusculas is None:
+            self._mayusculas = self.texto().upper()
+        return self._mayusculas
+
+# EXTRACCIÓN DE TEXTO Y NÚMEROS
+# Patrones compilados una sola vez y compartidos por todos los scrapers
+_RE_REF_INICIAL = re.compile(r'^\s*Ref[:\.]?\s*\d+\s*', re.IGNORECASE)
+_RE_SIMBOLOS_RAROS = re.compile(r'[^\w\sÁÉÍÓÚÜÑáéíóúüñ.,;:-]')
+_RE_ASTERISCOS = re.compile(r'\*+')
+_RE_ESPACIOS_REPETIDOS = re.compile(r'\s{2,}')
+_RE_ESPACIOS = re.compile(r'\s+')
+_RE_NO_DIGITO = re.compile(r'\D')
+_RE_APOSTROFES = re.compile(r"[´'`]")
+_RE_SEPARADORES_UBICACION = re.compile(r'[;,]')
+_RE_ENTERO = re.compile(r'(\d+)')
+_RE_UNIDADES = re.compile(r'€|m²|m2|m')
+
+# Precios
+_RE_PRECIO_EUROS = re.compile(r'(\d[\d.,]*)\s*€|€\s*(\d[\d.,]*)')
+_RE_PRECIO_MILES = re.compile(r'(\d{1,3}(?:[.,]\d{3})*)\s*€')             # "350.000 €", "350,000 €"
+_RE_PRECIO_MILES_DELANTE = re.compile(r'€\s*(\d{1,3}(?:[.,]\d{3})*)')     # "€ 350.000"
+_RE_PRECIO_MILES_PUNTO = re.compile(r'(\d{1,3}(?:\.\d{3})*)\s*€')         # solo punto de miles
+
+# Referencias
+_RE_REF_NUMERO = re.compile(r'REF[:\s]*(\d+)', re.IGNORECASE)             # "REF: 123", "Ref 123"
+_RE_REF_DOS_PUNTOS = re.compile(r'REF:\s*(\d+)', re.IGNORECASE)
+_RE_REF_TEXTO = re.compile(r'REF[: ]?(.+)', re.IGNORECASE)                # "REF: AB-12" (resto de la línea)
+_RE_REF_PUNTO = re.compile(r'REF\.(\d+)')                                 # "REF.123"
+_RE_REF_ALFANUMERICA = re.compile(r'Ref\.\s*[:\-]?\s*(\w+)')               # "Ref.: 1593V"
+_RE_ID_FINAL_URL = re.compile(r'/(\d+)/?$')
+_RE_ID_FINAL_URL_ESTRICTO = re.compile(r'/(\d+)$')
+_RE_ID_PARAMETRO = re.compile(r'id=(\d+)')
+_RE_HREF_PROPIEDAD_PHP = re.compile(r'propiedad\.php\?id=\d+')         # enlaces a fichas "propiedad.php?id=123"
+
+# Habitaciones, baños y superficies en texto libre
+_RE_HABITACIONES = re.compile(r'(\d+)\s*(?:habitacion|dormitorio)', re.IGNORECASE)
+_RE_BANOS = re.compile(r'(\d+)\s*baño', re.IGNORECASE)
+_RE_METROS_CONSTRUIDOS = re.compile(r'(\d+)\s*m[2²]?\s*construid', re.IGNORECASE)
+# Variantes para descripciones ya en minúsculas (plataforma JSON-LD)
+_RE_DESC_HABITACIONES = re.compile(r'(\d+)\s*(?:habitaciones?|dormitorios?)')
+_RE_DESC_BANOS = re.compile(r'(\d+)\s*(?:baños?|aseos?)')
+_RE_DESC_METROS = re.compile(r'(\d[\d\.,]*)\s*(?:m2|m²)')
+_RE_DESC_PARCELA = re.compile(r'(\d[\d\.,]*)\s*(?:m2|m²).*(parcela|solar|terreno)')
+
 def limpiar_texto(txt):
     if not txt:
         return None
     # Quitar "Ref:" o "Ref." al inicio
-    txt = re.sub(r'^\s*Ref[:\.]?\s*\d+\s*', '', txt, flags=re.IGNORECASE)
+    txt = _RE_REF_INICIAL.sub('', txt)
     # Quitar emojis y símbolos raros
-    txt = re.sub(r'[^\w\sÁÉÍÓÚÜÑáéíóúüñ.,;:-]', '', txt)
+    txt = _RE_SIMBOLOS_RAROS.sub('', txt)
     # Quitar asteriscos repetidos
-    txt = re.sub(r'\*+', '', txt)
+    txt = _RE_ASTERISCOS.sub('', txt)
     # Normalizar espacios
-    txt = re.sub(r'\s{2,}', ' ', txt).strip()
+    txt = _RE_ESPACIOS_REPETIDOS.sub(' ', txt).strip()
     return txt
 
+def solo_digitos(texto: Optional[str]) -> str:
+    """Los dígitos del texto sin nada más ("1.200.000 €" -> "1200000")"""
+    return _RE_NO_DIGITO.sub('', texto or '')
 
-class RegistroScraping:
-    """Maneja el registro de URLs escaneadas y sus hashes mejorados"""
+def entero_de_digitos(texto: Optional[str]) -> Optional[int]:
+    """Entero formado por todos los dígitos del texto; None si no tiene ninguno"""
+    digitos = solo_digitos(texto)
+    return int(digitos) if digitos else None
+
+def primer_entero(texto: Optional[str], patron: re.Pattern = _RE_ENTERO) -> Optional[int]:
+    """Primer número del texto (o el grupo 1 de patron); None si no aparece"""
+    m = patron.search(texto or '')
+    return int(m.group(1)) if m else None
+
+def numero_con_miles(texto: Optional[str], patron: re.Pattern = _RE_PRECIO_MILES) -> Optional[int]:
+    """Número con puntos o comas de miles capturado por patron ("350.000 €" -> 350000); None si no aparece"""
+    m = patron.search(texto or '')
+    return int(m.group(1).replace('.', '').replace(',', '')) if m else None
+
+def numero_limpio(txt) -> Optional[int]:
+    """Convierte textos tipo '1.010.000 €', '181 m2' o '2,5' en enteros (redondeando decimales)"""
+    if not txt:
+        return None
+    s = _RE_UNIDADES.sub('', str(txt).replace('\xa0', ' ')).replace('.', '').replace(',', '.').strip()
+    if s.endswith('²'):
+        s = s[:-1].strip()
+    try:
+        return int(round(float(s)))
+    except (ValueError, OverflowError):
+        return None
+
+def precio_en_texto(texto: Optional[str]) -> Optional[int]:
+    """Primer importe en euros de un texto ("350.000 €", "€ 1.200.000"); None si no hay"""
+    m = _RE_PRECIO_EUROS.search(texto or '')
+    if not m:
+        return None
+    return entero_de_digitos(m.group(1) or m.group(2))
+
+def escribir_json_atomico(ruta: str, datos, indent: Optional[int] = 2):
+    """Escribe JSON en un temporal y lo renombra: un corte a mitad nunca deja el archivo a medias"""
+    directorio = os.path.dirname(os.path.abspath(ruta))
+    temporal = os.path.join(directorio, f".{os.path.basename(ruta)}.{os.getpid()}.tmp")
+    try:
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(datos, f, ensure_ascii=False, indent=indent)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporal, ruta)
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+
+
+class DiarioJSONL:
+    """Diario append-only (una línea JSON por cambio) para checkpoints baratos y recuperación tras un corte"""
+    
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        self._archivo = None
+        self._lock = threading.Lock()
+    
+    def anotar(self, entrada: Dict):
+        """Añade un cambio al final del diario"""
+        linea = json.dumps(entrada, ensure_ascii=False) + '\n'
+        with self._lock:
+            if self._archivo is None:
+                self._archivo = open(self.ruta, 'a', encoding='utf-8')
+                if self._archivo.tell() > 0 and not self._termina_en_salto():
+                    self._archivo.write('\n')  # aislar la línea truncada de un corte anterior
+            self._archivo.write(linea)
+            self._archivo.flush()
+    
+    def _termina_en_salto(self) -> bool:
+        with open(self.ruta, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b'\n'
+    
+    def leer(self) -> List[Dict]:
+        """Lee todos los cambios anotados (ignora una última línea truncada por un corte)"""
+        if not os.path.exists(self.ruta):
+            return []
+        entradas = []
+        with open(self.ruta, 'r', encoding='utf-8') as f:
+            for linea in f:
+                try:
+                    entradas.append(json.loads(linea))
+                except json.JSONDecodeError:
+                    print(f"⚠️ Línea corrupta ignorada en {self.ruta}")
+        return entradas
+    
+    def sincronizar(self):
+        """Fuerza a disco lo anotado (checkpoint de coste constante)"""
+        with self._lock:
+            if self._archivo is not None:
+                self._archivo.flush()
+                os.fsync(self._archivo.fileno())
+    
+    def cerrar(self):
+        with self._lock:
+            if self._archivo is not None:
+                self._archivo.close()
+                self._archivo = None
+    
+    def vaciar(self):
+        """Elimina el diario una vez compactado su contenido"""
+        self.cerrar()
+        if os.path.exists(self.ruta):
+            os.remove(self.ruta)
+
+
+def registro_vacio() -> Dict:
+    """Estructura de un registro de scraping sin historial"""
+    return {
+        'urls_escaneadas': {},  # {url: {'hash_contenido': str, 'fecha_ultimo_escaneo': str, 'inmobiliaria': str, 'lastmod': str}}
+        'urls_eliminadas': {},  # {url: {'fecha_eliminacion': str, 'ultima_referencia': str}}
+        'ultima_ejecucion_completa': None,
+        'estadisticas': {
+            'total_urls_conocidas': 0,
+            'ultimo_escaneo_incremental': None,
+            'cambios_detectados': 0,
+            'urls_eliminadas': 0
+        }
+    }
+
+
+def clave_orden(orden: Optional[int]) -> Tuple[bool, int]:
+    """Clave para ordenar por la posición de la inmobiliaria en la lista de main; lo que no la lleva va al final"""
+    return (orden is None, orden or 0)
+
+
+def organizar_por_inmobiliaria(propiedades: List[Dict]) -> Dict[str, List[Dict]]:
+    """Agrupa una lista de propiedades por inmobiliaria (formato organizado del JSON final)"""
+    propiedades_organizadas = {}
+    for prop in propiedades:
+        inmobiliaria = prop.get('inmobiliaria', 'Desconocida')
+        if inmobiliaria not in propiedades_organizadas:
+            propiedades_organizadas[inmobiliaria] = []
+        propiedades_organizadas[inmobiliaria].append(prop)
+    return propiedades_organizadas
+
+
+class MotorAlmacenamiento:
+    """Interfaz de persistencia de propiedades y del registro; GestorPropiedades y RegistroScraping solo hablan con ella"""
+    
+    def cargar_propiedades(self) -> List[Dict]:
+        """Catálogo tal como quedó en la última compactación"""
+        raise NotImplementedError
+    
+    def anotar_propiedad(self, entrada: Dict):
+        """Guarda un cambio de propiedad ('alta', 'actualizacion', 'eliminada') hasta compactar"""
+        raise NotImplementedError
+    
+    def cambios_propiedades(self) -> List[Dict]:
+        """Cambios de propiedades anotados y todavía no compactados (ejecución anterior cortada)"""
+        raise NotImplementedError
+    
+    def guardar_propiedades(self, propiedades: List[Dict], por_inmobiliaria: bool = False,
+                            urls_cambiadas: Optional[Set[str]] = None):
+        """Compacta el catálogo final; urls_cambiadas permite guardar solo lo que cambió"""
+        raise NotImplementedError
     
-    def __init__(self, archivo_registro: str):
+    def cargar_registro(self) -> Optional[Dict]:
+        """Registro tal como quedó en la última compactación (None si no hay historial)"""
+        raise NotImplementedError
+    
+    def anotar_registro(self, entrada: Dict):
+        """Guarda un cambio del registro ('escaneada', 'eliminada', 'estadisticas', 'completa')"""
+        raise NotImplementedError
+    
+    def cambios_registro(self) -> List[Dict]:
+        """Cambios del registro anotados y todavía no aplicados a lo que devuelve cargar_registro"""
+        raise NotImplementedError
+    
+    def sincronizar_registro(self):
+        """Checkpoint de coste constante de los cambios del registro"""
+        raise NotImplementedError
+    
+    def guardar_registro(self, registro: Dict):
+        """Compacta el registro completo"""
+        raise NotImplementedError
+    
+    def cerrar(self):
+        pass
+
+
+class MotorJSON(MotorAlmacenamiento):
+    """Almacenamiento en archivos JSON completos más diarios JSONL con los cambios desde la última compactación"""
+    
+    def __init__(self, archivo_propiedades: Optional[str] = None, archivo_temp: Optional[str] = None,
+                 archivo_registro: Optional[str] = None, archivo_diario_registro: Optional[str] = None):
+        self.archivo_propiedades = archivo_propiedades
         self.archivo_registro = archivo_registro
-        self.registro = self._cargar_registro()
+        # Solo se anotan altas y cambios, no el catálogo entero
+        self.diario_propiedades = DiarioJSONL(archivo_temp) if archivo_temp else None
+        if archivo_registro and not archivo_diario_registro:
+            archivo_diario_registro = os.path.splitext(archivo_registro)[0] + '.jsonl'
+        self.diario_registro = DiarioJSONL(archivo_diario_registro) if archivo_diario_registro else None
     
-    def _cargar_registro(self) -> Dict:
-        """Carga el registro existente o crea uno nuevo"""
+    def cargar_propiedades(self) -> List[Dict]:
+        """Carga propiedades existentes"""
+        if os.path.exists(self.archivo_propiedades):
+            try:
+                with open(self.archivo_propiedades, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                    # Si es el formato antiguo (lista), convertir al nuevo formato
+                    if isinstance(data, list):
+                        return data
+                    # Si es el nuevo formato (dict por inmobiliaria), aplanar
+                    elif isinstance(data, dict):
+                        propiedades = []
+                        for inmobiliaria, props in data.items():
+                            if isinstance(props, list):
+                                propiedades.extend(props)
+                        return propiedades
+            except Exception as e:
+                print(f"Error cargando propiedades existentes: {e}")
+        return []
+    
+    def anotar_propiedad(self, entrada: Dict):
+        self.diario_propiedades.anotar(entrada)
+    
+    def cambios_propiedades(self) -> List[Dict]:
+        return self.diario_propiedades.leer()
+    
+    def guardar_propiedades(self, propiedades: List[Dict], por_inmobiliaria: bool = False,
+                            urls_cambiadas: Optional[Set[str]] = None):
+        """Reescribe el archivo definitivo (siempre completo) y vacía el diario"""
+        if por_inmobiliaria:
+            escribir_json_atomico(self.archivo_propiedades, organizar_por_inmobiliaria(propiedades))
+        else:
+            escribir_json_atomico(self.archivo_propiedades, propiedades)
+        # Compactación: el archivo definitivo ya contiene todo lo anotado en el diario
+        self.diario_propiedades.vaciar()
+    
+    def cargar_registro(self) -> Optional[Dict]:
+        """Carga el registro existente"""
         if os.path.exists(self.archivo_registro):
             try:
                 with open(self.archivo_registro, 'r', encoding='utf-8') as f:
                     return json.load(f)
             except Exception as e:
                 print(f"Error cargando registro: {e}. Creando nuevo registro.")
+        return None
+    
+    def anotar_registro(self, entrada: Dict):
+        self.diario_registro.anotar(entrada)
+    
+    def cambios_registro(self) -> List[Dict]:
+        return self.diario_registro.leer()
+    
+    def sincronizar_registro(self):
+        self.diario_registro.sincronizar()
+    
+    def guardar_registro(self, registro: Dict):
+        escribir_json_atomico(self.archivo_registro, registro)
+        self.diario_registro.vaciar()
+    
+    def cerrar(self):
+        for diario in (self.diario_propiedades, self.diario_registro):
+            if diario is not None:
+                diario.cerrar()
+
+
+class MotorSQLite(MotorAlmacenamiento):
+    """Propiedades, estado de URLs y eliminaciones en SQLite; los JSON de Pages pasan a ser una exportación"""
+    
+    ESQUEMA = """
+        CREATE TABLE IF NOT EXISTS propiedades (
+            url TEXT PRIMARY KEY,
+            inmobiliaria TEXT,
+            referencia TEXT,
+            precio INTEGER,
+            vendido INTEGER,
+            fecha_scraping TEXT,
+            fecha_ultima_actualizacion TEXT,
+            fecha_eliminacion TEXT,
+            datos TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_propiedades_inmobiliaria ON propiedades(inmobiliaria);
+        CREATE INDEX IF NOT EXISTS idx_propiedades_precio ON propiedades(precio);
+        CREATE INDEX IF NOT EXISTS idx_propiedades_fecha_scraping ON propiedades(fecha_scraping);
+        CREATE INDEX IF NOT EXISTS idx_propiedades_fecha_actualizacion ON propiedades(fecha_ultima_actualizacion);
+        CREATE INDEX IF NOT EXISTS idx_propiedades_fecha_eliminacion ON propiedades(fecha_eliminacion);
         
-        return {
-            'urls_escaneadas': {},  # {url: {'hash_contenido': str, 'fecha_ultimo_escaneo': str}}
-            'urls_eliminadas': {},  # {url: {'fecha_eliminacion': str, 'ultima_referencia': str}}
-            'ultima_ejecucion_completa': None,
-            'estadisticas': {
-                'total_urls_conocidas': 0,
-                'ultimo_escaneo_incremental': None,
-                'cambios_detectados': 0,
-                'urls_eliminadas': 0
-            }
-        }
+        CREATE TABLE IF NOT EXISTS urls_escaneadas (
+            url TEXT PRIMARY KEY,
+            inmobiliaria TEXT,
+            hash_contenido TEXT,
+            fecha_ultimo_escaneo TEXT,
+            datos TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_escaneadas_inmobiliaria ON urls_escaneadas(inmobiliaria);
+        CREATE INDEX IF NOT EXISTS idx_escaneadas_fecha ON urls_escaneadas(fecha_ultimo_escaneo);
+        
+        CREATE TABLE IF NOT EXISTS urls_eliminadas (
+            url TEXT PRIMARY KEY,
+            fecha_eliminacion TEXT,
+            datos TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_eliminadas_fecha ON urls_eliminadas(fecha_eliminacion);
+        
+        CREATE TABLE IF NOT EXISTS estado (clave TEXT PRIMARY KEY, valor TEXT);
+        CREATE TABLE IF NOT EXISTS cambios_propiedades (id INTEGER PRIMARY KEY AUTOINCREMENT, entrada TEXT NOT NULL);
+    """
+    
+    UPSERT_PROPIEDAD = """
+        INSERT INTO propiedades (url, inmobiliaria, referencia, precio, vendido, fecha_scraping,
+                                 fecha_ultima_actualizacion, fecha_eliminacion, datos)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(url) DO UPDATE SET
+            inmobiliaria = excluded.inmobiliaria, referencia = excluded.referencia, precio = excluded.precio,
+            vendido = excluded.vendido, fecha_scraping = excluded.fecha_scraping,
+            fecha_ultima_actualizacion = excluded.fecha_ultima_actualizacion,
+            fecha_eliminacion = excluded.fecha_eliminacion, datos = excluded.datos
+    """
+    UPSERT_ESCANEADA = """
+        INSERT INTO urls_escaneadas (url, inmobiliaria, hash_contenido, fecha_ultimo_escaneo, datos)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(url) DO UPDATE SET
+            inmobiliaria = excluded.inmobiliaria, hash_contenido = excluded.hash_contenido,
+            fecha_ultimo_escaneo = excluded.fecha_ultimo_escaneo, datos = excluded.datos
+    """
+    UPSERT_ELIMINADA = """
+        INSERT INTO urls_eliminadas (url, fecha_eliminacion, datos) VALUES (?, ?, ?)
+        ON CONFLICT(url) DO UPDATE SET fecha_eliminacion = excluded.fecha_eliminacion, datos = excluded.datos
+    """
+    
+    def __init__(self, ruta_bd: str, archivo_propiedades: str, archivo_registro: str):
+        self.ruta_bd = ruta_bd
+        self.archivo_propiedades = archivo_propiedades  # exportación para GitHub Pages
+        self.archivo_registro = archivo_registro        # exportación para GitHub Pages
+        self._lock = threading.Lock()  # una conexión compartida por todos los hilos
+        os.makedirs(os.path.dirname(ruta_bd) or '.', exist_ok=True)
+        self._conexion = sqlite3.connect(ruta_bd, check_same_thread=False)
+        self._conexion.execute('PRAGMA journal_mode=WAL')
+        self._conexion.execute('PRAGMA synchronous=NORMAL')  # con WAL, confirmar un cambio no espera a fsync
+        self._conexion.executescript(self.ESQUEMA)
+        if self._leer_estado('importado') is None:
+            self._importar_json()
+    
+    def _importar_json(self):
+        """Primera ejecución con SQLite: carga los JSON existentes (o los exportados y versionados en el repo)"""
+        origen = MotorJSON(archivo_propiedades=self.archivo_propiedades, archivo_registro=self.archivo_registro)
+        propiedades = origen.cargar_propiedades()
+        registro = origen.cargar_registro()
+        with self._lock, self._conexion:
+            self._conexion.executemany(self.UPSERT_PROPIEDAD, [self._fila_propiedad(p) for p in propiedades])
+            if registro:
+                self._conexion.executemany(self.UPSERT_ESCANEADA, [
+                    self._fila_escaneada(url, datos) for url, datos in registro.get('urls_escaneadas', {}).items()
+                ])
+                self._conexion.executemany(self.UPSERT_ELIMINADA, [
+                    self._fila_eliminada(url, datos) for url, datos in registro.get('urls_eliminadas', {}).items()
+                ])
+                self._escribir_estado('estadisticas', registro.get('estadisticas'))
+                self._escribir_estado('ultima_ejecucion_completa', registro.get('ultima_ejecucion_completa'))
+            self._escribir_estado('importado', datetime.now().isoformat())
+        if propiedades or registro:
+            print(f"🗄️ Importadas {len(propiedades)} propiedades y el registro a {self.ruta_bd}")
+    
+    @staticmethod
+    def _fila_propiedad(prop: Dict) -> Tuple:
+        referencia = prop.get('referencia')
+        return (
+            prop['url_detalle'], prop.get('inmobiliaria'), str(referencia) if referencia else None,
+            prop.get('precio'), 1 if prop.get('vendido') else 0, prop.get('fecha_scraping'),
+            prop.get('fecha_ultima_actualizacion'), prop.get('fecha_eliminacion'),
+            json.dumps(prop, ensure_ascii=False)
+        )
+    
+    @staticmethod
+    def _fila_escaneada(url: str, datos: Dict) -> Tuple:
+        return (url, datos.get('inmobiliaria'), datos.get('hash_contenido'), datos.get('fecha_ultimo_escaneo'),
+                json.dumps(datos, ensure_ascii=False))
+    
+    @staticmethod
+    def _fila_eliminada(url: str, datos: Dict) -> Tuple:
+        return (url, datos.get('fecha_eliminacion'), json.dumps(datos, ensure_ascii=False))
+    
+    def _leer_estado(self, clave: str):
+        fila = self._conexion.execute('SELECT valor FROM estado WHERE clave = ?', (clave,)).fetchone()
+        return json.loads(fila[0]) if fila else None
+    
+    def _escribir_estado(self, clave: str, valor):
+        self._conexion.execute(
+            'INSERT INTO estado (clave, valor) VALUES (?, ?) ON CONFLICT(clave) DO UPDATE SET valor = excluded.valor',
+            (clave, json.dumps(valor, ensure_ascii=False))
+        )
+    
+    def cargar_propiedades(self) -> List[Dict]:
+        with self._lock:
+            filas = self._conexion.execute('SELECT datos FROM propiedades ORDER BY rowid').fetchall()
+        return [json.loads(datos) for (datos,) in filas]
+    
+    def anotar_propiedad(self, entrada: Dict):
+        with self._lock:  # se confirma en el siguiente checkpoint (sincronizar_registro) o al guardar
+            self._conexion.execute('INSERT INTO cambios_propiedades (entrada) VALUES (?)',
+                                   (json.dumps(entrada, ensure_ascii=False),))
+    
+    def cambios_propiedades(self) -> List[Dict]:
+        with self._lock:
+            filas = self._conexion.execute('SELECT entrada FROM cambios_propiedades ORDER BY id').fetchall()
+        return [json.loads(entrada) for (entrada,) in filas]
     
-    def guardar_registro(self):
-        """Guarda el registro en disco"""
+    def guardar_propiedades(self, propiedades: List[Dict], por_inmobiliaria: bool = False,
+                            urls_cambiadas: Optional[Set[str]] = None):
+        """Upsert en bloque solo de las filas cambiadas y exportación del JSON para Pages"""
+        with self._lock, self._conexion:
+            if urls_cambiadas is None:
+                self._conexion.execute('DELETE FROM propiedades')
+                filas = [self._fila_propiedad(p) for p in propiedades]
+                borradas = []
+            else:
+                presentes = {p['url_detalle'] for p in propiedades}
+                # En el orden de la lista: las altas quedan al final del rowid igual que en el JSON
+                filas = [self._fila_propiedad(p) for p in propiedades if p['url_detalle'] in urls_cambiadas]
+                borradas = [(url,) for url in urls_cambiadas - presentes]
+            self._conexion.executemany(self.UPSERT_PROPIEDAD, filas)
+            self._conexion.executemany('DELETE FROM propiedades WHERE url = ?', borradas)
+            self._conexion.execute('DELETE FROM cambios_propiedades')
+        print(f"🗄️ {len(filas)} propiedades guardadas y {len(borradas)} borradas en {self.ruta_bd}")
+        self.exportar_propiedades(por_inmobiliaria)
+    
+    def exportar_propiedades(self, por_inmobiliaria: bool = False):
+        """Genera el JSON de propiedades que publica GitHub Pages a partir de la base"""
+        propiedades = self.cargar_propiedades()
+        escribir_json_atomico(self.archivo_propiedades,
+                              organizar_por_inmobiliaria(propiedades) if por_inmobiliaria else propiedades)
+    
+    def cargar_registro(self) -> Optional[Dict]:
+        with self._lock:
+            escaneadas = self._conexion.execute('SELECT url, datos FROM urls_escaneadas ORDER BY rowid').fetchall()
+            eliminadas = self._conexion.execute('SELECT url, datos FROM urls_eliminadas ORDER BY rowid').fetchall()
+            estadisticas = self._leer_estado('estadisticas')
+            ultima_completa = self._leer_estado('ultima_ejecucion_completa')
+        if not escaneadas and not eliminadas and estadisticas is None:
+            return None
+        registro = registro_vacio()
+        registro['urls_escaneadas'] = {url: json.loads(datos) for url, datos in escaneadas}
+        registro['urls_eliminadas'] = {url: json.loads(datos) for url, datos in eliminadas}
+        registro['ultima_ejecucion_completa'] = ultima_completa
+        if estadisticas:
+            registro['estadisticas'] = estadisticas
+        return registro
+    
+    def anotar_registro(self, entrada: Dict):
+        """Aplica el cambio directamente a las tablas (no hace falta diario aparte). No confirma: los cambios de
+        una inmobiliaria se confirman juntos en cada checkpoint (sincronizar_registro)"""
+        op = entrada.get('op')
+        url = entrada.get('url')
+        with self._lock:
+            if op == 'escaneada':
+                self._conexion.execute(self.UPSERT_ESCANEADA, self._fila_escaneada(url, entrada['datos']))
+                self._conexion.execute('DELETE FROM urls_eliminadas WHERE url = ?', (url,))
+            elif op == 'eliminada':
+                if entrada.get('datos'):
+                    self._conexion.execute(self.UPSERT_ELIMINADA, self._fila_eliminada(url, entrada['datos']))
+                self._conexion.execute('DELETE FROM urls_escaneadas WHERE url = ?', (url,))
+            elif op == 'estadisticas':
+                self._escribir_estado('estadisticas', entrada['valor'])
+            elif op == 'completa':
+                self._escribir_estado('ultima_ejecucion_completa', entrada['fecha'])
+    
+    def cambios_registro(self) -> List[Dict]:
+        return []
+    
+    def sincronizar_registro(self):
+        """Checkpoint: una sola transacción con todo lo anotado desde el anterior"""
+        with self._lock:
+            self._conexion.commit()
+    
+    def guardar_registro(self, registro: Dict):
+        """Las tablas ya están al día: se fijan las estadísticas y se exporta el JSON del registro para Pages
+        (desde el registro recibido, que ya viene en el orden de la lista de inmobiliarias)"""
+        with self._lock, self._conexion:
+            self._escribir_estado('estadisticas', registro['estadisticas'])
+        escribir_json_atomico(self.archivo_registro, registro)
+    
+    def cerrar(self):
+        with self._lock:
+            self._conexion.commit()
+            self._conexion.close()
+
+
+class RegistroScraping:
+    """Maneja el registro de URLs escaneadas y sus hashes mejorados"""
+    
+    def __init__(self, archivo_registro: str, archivo_diario: Optional[str] = None,
+                 motor: Optional[MotorAlmacenamiento] = None):
+        self.archivo_registro = archivo_registro
+        # Los cambios se anotan en el motor; la foto completa solo se escribe al compactar
+        self.motor = motor or MotorJSON(archivo_registro=archivo_registro, archivo_diario_registro=archivo_diario)
+        # URLs que entran en esta ejecución -> posición de su inmobiliaria (los hilos las añaden en cualquier orden)
+        self._orden_escaneadas: Dict[str, Optional[int]] = {}
+        self._orden_eliminadas: Dict[str, Optional[int]] = {}
+        self.registro = self._cargar_registro()
+        self._lock = threading.RLock()  # varias inmobiliarias escriben a la vez
+        self._urls_por_inmobiliaria: Dict[str, Set[str]] = {}  # índice de urls_escaneadas por inmobiliaria
+        for url, datos in self.registro['urls_escaneadas'].items():
+            if datos.get('inmobiliaria'):
+                self._urls_por_inmobiliaria.setdefault(datos['inmobiliaria'], set()).add(url)
+    
+    def _cargar_registro(self) -> Dict:
+        """Carga la última foto del registro y le aplica los cambios pendientes del diario"""
+        registro = self.motor.cargar_registro() or registro_vacio()
+        entradas = self.motor.cambios_registro()
+        for entrada in entradas:
+            self._seguir_orden(registro, entrada)
+            self._aplicar(registro, entrada)
+        if entradas:
+            print(f"♻️ Aplicados {len(entradas)} cambios pendientes del diario del registro")
+        return registro
+    
+    def _seguir_orden(self, registro: Dict, entrada: Dict):
+        """Apunta la posición de las URLs que una entrada va a añadir (se ordenan al compactar)"""
+        url = entrada.get('url')
+        if entrada.get('op') == 'escaneada' and url not in registro['urls_escaneadas']:
+            self._orden_escaneadas[url] = entrada.get('orden')
+        elif entrada.get('op') == 'eliminada' and entrada.get('datos') and url not in registro['urls_eliminadas']:
+            self._orden_eliminadas[url] = entrada.get('orden')
+    
+    @staticmethod
+    def _aplicar(registro: Dict, entrada: Dict):
+        """Reaplica un cambio anotado en el diario sobre el diccionario del registro"""
+        op = entrada.get('op')
+        if op == 'escaneada':
+            registro['urls_escaneadas'][entrada['url']] = entrada['datos']
+            registro['urls_eliminadas'].pop(entrada['url'], None)
+            registro['estadisticas']['total_urls_conocidas'] = len(registro['urls_escaneadas'])
+        elif op == 'eliminada':
+            if entrada.get('datos'):
+                registro['urls_eliminadas'][entrada['url']] = entrada['datos']
+            registro['urls_escaneadas'].pop(entrada['url'], None)
+        elif op == 'estadisticas':
+            registro['estadisticas'] = entrada['valor']
+        elif op == 'completa':
+            registro['ultima_ejecucion_completa'] = entrada['fecha']
+    
+    def _anotar(self, entrada: Dict):
+        try:
+            self.motor.anotar_registro(entrada)
+        except Exception as e:
+            print(f"Error guardando registro: {e}")
+    
+    def exportar_foto(self, ruta: str):
+        """Escribe el registro tal como está ahora (punto de partida de los procesos por inmobiliaria)"""
+        with self._lock:
+            escribir_json_atomico(ruta, self.registro, indent=None)
+    
+    def incorporar_cambios(self, entradas: List[Dict], estadisticas: Dict[str, int]):
+        """Incorpora los cambios ('escaneada' / 'eliminada') y contadores de otro proceso, anotándolos en el diario propio"""
+        with self._lock:
+            for entrada in entradas:
+                url = entrada['url']
+                anterior = self.registro['urls_escaneadas'].get(url)
+                if anterior and anterior.get('inmobiliaria'):
+                    self._urls_por_inmobiliaria.get(anterior['inmobiliaria'], set()).discard(url)
+                self._seguir_orden(self.registro, entrada)
+                self._aplicar(self.registro, entrada)
+                datos = self.registro['urls_escaneadas'].get(url)
+                if datos and datos.get('inmobiliaria'):
+                    self._urls_por_inmobiliaria.setdefault(datos['inmobiliaria'], set()).add(url)
+                self._anotar(entrada)
+            
+            for clave, incremento in estadisticas.items():
+                self.registro['estadisticas'][clave] += incremento
+            if not E_COMPLETO:
+                self.registro['estadisticas']['ultimo_escaneo_incremental'] = datetime.now().isoformat()
+            self._anotar({'op': 'estadisticas', 'valor': self.registro['estadisticas']})
+    
+    def guardar_registro(self, compactar: bool = False):
+        """Checkpoint del registro: fuerza el diario a disco; con compactar=True escribe la foto completa"""
         try:
-            with open(self.archivo_registro, 'w', encoding='utf-8') as f:
-                json.dump(self.registro, f, ensure_ascii=False, indent=2)
+            if not compactar:
+                self.motor.sincronizar_registro()
+                return
+            with self._lock:
+                self._ordenar_nuevas()
+                self.motor.guardar_registro(self.registro)
         except Exception as e:
             print(f"Error guardando registro: {e}")
     
+    def _ordenar_nuevas(self):
+        """Deja las URLs añadidas en esta ejecución en el orden de la lista de inmobiliarias (tras las que ya había),
+        sea cual sea el orden en que las anotaron los hilos"""
+        for seccion, orden in (('urls_escaneadas', self._orden_escaneadas), ('urls_eliminadas', self._orden_eliminadas)):
+            if orden:
+                urls = self.registro[seccion]
+                en_orden = sorted(urls, key=lambda url: (url in orden, clave_orden(orden.get(url))))
+                self.registro[seccion] = {url: urls[url] for url in en_orden}
+                orden.clear()
+    
     def calcular_hash_contenido(self, precio: Optional[int], estado: Optional[str]) -> str:
         """Calcula hash MD5 del precio Y estado para detectar cambios importantes"""
         precio_str = str(precio) if precio is not None else "None"
@@ -244,59 +1160,140 @@ class RegistroScraping:
         return hashlib.md5(contenido.encode()).hexdigest()[:8]
     
     def url_necesita_escaneo(self, url: str, precio: Optional[int], estado: Optional[str]) -> bool:
-        """Determina si una URL necesita ser escaneada"""
+        """Determina si una URL necesita ser escaneada (precio y estado tal como los muestra el listado)"""
         if E_COMPLETO:
             return True  # En modo completo, escanear todas
         
-        if url not in self.registro['urls_escaneadas']:
+        with self._lock:
+            datos = self.registro['urls_escaneadas'].get(url)
+        if datos is None:
             return True  # URL nueva, siempre escanear
         
-        # En modo incremental, solo escanear si cambió el precio O el estado
+        # En modo incremental, solo escanear si cambió el precio O el estado.
+        # Se compara con lo que mostraba el listado la última vez (el detalle puede formatearlos distinto)
         hash_actual = self.calcular_hash_contenido(precio, estado)
-        hash_anterior = self.registro['urls_escaneadas'][url].get('hash_contenido', '')
+        hash_anterior = datos.get('hash_listado', datos.get('hash_contenido', ''))
         
         return hash_actual != hash_anterior
     
-    def registrar_url_escaneada(self, url: str, precio: Optional[int], estado: Optional[str]):
-        """Registra una URL como escaneada con su hash de contenido"""
+    def url_necesita_verificacion(self, url: str, lastmod: Optional[str]) -> bool:
+        """En modo completo: verificar si el sitemap trae otro lastmod, si no lo trae o si la última verificación es antigua"""
+        with self._lock:
+            datos = self.registro['urls_escaneadas'].get(url)
+        if not datos or not lastmod or lastmod != datos.get('lastmod'):
+            return True
+        try:
+            ultimo_escaneo = datetime.fromisoformat(datos['fecha_ultimo_escaneo'])
+        except (KeyError, ValueError):
+            return True
+        return datetime.now() - ultimo_escaneo > timedelta(days=MAX_DIAS_SIN_VERIFICAR)
+    
+    def registrar_url_escaneada(self, url: str, precio: Optional[int], estado: Optional[str],
+                                inmobiliaria: Optional[str] = None, lastmod: Optional[str] = None,
+                                datos_listado: Optional[Tuple[Optional[int], Optional[str]]] = None,
+                                orden: Optional[int] = None):
+        """Registra una URL como escaneada con su hash de contenido, la inmobiliaria que la publica,
+        el lastmod del sitemap y el (precio, estado) del listado con los que se verificó.
+        orden es la posición de la inmobiliaria en la lista de main (fija el orden al compactar)"""
         hash_contenido = self.calcular_hash_contenido(precio, estado)
-        self.registro['urls_escaneadas'][url] = {
-            'hash_contenido': hash_contenido,
-            'fecha_ultimo_escaneo': datetime.now().isoformat()
-        }
-        
-        # Si estaba marcada como eliminada, quitarla de ahí
-        if url in self.registro['urls_eliminadas']:
-            del self.registro['urls_eliminadas'][url]
-        
-        self.registro['estadisticas']['total_urls_conocidas'] = len(self.registro['urls_escaneadas'])
+        with self._lock:
+            anterior = self.registro['urls_escaneadas'].get(url, {})
+            inmobiliaria = inmobiliaria or anterior.get('inmobiliaria')
+            if anterior.get('inmobiliaria') and anterior['inmobiliaria'] != inmobiliaria:
+                self._urls_por_inmobiliaria[anterior['inmobiliaria']].discard(url)
+            if url not in self.registro['urls_escaneadas']:
+                self._orden_escaneadas[url] = orden
+            
+            self.registro['urls_escaneadas'][url] = {
+                'hash_contenido': hash_contenido,
+                'fecha_ultimo_escaneo': datetime.now().isoformat()
+            }
+            if lastmod:
+                self.registro['urls_escaneadas'][url]['lastmod'] = lastmod
+            if datos_listado is not None:
+                self.registro['urls_escaneadas'][url]['hash_listado'] = self.calcular_hash_contenido(*datos_listado)
+            if inmobiliaria:
+                self.registro['urls_escaneadas'][url]['inmobiliaria'] = inmobiliaria
+                self._urls_por_inmobiliaria.setdefault(inmobiliaria, set()).add(url)
+            
+            # Si estaba marcada como eliminada, quitarla de ahí
+            if url in self.registro['urls_eliminadas']:
+                del self.registro['urls_eliminadas'][url]
+            
+            self.registro['estadisticas']['total_urls_conocidas'] = len(self.registro['urls_escaneadas'])
+            entrada = {'op': 'escaneada', 'url': url, 'datos': self.registro['urls_escaneadas'][url]}
+            if orden is not None:
+                entrada['orden'] = orden
+            self._anotar(entrada)
     
     def obtener_urls_conocidas(self) -> Set[str]:
         """Retorna el conjunto de URLs ya conocidas"""
-        return set(self.registro['urls_escaneadas'].keys())
+        with self._lock:
+            return set(self.registro['urls_escaneadas'].keys())
+    
+    def asignar_inmobiliarias(self, propiedades_por_url: Dict[str, Dict]) -> int:
+        """Completa la inmobiliaria de URLs registradas antes de que se guardara, a partir de las propiedades"""
+        asignadas = 0
+        with self._lock:
+            for url, datos in self.registro['urls_escaneadas'].items():
+                if datos.get('inmobiliaria'):
+                    continue
+                prop = propiedades_por_url.get(url)
+                if prop and prop.get('inmobiliaria'):
+                    datos['inmobiliaria'] = prop['inmobiliaria']
+                    self._urls_por_inmobiliaria.setdefault(prop['inmobiliaria'], set()).add(url)
+                    self._anotar({'op': 'escaneada', 'url': url, 'datos': datos})
+                    asignadas += 1
+        return asignadas
+    
+    def urls_de_inmobiliaria(self, inmobiliaria: str) -> Set[str]:
+        """URLs conocidas (activas) de una inmobiliaria"""
+        with self._lock:
+            return set(self._urls_por_inmobiliaria.get(inmobiliaria, ()))
+    
+    def comparar_inmobiliaria(self, inmobiliaria: str, urls_encontradas: Set[str]) -> Tuple[Set[str], Set[str], Set[str]]:
+        """Compara lo publicado hoy con lo conocido: retorna (conocidas, vistas, eliminadas) de la inmobiliaria"""
+        conocidas = self.urls_de_inmobiliaria(inmobiliaria)
+        vistas = conocidas & urls_encontradas
+        eliminadas = conocidas - urls_encontradas
+        return conocidas, vistas, eliminadas
     
     def marcar_ejecucion_completa(self):
         """Marca que se ejecutó un escaneo completo"""
-        self.registro['ultima_ejecucion_completa'] = datetime.now().isoformat()
+        with self._lock:
+            self.registro['ultima_ejecucion_completa'] = datetime.now().isoformat()
+            self._anotar({'op': 'completa', 'fecha': self.registro['ultima_ejecucion_completa']})
 
-    def marcar_urls_eliminadas(self, urls_eliminadas: Set[str]) -> int:
+    def marcar_urls_eliminadas(self, urls_eliminadas: Set[str], orden: Optional[int] = None) -> int:
         """Marca como eliminadas EXACTAMENTE las URLs recibidas (ya filtradas por inmobiliaria)."""
         eliminadas_count = 0
-        for url in urls_eliminadas:
-            if url not in self.registro['urls_eliminadas']:
-                # Si quieres, aquí puedes rellenar 'ultima_referencia' si la guardas en otro lado
-                self.registro['urls_eliminadas'][url] = {
-                    'fecha_eliminacion': datetime.now().isoformat(),
-                    'ultima_referencia': "desconocida"
-                }
-                eliminadas_count += 1
-
-            # Quitar del pool de conocidas activas si estaba
-            if url in self.registro['urls_escaneadas']:
-                del self.registro['urls_escaneadas'][url]
-
+        with self._lock:
+            for url in urls_eliminadas:
+                datos_eliminacion = None
+                if url not in self.registro['urls_eliminadas']:
+                    # Si quieres, aquí puedes rellenar 'ultima_referencia' si la guardas en otro lado
+                    datos_eliminacion = {
+                        'fecha_eliminacion': datetime.now().isoformat(),
+                        'ultima_referencia': "desconocida"
+                    }
+                    self.registro['urls_eliminadas'][url] = datos_eliminacion
+                    self._orden_eliminadas[url] = orden
+                    eliminadas_count += 1
+
+                # Quitar del pool de conocidas activas si estaba
+                if url in self.registro['urls_escaneadas']:
+                    datos = self.registro['urls_escaneadas'].pop(url)
+                    if datos.get('inmobiliaria'):
+                        self._urls_por_inmobiliaria[datos['inmobiliaria']].discard(url)
+                entrada = {'op': 'eliminada', 'url': url, 'datos': datos_eliminacion}
+                if orden is not None:
+                    entrada['orden'] = orden
+                self._anotar(entrada)
+
+            if eliminadas_count > 0:
+                self.registro['estadisticas']['urls_eliminadas'] += eliminadas_count
+                self._anotar({'op': 'estadisticas', 'valor': self.registro['estadisticas']})
         if eliminadas_count > 0:
-            self.registro['estadisticas']['urls_eliminadas'] += eliminadas_count
             print(f"  🗑️ {eliminadas_count} URLs marcadas como eliminadas")
 
         return eliminadas_count
@@ -304,90 +1301,174 @@ class RegistroScraping:
     
     def actualizar_estadisticas(self, cambios_detectados: int = 0):
         """Actualiza las estadísticas del registro"""
-        if not E_COMPLETO:
-            self.registro['estadisticas']['ultimo_escaneo_incremental'] = datetime.now().isoformat()
-        self.registro['estadisticas']['cambios_detectados'] += cambios_detectados
+        with self._lock:
+            if not E_COMPLETO:
+                self.registro['estadisticas']['ultimo_escaneo_incremental'] = datetime.now().isoformat()
+            self.registro['estadisticas']['cambios_detectados'] += cambios_detectados
+            self._anotar({'op': 'estadisticas', 'valor': self.registro['estadisticas']})
+
+def crear_motor_almacenamiento() -> MotorAlmacenamiento:
+    """Motor elegido con MOTOR_ALMACENAMIENTO; en ambos casos se generan los JSON que publica Pages"""
+    if MOTOR_ALMACENAMIENTO == 'sqlite':
+        return MotorSQLite(ARCHIVO_BD, ARCHIVO_PROPIEDADES, ARCHIVO_REGISTRO)
+    return MotorJSON(ARCHIVO_PROPIEDADES, ARCHIVO_TEMP, ARCHIVO_REGISTRO)
+
 
 class GestorPropiedades:
     """Maneja la carga, actualización y guardado de propiedades con preservación de fechas"""
     
-    def __init__(self, archivo_propiedades: str, archivo_temp: str):
+    def __init__(self, archivo_propiedades: str, archivo_temp: str, motor: Optional[MotorAlmacenamiento] = None):
         self.archivo_propiedades = archivo_propiedades
         self.archivo_temp = archivo_temp
-        self.propiedades_actuales = self._cargar_propiedades()
+        self.motor = motor or MotorJSON(archivo_propiedades=archivo_propiedades, archivo_temp=archivo_temp)
+        self.propiedades_actuales = self.motor.cargar_propiedades()
         self.propiedades_procesadas = []
+        self._orden_procesadas: List[Optional[int]] = []  # posición de la inmobiliaria de cada alta (para compactar)
         self.propiedades_por_inmobiliaria = {}  # Nuevo: organizar por inmobiliaria
+        self._lock = threading.RLock()  # varias inmobiliarias escriben a la vez
+        
+        # Índices mantenidos en cada alta/actualización (evitan recorrer la lista por URL)
+        self._actuales_por_url: Dict[str, Dict] = {}        # {url_detalle: propiedad} de propiedades_actuales
+        self._posicion_por_url: Dict[str, int] = {}         # {url_detalle: índice en propiedades_actuales}
+        self._urls_cambiadas: Set[str] = set()  # lo que hay que guardar al compactar (el resto no se toca)
+        self._reconstruir_indices()
+        self._recuperar_diario()
     
-    def _cargar_propiedades(self) -> List[Dict]:
-        """Carga propiedades existentes"""
-        if os.path.exists(self.archivo_propiedades):
-            try:
-                with open(self.archivo_propiedades, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    # Si es el formato antiguo (lista), convertir al nuevo formato
-                    if isinstance(data, list):
-                        return data
-                    # Si es el nuevo formato (dict por inmobiliaria), aplanar
-                    elif isinstance(data, dict):
-                        propiedades = []
-                        for inmobiliaria, props in data.items():
-                            if isinstance(props, list):
-                                propiedades.extend(props)
-                        return propiedades
-            except Exception as e:
-                print(f"Error cargando propiedades existentes: {e}")
-        return []
+    def _recuperar_diario(self):
+        """Si la ejecución anterior se cortó, reaplica los cambios anotados en el diario"""
+        entradas = self.motor.cambios_propiedades()
+        if not entradas:
+            return
+        for entrada in entradas:
+            if entrada.get('op') != 'alta':
+                self._aplicar(entrada)
+        # Las altas ya se descargaron en la ejecución cortada: cuentan como existentes (el filtro incremental las omite).
+        # Son URLs nuevas, independientes del resto de cambios: se añaden en el orden de la lista de inmobiliarias
+        altas = [entrada for entrada in entradas if entrada.get('op') == 'alta']
+        for entrada in sorted(altas, key=lambda entrada: clave_orden(entrada.get('orden'))):
+            self._incorporar_actual(entrada['prop'])
+        print(f"♻️ Recuperados {len(entradas)} cambios de la ejecución anterior")
+    
+    def _incorporar_actual(self, propiedad: Dict):
+        """Añade una propiedad a propiedades_actuales manteniendo los índices (si ya estaba, la reemplaza)"""
+        url = propiedad['url_detalle']
+        if url in self._posicion_por_url:
+            self._reemplazar(propiedad)
+            return
+        self._posicion_por_url[url] = len(self.propiedades_actuales)
+        self._actuales_por_url[url] = propiedad
+        self.propiedades_actuales.append(propiedad)
+        self._urls_cambiadas.add(url)
+    
+    def _aplicar(self, entrada: Dict):
+        """Aplica un cambio con el formato del diario (alta, actualizacion, eliminada)"""
+        op = entrada.get('op')
+        if op == 'alta':
+            self._registrar_alta(entrada['prop'], entrada.get('orden'))
+        elif op == 'actualizacion':
+            self._reemplazar(entrada['prop'])
+        elif op == 'eliminada':
+            prop = self._actuales_por_url.get(entrada['url'])
+            if prop is not None:
+                self._marcar_eliminada(prop, entrada['fecha'])
+    
+    def exportar_foto(self, ruta: str):
+        """Escribe el catálogo tal como está ahora (punto de partida de los procesos por inmobiliaria)"""
+        with self._lock:
+            escribir_json_atomico(ruta, self.propiedades_actuales + self.propiedades_procesadas, indent=None)
+    
+    def incorporar_cambios(self, entradas: List[Dict]):
+        """Incorpora los cambios de otro proceso (su diario) y los anota en el diario propio"""
+        with self._lock:
+            for entrada in entradas:
+                self._aplicar(entrada)
+                self._anotar(entrada)
+    
+    def _reconstruir_indices(self):
+        """Construye los índices desde cero (solo al cargar)"""
+        self._actuales_por_url.clear()
+        self._posicion_por_url.clear()
+        for i, prop in enumerate(self.propiedades_actuales):
+            url = prop['url_detalle']
+            if url not in self._posicion_por_url:  # con duplicados manda la primera aparición
+                self._posicion_por_url[url] = i
+                self._actuales_por_url[url] = prop
     
     def obtener_urls_existentes(self) -> Dict[str, Dict]:
-        """Retorna un diccionario {url: propiedad} de propiedades existentes"""
-        return {prop['url_detalle']: prop for prop in self.propiedades_actuales}
+        """Retorna un diccionario {url: propiedad} de propiedades existentes (índice vivo, solo lectura)"""
+        return self._actuales_por_url
     
-    def agregar_propiedad(self, propiedad: Dict):
-        """Agrega una nueva propiedad al buffer y organiza por inmobiliaria"""
+    def obtener_propiedad(self, url: str) -> Optional[Dict]:
+        """Retorna la propiedad existente con esa URL o None"""
+        return self._actuales_por_url.get(url)
+    
+    def agregar_propiedad(self, propiedad: Dict, orden: Optional[int] = None):
+        """Agrega una nueva propiedad al buffer y organiza por inmobiliaria.
+        orden es la posición de la inmobiliaria en la lista de main (fija el orden al compactar)"""
+        with self._lock:
+            self._registrar_alta(propiedad, orden)
+            entrada = {'op': 'alta', 'prop': propiedad}
+            if orden is not None:
+                entrada['orden'] = orden
+            self._anotar(entrada)
+            
+            # Informar del progreso cada 10 propiedades (el diario ya está al día)
+            if len(self.propiedades_procesadas) % 10 == 0:
+                total = len(self.propiedades_actuales) + len(self.propiedades_procesadas)
+                print(f"💾 Progreso guardado: {total} propiedades")
+    
+    def _registrar_alta(self, propiedad: Dict, orden: Optional[int] = None):
         inmobiliaria = propiedad.get('inmobiliaria', 'Desconocida')
-        
         if inmobiliaria not in self.propiedades_por_inmobiliaria:
             self.propiedades_por_inmobiliaria[inmobiliaria] = []
         
         self.propiedades_por_inmobiliaria[inmobiliaria].append(propiedad)
         self.propiedades_procesadas.append(propiedad)
-        
-        # Guardar progreso cada 10 propiedades
-        if len(self.propiedades_procesadas) % 10 == 0:
-            self._guardar_progreso()
-
-    def _guardar_progreso(self):
-        """Guarda el progreso actual en archivo temporal"""
+        self._orden_procesadas.append(orden)
+        self._urls_cambiadas.add(propiedad['url_detalle'])
+    
+    def _anotar(self, entrada: Dict):
+        """Anota un cambio en el diario de progreso (coste proporcional al cambio, no al catálogo)"""
         try:
-            todas_propiedades = self.propiedades_actuales + self.propiedades_procesadas
-            with open(self.archivo_temp, 'w', encoding='utf-8') as f:
-                json.dump(todas_propiedades, f, ensure_ascii=False, indent=2)
-            print(f"💾 Progreso guardado: {len(todas_propiedades)} propiedades")
+            self.motor.anotar_propiedad(entrada)
         except Exception as e:
             print(f"⚠️ Error guardando progreso: {e}")
-
+    
     
     def actualizar_propiedad_existente(self, url: str, nueva_propiedad: Dict) -> bool:
         """Actualiza una propiedad existente preservando la fecha_scraping original"""
-        for i, prop in enumerate(self.propiedades_actuales):
-            if prop['url_detalle'] == url:
-                # Calcular hashes para detectar cambios
-                hash_anterior = self._calcular_hash_propiedad(prop)
-                hash_nuevo = self._calcular_hash_propiedad(nueva_propiedad)
+        with self._lock:
+            i = self._posicion_por_url.get(url)
+            if i is None:
+                return False
+            prop = self.propiedades_actuales[i]
+            
+            # Calcular hashes para detectar cambios
+            hash_anterior = self._calcular_hash_propiedad(prop)
+            hash_nuevo = self._calcular_hash_propiedad(nueva_propiedad)
+            
+            if hash_anterior != hash_nuevo:
+                # PRESERVAR fecha_scraping original
+                fecha_original = prop.get('fecha_scraping')
+                nueva_propiedad['fecha_scraping'] = fecha_original
+                nueva_propiedad['fecha_ultima_actualizacion'] = datetime.now().isoformat()
                 
-                if hash_anterior != hash_nuevo:
-                    # PRESERVAR fecha_scraping original
-                    fecha_original = prop.get('fecha_scraping')
-                    nueva_propiedad['fecha_scraping'] = fecha_original
-                    nueva_propiedad['fecha_ultima_actualizacion'] = datetime.now().isoformat()
-                    
-                    self.propiedades_actuales[i] = nueva_propiedad
-                    print(f"  🔄 Actualizada propiedad {nueva_propiedad.get('referencia', 'S/N')} - Contenido cambió")
-                    return True
-                else:
-                    print(f"  ⭐️ Sin cambios en {nueva_propiedad.get('referencia', 'S/N')}")
-                    return False
-        return False
+                self._reemplazar(nueva_propiedad)
+                self._anotar({'op': 'actualizacion', 'prop': nueva_propiedad})
+                print(f"  🔄 Actualizada propiedad {nueva_propiedad.get('referencia', 'S/N')} - Contenido cambió")
+                return True
+            else:
+                print(f"  ⭐️ Sin cambios en {nueva_propiedad.get('referencia', 'S/N')}")
+                return False
+    
+    def _reemplazar(self, nueva_propiedad: Dict):
+        url = nueva_propiedad['url_detalle']
+        i = self._posicion_por_url.get(url)
+        if i is None:
+            return
+        self.propiedades_actuales[i] = nueva_propiedad
+        self._actuales_por_url[url] = nueva_propiedad
+        self._urls_cambiadas.add(url)
     
     def _calcular_hash_propiedad(self, propiedad: Dict) -> str:
         """Calcula hash basado en precio y estado"""
@@ -401,22 +1482,34 @@ class GestorPropiedades:
     def marcar_propiedades_eliminadas(self, urls_eliminadas: Set[str]) -> int:
         """Marca propiedades como vendidas si sus URLs fueron eliminadas"""
         eliminadas_count = 0
-        for i, prop in enumerate(self.propiedades_actuales):
-            if prop['url_detalle'] in urls_eliminadas and not prop.get('vendido', False):
-                self.propiedades_actuales[i]['vendido'] = True
-                self.propiedades_actuales[i]['estado'] = 'ELIMINADO_WEB'
-                self.propiedades_actuales[i]['fecha_eliminacion'] = datetime.now().isoformat()
-                eliminadas_count += 1
-                print(f"  🗑️ Marcada como eliminada: {prop.get('referencia', 'S/N')}")
+        with self._lock:
+            for url in urls_eliminadas:
+                prop = self._actuales_por_url.get(url)
+                if prop is not None and not prop.get('vendido', False):
+                    fecha = datetime.now().isoformat()
+                    self._marcar_eliminada(prop, fecha)
+                    self._anotar({'op': 'eliminada', 'url': url, 'fecha': fecha})
+                    eliminadas_count += 1
+                    print(f"  🗑️ Marcada como eliminada: {prop.get('referencia', 'S/N')}")
         
         return eliminadas_count
     
+    def _marcar_eliminada(self, prop: Dict, fecha: str):
+        self._urls_cambiadas.add(prop['url_detalle'])
+        prop['vendido'] = True
+        prop['estado'] = 'ELIMINADO_WEB'
+        prop['fecha_eliminacion'] = fecha
+    
     def finalizar_y_guardar(self, guardar_por_inmobiliaria: bool = False):
         """Finaliza el proceso y guarda el archivo definitivo"""
+        # Las altas de cada inmobiliaria en el orden de la lista (los hilos las anotan en el que terminan)
+        posiciones = sorted(range(len(self.propiedades_procesadas)),
+                            key=lambda i: clave_orden(self._orden_procesadas[i]))
+        procesadas = [self.propiedades_procesadas[i] for i in posiciones]
         if E_COMPLETO:
-            todas_propiedades = self.propiedades_actuales + self.propiedades_procesadas
+            todas_propiedades = self.propiedades_actuales + procesadas
         else:
-            todas_propiedades = self.propiedades_actuales + self.propiedades_procesadas
+            todas_propiedades = self.propiedades_actuales + procesadas
         
         # Eliminar duplicados por URL (mantener la más reciente por fecha_scraping)
         propiedades_unicas = {}
@@ -445,27 +1538,10 @@ class GestorPropiedades:
         resultado_final = list(propiedades_unicas.values())
         
         try:
-            if guardar_por_inmobiliaria:
-                # Organizar por inmobiliaria
-                propiedades_organizadas = {}
-                for prop in resultado_final:
-                    inmobiliaria = prop.get('inmobiliaria', 'Desconocida')
-                    if inmobiliaria not in propiedades_organizadas:
-                        propiedades_organizadas[inmobiliaria] = []
-                    propiedades_organizadas[inmobiliaria].append(prop)
-                
-                # Guardar en formato organizado
-                with open(self.archivo_propiedades, 'w', encoding='utf-8') as f:
-                    json.dump(propiedades_organizadas, f, ensure_ascii=False, indent=2)
-            else:
-                # Guardar en formato plano (lista)
-                with open(self.archivo_propiedades, 'w', encoding='utf-8') as f:
-                    json.dump(resultado_final, f, ensure_ascii=False, indent=2)
+            # Compactación: el motor guarda el catálogo final (plano u organizado por inmobiliaria)
+            self.motor.guardar_propiedades(resultado_final, por_inmobiliaria=guardar_por_inmobiliaria,
+                                           urls_cambiadas=self._urls_cambiadas)
             
-            # Limpiar archivo temporal
-            if os.path.exists(self.archivo_temp):
-                os.remove(self.archivo_temp)
-                
             return len(resultado_final)
         except Exception as e:
             print(f"Error guardando archivo final: {e}")
@@ -508,26 +1584,709 @@ def crear_propiedad_estandar(**kwargs):
         "fecha_ultima_actualizacion": kwargs.get('fecha_ultima_actualizacion', None)  # Nueva para tracking
     }
 
-def is_allowed(url):
-    """Verifica si el scraping está permitido por robots.txt"""
-    parsed = urlparse(url)
-    base = f"{parsed.scheme}://{parsed.netloc}"
-    robots_url = urljoin(base, "/robots.txt")
-    rp = urllib.robotparser.RobotFileParser()
-    try:
-        rp.set_url(robots_url)
-        rp.read()
-        return rp.can_fetch(HEADERS['User-Agent'], url)
-    except:
-        print(f"No se pudo acceder a {robots_url}")
-        return True
+class LimitadorTasa:
+    """Token bucket por host: cada inmobiliaria tiene su ritmo y un host lento no frena a los demás"""
+
+    def __init__(self, tasa: float = TASA_POR_HOST, rafaga: int = RAFAGA_POR_HOST,
+                 limites: Optional[Dict[str, Tuple[float, int]]] = None):
+        self.tasa = tasa
+        self.rafaga = rafaga
+        self.limites = dict(limites or {})
+        self._cubos: Dict[str, Dict] = {}  # {host: {'tokens', 'ultimo', 'tasa', 'rafaga', 'factor', 'bloqueado_hasta'}}
+        self._lock = threading.Lock()
+
+    def _cubo(self, host: str) -> Dict:
+        if host not in self._cubos:
+            tasa, rafaga = self.limites.get(host, (self.tasa, self.rafaga))
+            self._cubos[host] = {
+                'tokens': float(rafaga),
+                'ultimo': time.monotonic(),
+                'tasa': tasa,
+                'rafaga': rafaga,
+                'factor': 1.0,           # >1 mientras el host responde 429/503
+                'bloqueado_hasta': 0.0,  # Retry-After
+            }
+        return self._cubos[host]
+
+    def aplicar_crawl_delay(self, host: str, crawl_delay: Optional[float]):
+        """Ajusta el ritmo del host al Crawl-delay de su robots.txt (nunca lo acelera)"""
+        if not crawl_delay:
+            return
+        with self._lock:
+            cubo = self._cubo(host)
+            cubo['tasa'] = min(cubo['tasa'], 1.0 / float(crawl_delay))
+            cubo['rafaga'] = 1
+            cubo['tokens'] = min(cubo['tokens'], 1.0)
+
+    def esperar(self, url: str):
+        """Bloquea el hilo actual hasta que haya un token libre para el host de la URL"""
+        host = urlparse(url).netloc
+        with self._lock:
+            cubo = self._cubo(host)
+            ahora = time.monotonic()
+            tasa = cubo['tasa'] / cubo['factor']
+            cubo['tokens'] = min(cubo['rafaga'], cubo['tokens'] + (ahora - cubo['ultimo']) * tasa)
+            cubo['ultimo'] = ahora
+            cubo['tokens'] -= 1  # se reserva el token aunque haya que esperar por él
+            espera = -cubo['tokens'] / tasa if cubo['tokens'] < 0 else 0.0
+            espera = max(espera, cubo['bloqueado_hasta'] - ahora)
+        if espera > 0:
+            time.sleep(espera)
+
+    def registrar_respuesta(self, url: str, status: int, retry_after: Optional[str] = None):
+        """Frena el host ante 429/503 y recupera el ritmo poco a poco con respuestas normales"""
+        host = urlparse(url).netloc
+        with self._lock:
+            cubo = self._cubo(host)
+            if status in (429, 503):
+                cubo['factor'] = min(MAX_FACTOR_BACKOFF, cubo['factor'] * 2)
+                if retry_after and retry_after.strip().isdigit():
+                    cubo['bloqueado_hasta'] = time.monotonic() + int(retry_after.strip())
+                print(f"    🐢 {host} respondió {status}: ritmo reducido x{cubo['factor']:.0f}")
+            elif cubo['factor'] > 1.0:
+                cubo['factor'] = max(1.0, cubo['factor'] * 0.9)
+
+limitador_hosts = LimitadorTasa(limites=LIMITES_POR_HOST)
+
+class CacheValidadores:
+    """ETag / Last-Modified por URL entre ejecuciones; de los sitemaps guarda también el cuerpo para reutilizarlo en un 304"""
+
+    def __init__(self, archivo: str, directorio_cuerpos: str):
+        self.archivo = archivo
+        self.directorio_cuerpos = directorio_cuerpos
+        self._lock = threading.Lock()
+        self._entradas: Dict[str, Dict] = self._cargar()  # {url: {'etag', 'last_modified', 'cuerpo'}}
+        self._cambios = False
+        self._modificadas: Set[str] = set()  # URLs registradas u olvidadas en esta ejecución
+
+    def _cargar(self) -> Dict[str, Dict]:
+        if os.path.exists(self.archivo):
+            try:
+                with open(self.archivo, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except Exception as e:
+                print(f"⚠️ Error cargando validadores HTTP: {e}")
+        return {}
+
+    def cabeceras(self, url: str) -> Dict[str, str]:
+        """Cabeceras If-None-Match / If-Modified-Since para la URL (vacío si no hay validadores)"""
+        with self._lock:
+            entrada = self._entradas.get(url)
+        if not entrada:
+            return {}
+        cabeceras = {}
+        if entrada.get('etag'):
+            cabeceras['If-None-Match'] = entrada['etag']
+        if entrada.get('last_modified'):
+            cabeceras['If-Modified-Since'] = entrada['last_modified']
+        return cabeceras
+
+    def registrar(self, url: str, respuesta: requests.Response, cuerpo: Optional[str] = None):
+        """Guarda los validadores de una respuesta 200 (y el nombre del archivo con su cuerpo, si se guardó)"""
+        etag = respuesta.headers.get('ETag')
+        last_modified = respuesta.headers.get('Last-Modified')
+        if not etag and not last_modified:
+            self.olvidar(url)
+            return
+        entrada = {'etag': etag, 'last_modified': last_modified}
+        if cuerpo:
+            entrada['cuerpo'] = cuerpo
+        with self._lock:
+            self._entradas[url] = entrada
+            self._modificadas.add(url)
+            self._cambios = True
+
+    def guardar_cuerpo_por_trozos(self, url: str, respuesta: requests.Response,
+                                  trozos: Iterator[bytes]) -> Iterator[bytes]:
+        """Deja pasar los trozos mientras los escribe en disco; si se leen todos, registra validadores y cuerpo"""
+        os.makedirs(self.directorio_cuerpos, exist_ok=True)
+        nombre = hashlib.md5(url.encode()).hexdigest() + '.cuerpo'
+        ruta = os.path.join(self.directorio_cuerpos, nombre)
+        temporal = ruta + f'.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            with open(temporal, 'wb') as f:
+                for trozo in trozos:
+                    f.write(trozo)
+                    yield trozo
+            os.replace(temporal, ruta)
+        except BaseException:  # lectura cortada (error o el consumidor paró): el cuerpo anterior sigue valiendo
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            raise
+        self.registrar(url, respuesta, cuerpo=nombre)
+
+    def olvidar(self, url: str):
+        with self._lock:
+            if self._entradas.pop(url, None) is not None:
+                self._modificadas.add(url)
+                self._cambios = True
+
+    def cambios(self) -> Dict[str, Optional[Dict]]:
+        """Entradas registradas (o None si se olvidaron) en esta ejecución, para pasarlas a otro proceso"""
+        with self._lock:
+            return {url: self._entradas.get(url) for url in self._modificadas}
+
+    def incorporar(self, cambios: Dict[str, Optional[Dict]]):
+        """Aplica los cambios devueltos por otro proceso"""
+        with self._lock:
+            for url, entrada in cambios.items():
+                if entrada is None:
+                    self._entradas.pop(url, None)
+                else:
+                    self._entradas[url] = entrada
+                self._modificadas.add(url)
+            if cambios:
+                self._cambios = True
+
+    def ruta_cuerpo(self, url: str) -> Optional[str]:
+        """Archivo con el cuerpo 200 guardado de la URL (None si no se guardó o ya no existe)"""
+        with self._lock:
+            entrada = self._entradas.get(url)
+        if not entrada or not entrada.get('cuerpo'):
+            return None
+        ruta = os.path.join(self.directorio_cuerpos, entrada['cuerpo'])
+        return ruta if os.path.exists(ruta) else None
+
+    def guardar(self):
+        with self._lock:
+            if not self._cambios:
+                return
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.archivo)), exist_ok=True)
+                escribir_json_atomico(self.archivo, self._entradas, indent=None)
+                self._cambios = False
+            except Exception as e:
+                print(f"⚠️ Error guardando validadores HTTP: {e}")
+
+validadores_http = CacheValidadores(ARCHIVO_VALIDADORES, DIR_CUERPOS_HTTP) if CACHE_HTTP else None
+
+class ClienteHTTP:
+    """Sesión HTTP compartida por todos los scrapers: keep-alive por host, reintentos, timeouts y límite de tasa"""
+
+    def __init__(self, limitador: LimitadorTasa, timeout: Tuple[float, float] = (TIMEOUT_CONEXION, TIMEOUT_LECTURA),
+                 reintentos: int = REINTENTOS_HTTP, backoff: float = BACKOFF_HTTP,
+                 validadores: Optional[CacheValidadores] = None):
+        self.limitador = limitador
+        self.timeout = timeout
+        self.validadores = validadores
+        self._local = threading.local()  # respuestas ya descargadas que el scraper del hilo va a pedir
+        self.sesion = requests.Session()
+        self.sesion.headers.update(HEADERS)
+
+        # 429/503 no se reintentan aquí: los gestiona el limitador para frenar todo el host
+        politica = Retry(
+            total=reintentos,
+            backoff_factor=backoff,
+            status_forcelist=(500, 502, 504),
+            allowed_methods=frozenset(['GET', 'HEAD']),
+            raise_on_status=False,
+        )
+        adaptador = HTTPAdapter(
+            pool_connections=32,  # un pool por host (18 inmobiliarias + margen)
+            pool_maxsize=max(MAX_HILOS_DETALLE * 2, 10),
+            max_retries=politica,
+        )
+        self.sesion.mount('https://', adaptador)
+        self.sesion.mount('http://', adaptador)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """GET que espera turno en el limitador del host y le informa del resultado"""
+        precargada = self._tomar_precargada(url)
+        if precargada is not None:
+            return precargada
+        kwargs.setdefault('timeout', self.timeout)
+        self.limitador.esperar(url)
+        r = self.sesion.get(url, **kwargs)
+        self.limitador.registrar_respuesta(url, r.status_code, r.headers.get('Retry-After'))
+        return r
+
+    def get_condicional(self, url: str, **kwargs) -> requests.Response:
+        """GET con If-None-Match / If-Modified-Since si hay validadores guardados (puede devolver 304)"""
+        cabeceras = self.validadores.cabeceras(url) if self.validadores else {}
+        return self.get(url, headers=cabeceras, **kwargs) if cabeceras else self.get(url, **kwargs)
+
+    def trozos_con_cache(self, url: str, tamano: int = 64 * 1024) -> Iterator[bytes]:
+        """Cuerpo de la URL por trozos según se descarga; ante un 304 lo lee del cuerpo guardado (para sitemaps)"""
+        # Solo se pide condicional si hay cuerpo guardado: un 304 sin él obligaría a descargar dos veces
+        ruta = self.validadores.ruta_cuerpo(url) if self.validadores is not None else None
+        if ruta is not None:
+            r = self.get_condicional(url, stream=True)
+            if r.status_code == 304:
+                r.close()
+                with open(ruta, 'rb') as f:
+                    yield from iter(lambda: f.read(tamano), b'')
+                return
+        else:
+            r = self.get(url, stream=True)
+        with r:
+            r.raise_for_status()
+            trozos = r.iter_content(tamano)
+            if self.validadores is not None and r.status_code == 200:
+                trozos = self.validadores.guardar_cuerpo_por_trozos(url, r, trozos)
+            yield from trozos
+
+    def precargar(self, url: str, respuesta: Optional[requests.Response]):
+        """La próxima get(url) de este hilo devuelve esta respuesta sin volver a descargarla (None la descarta)"""
+        self._local.precargadas = {url: respuesta} if respuesta is not None else {}
+
+    def _tomar_precargada(self, url: str) -> Optional[requests.Response]:
+        precargadas = getattr(self._local, 'precargadas', None)
+        return precargadas.pop(url, None) if precargadas else None
+
+cliente_http = ClienteHTTP(limitador_hosts, validadores=validadores_http)
+
+class PoliticasRobots:
+    """Caché de robots.txt por host con caducidad: solo se descarga la primera vez que se visita cada host"""
+
+    def __init__(self, cliente: ClienteHTTP, limitador: LimitadorTasa,
+                 ttl: float = ROBOTS_TTL, archivo: Optional[str] = None):
+        self.cliente = cliente
+        self.limitador = limitador
+        self.ttl = ttl
+        self.archivo = archivo
+        self._entradas: Dict[str, Dict] = {}  # {host: {'estado': str, 'texto': str, 'caduca': float}}
+        self._parsers: Dict[str, urllib.robotparser.RobotFileParser] = {}
+        self._locks_host: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        if archivo:
+            self._cargar()
+
+    def _cargar(self):
+        """Carga las políticas guardadas en disco que sigan vigentes"""
+        if not os.path.exists(self.archivo):
+            return
+        try:
+            with open(self.archivo, 'r', encoding='utf-8') as f:
+                entradas = json.load(f)
+        except Exception as e:
+            print(f"Error cargando caché de robots.txt: {e}")
+            return
+        ahora = time.time()
+        for host, entrada in entradas.items():
+            if entrada.get('caduca', 0) > ahora:
+                self._instalar(host, entrada)
+
+    def guardar(self):
+        """Guarda en disco las políticas vigentes (solo si la caché es persistente)"""
+        if not self.archivo:
+            return
+        ahora = time.time()
+        with self._lock:
+            vigentes = {h: e for h, e in self._entradas.items() if e['caduca'] > ahora}
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.archivo)), exist_ok=True)
+            escribir_json_atomico(self.archivo, vigentes)
+        except Exception as e:
+            print(f"Error guardando caché de robots.txt: {e}")
+
+    def _instalar(self, host: str, entrada: Dict):
+        """Construye el parser de una entrada y pasa su Crawl-delay al limitador"""
+        rp = urllib.robotparser.RobotFileParser()
+        if entrada['estado'] == 'denegado':
+            rp.disallow_all = True
+        elif entrada['estado'] == 'permitido':
+            rp.allow_all = True
+        else:
+            rp.parse(entrada['texto'].splitlines())
+        self._entradas[host] = entrada
+        self._parsers[host] = rp
+        self.limitador.aplicar_crawl_delay(host, rp.crawl_delay(HEADERS['User-Agent']))
+
+    def _descargar(self, scheme: str, host: str) -> Dict:
+        """Descarga robots.txt con la misma semántica que RobotFileParser.read()"""
+        robots_url = f"{scheme}://{host}/robots.txt"
+        ahora = time.time()
+        try:
+            r = self.cliente.get(robots_url)
+        except requests.RequestException:
+            print(f"No se pudo acceder a {robots_url}")
+            return {'estado': 'permitido', 'texto': '', 'caduca': ahora + ROBOTS_TTL_ERROR}
+        if r.status_code in (401, 403):
+            return {'estado': 'denegado', 'texto': '', 'caduca': ahora + self.ttl}
+        if 400 <= r.status_code < 500:
+            return {'estado': 'permitido', 'texto': '', 'caduca': ahora + self.ttl}
+        if r.status_code >= 500:
+            return {'estado': 'denegado', 'texto': '', 'caduca': ahora + ROBOTS_TTL_ERROR}
+        return {'estado': 'reglas', 'texto': r.text, 'caduca': ahora + self.ttl}
+
+    def _politica(self, url: str) -> urllib.robotparser.RobotFileParser:
+        parsed = urlparse(url)
+        host = parsed.netloc
+        with self._lock:
+            lock_host = self._locks_host.setdefault(host, threading.Lock())
+        with lock_host:  # un solo hilo descarga el robots.txt de cada host
+            entrada = self._entradas.get(host)
+            if entrada is None or entrada['caduca'] <= time.time():
+                self._instalar(host, self._descargar(parsed.scheme or 'https', host))
+            return self._parsers[host]
+
+    def permitido(self, url: str) -> bool:
+        """Indica si robots.txt permite descargar la URL"""
+        return self._politica(url).can_fetch(HEADERS['User-Agent'], url)
+
+    def crawl_delay(self, url: str) -> Optional[float]:
+        """Crawl-delay declarado para el host de la URL (None si no hay)"""
+        return self._politica(url).crawl_delay(HEADERS['User-Agent'])
+
+politicas_robots = PoliticasRobots(cliente_http, limitador_hosts,
+                                   archivo=ARCHIVO_ROBOTS if ROBOTS_EN_DISCO else None)
+
+def is_allowed(url):
+    """Verifica si el scraping está permitido por robots.txt"""
+    return politicas_robots.permitido(url)
+
+# Resultado de descargar_detalle cuando el servidor responde 304: vale el registro ya guardado
+NO_MODIFICADA = 'NO_MODIFICADA'
+
+def _parsear_respuesta(scraper: str, url: str, referencia, respuesta: Dict, estado_listado: Optional[str]):
+    """Etapa de parseo (en un proceso aparte): el scraper (por su nombre) recibe la página precargada y no toca la red"""
+    scraper_func = scraper_por_nombre(scraper)
+    r = requests.Response()
+    r.status_code = respuesta['status']
+    r.reason = respuesta['reason']
+    r.url = respuesta['url']
+    r.encoding = respuesta['encoding']
+    r.headers.update(respuesta['headers'])
+    r._content = respuesta['contenido']
+    if estado_listado is not None:
+        _estados_listado[url] = estado_listado
+    cliente_http.precargar(url, r)
+    try:
+        return scraper_func(url, referencia)
+    finally:
+        cliente_http.precargar(url, None)
+
+class EtapaParseo:
+    """Pool de procesos que ejecuta los parsers de detalle mientras los hilos siguen descargando.
+    La cola es acotada: si los parsers no dan abasto, los hilos de descarga esperan antes de entregar otra página."""
+
+    def __init__(self, procesos: int, cola: int):
+        self.procesos = procesos
+        self._huecos = threading.BoundedSemaphore(procesos + cola)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _pool_activo(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # spawn: los procesos no heredan locks de los hilos que ya están descargando
+                self._pool = ProcessPoolExecutor(max_workers=self.procesos,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+            return self._pool
+
+    def enviar(self, scraper_func, url: str, referencia, r: requests.Response) -> Future:
+        """Encola una página descargada para parsear; bloquea si la cola está llena"""
+        respuesta = {
+            'status': r.status_code, 'reason': r.reason, 'url': r.url, 'encoding': r.encoding,
+            'headers': dict(r.headers), 'contenido': r.content,
+        }
+        self._huecos.acquire()
+        try:
+            futuro = self._pool_activo().submit(_parsear_respuesta, nombre_scraper(scraper_func), url, referencia,
+                                                respuesta, _estados_listado.get(url))
+        except Exception:
+            self._huecos.release()
+            raise
+        futuro.add_done_callback(lambda _: self._huecos.release())
+        return futuro
+
+    def cerrar(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+etapa_parseo = EtapaParseo(PROCESOS_PARSEO, COLA_PARSEO) if PROCESOS_PARSEO > 1 else None
+
+def _registrar_validadores(url: str, r: requests.Response, data):
+    if data and r.status_code == 200 and validadores_http is not None:
+        validadores_http.registrar(url, r)
+
+def descargar_detalle(scraper_func, url: str, referencia, condicional: bool = False):
+    """Etapa de descarga (en un hilo, respetando robots.txt; el ritmo lo marca cliente_http).
+    Retorna los datos, NO_MODIFICADA, o un Future si el parseo se hace en la EtapaParseo."""
+    if not is_allowed(url):
+        print(f"    🚫 Bloqueado por robots.txt: {url}")
+        return None
+    if validadores_http is None and etapa_parseo is None:
+        return scraper_func(url, referencia)
+    
+    # La página se descarga aquí (condicional si ya hay una propiedad guardada) y el scraper la recibe precargada
+    try:
+        r = cliente_http.get_condicional(url) if condicional else cliente_http.get(url)
+    except Exception as e:
+        print(f"    ❌ Error descargando {url}: {e}")
+        return None
+    if r.status_code == 304:
+        return NO_MODIFICADA
+    
+    if etapa_parseo is not None:
+        futuro = etapa_parseo.enviar(scraper_func, url, referencia, r)
+        futuro.add_done_callback(lambda f: f.exception() is None and _registrar_validadores(url, r, f.result()))
+        return futuro
+    
+    cliente_http.precargar(url, r)
+    try:
+        data = scraper_func(url, referencia)
+    finally:
+        cliente_http.precargar(url, None)
+    _registrar_validadores(url, r, data)
+    return data
+
+class ColaTrabajo:
+    """Interfaz de la cola de descargas de detalle que reparten coordinador y trabajadores (una tarea por URL)"""
+    
+    # Los trabajadores de otras máquinas no pueden avisar: sin aviso, quien espera vuelve a mirar tras este tiempo
+    ESPERA_SIN_AVISO = 5.0
+    
+    def __init__(self):
+        self._avisos = threading.Condition()
+        self._version = 0
+    
+    def version(self) -> int:
+        """Número de resultados publicados en este proceso; se lee antes de consultar para no perder un aviso"""
+        with self._avisos:
+            return self._version
+    
+    def esperar_resultado(self, version: int):
+        """Espera a que un trabajador de este proceso publique un resultado después de version (o ESPERA_SIN_AVISO)"""
+        with self._avisos:
+            self._avisos.wait_for(lambda: self._version != version, timeout=self.ESPERA_SIN_AVISO)
+    
+    def _avisar(self):
+        with self._avisos:
+            self._version += 1
+            self._avisos.notify_all()
+    
+    def encolar(self, tarea: Dict):
+        """Añade la tarea de tarea['url']; si ya está pendiente, en curso o recién hecha la deja como está"""
+        raise NotImplementedError
+    
+    def tomar(self, trabajador: str) -> Optional[Dict]:
+        """Reserva durante LEASE_COLA segundos una tarea pendiente (o cuya reserva venció)"""
+        raise NotImplementedError
+    
+    def completar(self, url: str, trabajador: str, resultado):
+        """Publica el resultado si la reserva sigue siendo de este trabajador"""
+        raise NotImplementedError
+    
+    def fallar(self, url: str, trabajador: str, error: str):
+        """Devuelve la tarea a pendiente, o la da por fallida tras REINTENTOS_COLA intentos"""
+        raise NotImplementedError
+    
+    def consultar(self, url: str) -> Tuple[Optional[str], object]:
+        """(estado, resultado) de la tarea: 'pendiente', 'en_curso', 'hecha', 'fallida' o 'fusionada'"""
+        raise NotImplementedError
+    
+    def marcar_fusionada(self, url: str):
+        """El coordinador ya incorporó el resultado; una nueva ejecución puede volver a encolar la URL"""
+        raise NotImplementedError
+    
+    def cerrar(self):
+        pass
+
+
+class ColaSQLite(ColaTrabajo):
+    """Cola en un archivo SQLite (varios procesos en una máquina, o un volumen compartido con bloqueos fiables)"""
+    
+    ESQUEMA = """
+        CREATE TABLE IF NOT EXISTS tareas (
+            url TEXT PRIMARY KEY,
+            scraper TEXT NOT NULL,
+            referencia TEXT,
+            condicional INTEGER NOT NULL,
+            estado_listado TEXT,
+            estado TEXT NOT NULL,
+            intentos INTEGER NOT NULL DEFAULT 0,
+            trabajador TEXT,
+            vence REAL,
+            resultado TEXT,
+            error TEXT,
+            actualizada REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_tareas_estado ON tareas(estado, actualizada);
+    """
+    
+    def __init__(self, ruta: str):
+        super().__init__()
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        self._conexion = None  # se abre al primer uso (los procesos de parseo importan el módulo y no la usan)
+    
+    def _conectar(self) -> sqlite3.Connection:
+        if self._conexion is None:
+            self._conexion = sqlite3.connect(self.ruta, timeout=30, check_same_thread=False, isolation_level=None)
+            self._conexion.execute('PRAGMA journal_mode=WAL')
+            self._conexion.executescript(self.ESQUEMA)
+        return self._conexion
+    
+    def _ejecutar(self, sql: str, parametros: Tuple = ()) -> List[Tuple]:
+        """Filas de la sentencia, leídas sin soltar el lock (la conexión es compartida entre hilos)"""
+        with self._lock:
+            return self._conectar().execute(sql, parametros).fetchall()
+    
+    def encolar(self, tarea: Dict):
+        ahora = time.time()
+        self._ejecutar("""
+            INSERT INTO tareas (url, scraper, referencia, condicional, estado_listado, estado, intentos, actualizada)
+            VALUES (?, ?, ?, ?, ?, 'pendiente', 0, ?)
+            ON CONFLICT(url) DO UPDATE SET
+                scraper = excluded.scraper, referencia = excluded.referencia, condicional = excluded.condicional,
+                estado_listado = excluded.estado_listado, estado = 'pendiente', intentos = 0, trabajador = NULL,
+                vence = NULL, resultado = NULL, error = NULL, actualizada = excluded.actualizada
+            WHERE tareas.estado IN ('fallida', 'fusionada') OR (tareas.estado = 'hecha' AND tareas.actualizada < ?)
+        """, (tarea['url'], tarea['scraper'], tarea.get('referencia'), int(bool(tarea.get('condicional'))),
+              tarea.get('estado_listado'), ahora, ahora - VIGENCIA_RESULTADOS))
+    
+    def tomar(self, trabajador: str) -> Optional[Dict]:
+        ahora = time.time()
+        with self._lock:
+            conexion = self._conectar()
+            conexion.execute('BEGIN IMMEDIATE')  # nadie más puede tomar la misma tarea entre el SELECT y el UPDATE
+            try:
+                conexion.execute("""
+                    UPDATE tareas SET estado = 'fallida', error = 'reserva vencida', actualizada = ?
+                    WHERE estado = 'en_curso' AND vence < ? AND intentos >= ?
+                """, (ahora, ahora, REINTENTOS_COLA))
+                fila = conexion.execute("""
+                    SELECT url, scraper, referencia, condicional, estado_listado FROM tareas
+                    WHERE estado = 'pendiente' OR (estado = 'en_curso' AND vence < ?)
+                    ORDER BY actualizada LIMIT 1
+                """, (ahora,)).fetchone()
+                if fila is not None:
+                    conexion.execute("""
+                        UPDATE tareas SET estado = 'en_curso', trabajador = ?, vence = ?, intentos = intentos + 1,
+                                          actualizada = ?
+                        WHERE url = ?
+                    """, (trabajador, ahora + LEASE_COLA, ahora, fila[0]))
+                conexion.execute('COMMIT')
+            except Exception:
+                conexion.execute('ROLLBACK')
+                raise
+        if fila is None:
+            return None
+        url, scraper, referencia, condicional, estado_listado = fila
+        return {'url': url, 'scraper': scraper, 'referencia': referencia,
+                'condicional': bool(condicional), 'estado_listado': estado_listado}
+    
+    def completar(self, url: str, trabajador: str, resultado):
+        self._ejecutar("""
+            UPDATE tareas SET estado = 'hecha', resultado = ?, error = NULL, actualizada = ?
+            WHERE url = ? AND estado = 'en_curso' AND trabajador = ?
+        """, (json.dumps(resultado, ensure_ascii=False), time.time(), url, trabajador))
+        self._avisar()
+    
+    def fallar(self, url: str, trabajador: str, error: str):
+        self._ejecutar("""
+            UPDATE tareas SET estado = CASE WHEN intentos >= ? THEN 'fallida' ELSE 'pendiente' END,
+                              trabajador = NULL, vence = NULL, error = ?, actualizada = ?
+            WHERE url = ? AND estado = 'en_curso' AND trabajador = ?
+        """, (REINTENTOS_COLA, error, time.time(), url, trabajador))
+        self._avisar()
+    
+    def consultar(self, url: str) -> Tuple[Optional[str], object]:
+        filas = self._ejecutar('SELECT estado, resultado FROM tareas WHERE url = ?', (url,))
+        if not filas:
+            return None, None
+        estado, resultado = filas[0]
+        return estado, json.loads(resultado) if resultado else None
+    
+    def marcar_fusionada(self, url: str):
+        self._ejecutar("UPDATE tareas SET estado = 'fusionada', resultado = NULL, actualizada = ? WHERE url = ?",
+                       (time.time(), url))
+    
+    def cerrar(self):
+        with self._lock:
+            if self._conexion is not None:
+                self._conexion.close()
+                self._conexion = None
+
+cola_trabajo: Optional[ColaTrabajo] = ColaSQLite(COLA_TRABAJO) if COLA_TRABAJO else None
+
+class FuturoCola:
+    """Resultado de una tarea de la cola con la interfaz de un Future (result()) para scraper_eficiente_website"""
+    
+    def __init__(self, cola: ColaTrabajo, url: str):
+        self.cola = cola
+        self.url = url
+    
+    def result(self):
+        while True:
+            version = self.cola.version()
+            estado, resultado = self.cola.consultar(self.url)
+            if estado in ('hecha', 'fallida'):
+                # Una vez fusionado no se vuelve a entregar: si el coordinador se corta, la URL se re-encola
+                self.cola.marcar_fusionada(self.url)
+                return resultado
+            self.cola.esperar_resultado(version)
+
+def enviar_detalle(executor: ThreadPoolExecutor, scraper_func, url: str, referencia, condicional: bool):
+    """Lanza la descarga del detalle en el pool local o, si hay COLA_TRABAJO, la encola para cualquier trabajador"""
+    if cola_trabajo is None:
+        return executor.submit(descargar_detalle, scraper_func, url, referencia, condicional)
+    cola_trabajo.encolar({
+        'url': url, 'scraper': nombre_scraper(scraper_func), 'referencia': referencia,
+        'condicional': condicional, 'estado_listado': _estados_listado.get(url),
+    })
+    return FuturoCola(cola_trabajo, url)
+
+def ejecutar_tarea(tarea: Dict):
+    """Ejecuta una tarea de la cola con el scraper de detalle que nombra (el estado del listado viaja en la tarea)"""
+    scraper_func = scraper_por_nombre(tarea['scraper'])
+    if tarea.get('estado_listado') is not None:
+        _estados_listado[tarea['url']] = tarea['estado_listado']
+    data = descargar_detalle(scraper_func, tarea['url'], tarea['referencia'], tarea['condicional'])
+    if isinstance(data, Future):
+        data = data.result()
+    return data
+
+def trabajar_cola(cola: ColaTrabajo, trabajador: str, parar: threading.Event,
+                  inactividad_max: Optional[float] = None):
+    """Bucle de un hilo trabajador: toma tareas, las ejecuta y publica el resultado (o el fallo, para reintentar)"""
+    inactivo_desde = time.monotonic()
+    while not parar.is_set():
+        try:
+            tarea = cola.tomar(trabajador)
+        except sqlite3.OperationalError as e:  # cola bloqueada demasiado tiempo: reintentar
+            print(f"⚠️ Cola de trabajo ocupada: {e}")
+            tarea = None
+        if tarea is None:
+            if inactividad_max is not None and time.monotonic() - inactivo_desde > inactividad_max:
+                return
+            parar.wait(1.0)
+            continue
+        inactivo_desde = time.monotonic()
+        try:
+            data = ejecutar_tarea(tarea)
+        except Exception as e:
+            print(f"    ❌ Error en tarea {tarea['url']}: {e}")
+            cola.fallar(tarea['url'], trabajador, str(e))
+            continue
+        if data is None:
+            cola.fallar(tarea['url'], trabajador, 'sin datos')
+        else:
+            cola.completar(tarea['url'], trabajador, data)
+
+def iniciar_trabajadores(cola: ColaTrabajo, hilos: int, parar: threading.Event,
+                         inactividad_max: Optional[float] = None) -> List[threading.Thread]:
+    """Arranca hilos trabajadores de la cola en esta máquina (cada hilo tiene su propia reserva)"""
+    prefijo = f"{socket.gethostname()}-{os.getpid()}"
+    trabajadores = [
+        threading.Thread(target=trabajar_cola, args=(cola, f"{prefijo}-{i}", parar, inactividad_max), daemon=True)
+        for i in range(hilos)
+    ]
+    for trabajador in trabajadores:
+        trabajador.start()
+    return trabajadores
 
 def scraper_eficiente_website(scraper_func, nombre_inmobiliaria: str, 
                              registro: RegistroScraping, 
                              gestor: GestorPropiedades, 
-                             obtener_urls_func, *args):
+                             obtener_urls_func, *args, orden: Optional[int] = None):
     """
-    Wrapper genérico para scrapers que implementa la lógica eficiente
+    Wrapper genérico para scrapers que implementa la lógica eficiente.
+    orden es la posición de la inmobiliaria en la lista de main: viaja con cada cambio anotado
+    para que el catálogo y el registro se compacten en ese orden aunque las inmobiliarias vayan en paralelo
     """
     print(f"🏠 Iniciando scraping {'COMPLETO' if E_COMPLETO else 'INCREMENTAL'} de {nombre_inmobiliaria}...")
     
@@ -541,26 +2300,28 @@ def scraper_eficiente_website(scraper_func, nombre_inmobiliaria: str,
         print(f"No se encontraron URLs de propiedades en {nombre_inmobiliaria}")
         return []
     
+    # Cada entrada es (referencia, url) o, si el listado los muestra, (referencia, url, precio, estado)
+    datos_listado = {entrada[1]: tuple(entrada[2:4]) for entrada in urls_disponibles if len(entrada) >= 4}
+    urls_disponibles = [tuple(entrada[:2]) for entrada in urls_disponibles]
+    
     # Convertir a conjunto de URLs para facilitar comparaciones
     urls_encontradas = {url for _, url in urls_disponibles}
     urls_conocidas = registro.obtener_urls_conocidas()
     propiedades_existentes = gestor.obtener_urls_existentes()
     
-    # DETECTAR URLs ELIMINADAS
-    urls_eliminadas_inmobiliaria = {url for url in urls_conocidas 
-                                   if url not in urls_encontradas 
-                                   and any(prop.get('inmobiliaria') == nombre_inmobiliaria 
-                                          for prop in gestor.propiedades_actuales 
-                                          if prop['url_detalle'] == url)}
+    # DETECTAR URLs ELIMINADAS (diferencia de conjuntos sobre las URLs de la inmobiliaria)
+    urls_conocidas_inmo, _, urls_eliminadas_inmobiliaria = registro.comparar_inmobiliaria(
+        nombre_inmobiliaria, urls_encontradas)
     
     if urls_eliminadas_inmobiliaria:
-        eliminadas_count = registro.marcar_urls_eliminadas(urls_eliminadas_inmobiliaria)
+        registro.marcar_urls_eliminadas(urls_eliminadas_inmobiliaria, orden)
         gestor.marcar_propiedades_eliminadas(urls_eliminadas_inmobiliaria)
         print(f"  🗑️ {len(urls_eliminadas_inmobiliaria)} URLs eliminadas detectadas en {nombre_inmobiliaria}")
     
     urls_a_procesar = []
     urls_nuevas = 0
     urls_omitidas = 0
+    urls_cambio_listado = set()
     
     # Filtrar URLs según el modo
     for referencia, url in urls_disponibles:
@@ -569,24 +2330,27 @@ def scraper_eficiente_website(scraper_func, nombre_inmobiliaria: str,
             if url not in propiedades_existentes:
                 urls_a_procesar.append((referencia, url))
                 urls_nuevas += 1
+            elif url in datos_listado and registro.url_necesita_escaneo(url, *datos_listado[url]):
+                # El listado muestra otro precio o estado: re-verificar el detalle
+                urls_a_procesar.append((referencia, url))
+                urls_cambio_listado.add(url)
             else:
                 urls_omitidas += 1
+        elif (E_COMPLETO and url in urls_conocidas and url in propiedades_existentes
+              and not registro.url_necesita_verificacion(url, _lastmod_sitemap.get(url))):
+            # Modo completo: el sitemap dice que no cambió desde la última verificación
+            urls_omitidas += 1
         else:
             # En modo completo o URL nueva
             urls_a_procesar.append((referencia, url))
             if url not in urls_conocidas:
                 urls_nuevas += 1
-
-    urls_conocidas_inmo = {
-        u for u in urls_conocidas
-        if any(prop.get('inmobiliaria') == nombre_inmobiliaria
-               for prop in gestor.propiedades_actuales
-               if prop['url_detalle'] == u)
-    }
     
     print(f"  📊 URLs encontradas: {len(urls_disponibles)}")
     print(f"  📊 URLs conocidas ({nombre_inmobiliaria}): {len(urls_conocidas_inmo)}")
     print(f"  📊 URLs nuevas: {urls_nuevas}")
+    if urls_cambio_listado:
+        print(f"  📊 URLs con precio/estado cambiado en el listado: {len(urls_cambio_listado)}")
     print(f"  📊 URLs a procesar: {len(urls_a_procesar)}")
     print(f"  📊 URLs omitidas (sin cambios): {urls_omitidas}")
     
@@ -601,110 +2365,297 @@ def scraper_eficiente_website(scraper_func, nombre_inmobiliaria: str,
     
     propiedades_procesadas = []
     cambios_detectados = 0
+    no_modificadas = 0
     
-    for i, (referencia, url) in enumerate(urls_a_procesar, 1):
-        print(f"  Procesando {i}/{len(urls_a_procesar)}: REF.{referencia}")
-        
-        if not is_allowed(url):
-            print(f"    🚫 Bloqueado por robots.txt")
-            continue
+    # Las descargas van en paralelo (o a la cola compartida); los resultados se consumen en orden para que la salida sea estable.
+    # Si ya hay registro guardado (y sigue publicado) se pide con GET condicional: un 304 evita descargar y parsear
+    with ThreadPoolExecutor(max_workers=MAX_HILOS_DETALLE) as executor:
+        futuros = [
+            (referencia, url, enviar_detalle(
+                executor, scraper_func, url, referencia,
+                url in propiedades_existentes and propiedades_existentes[url].get('estado') != 'ELIMINADO_WEB'))
+            for referencia, url in urls_a_procesar
+        ]
         
-        try:
-            # Scraper específico
-            data = scraper_func(url, referencia)
-            if data:
-                if E_COMPLETO and url in propiedades_existentes:
-                    # Modo completo: verificar cambios preservando fecha original
+        for i, (referencia, url, futuro) in enumerate(futuros, 1):
+            print(f"  Procesando {i}/{len(futuros)}: REF.{referencia} ({nombre_inmobiliaria})")
+            
+            try:
+                # Scraper específico (ya ejecutado en el pool; si se parsea en procesos, llega un Future)
+                data = futuro.result()
+                if isinstance(data, Future):
+                    data = data.result()
+                if data == NO_MODIFICADA:
+                    # 304: la página no cambió, se reutiliza la propiedad guardada
                     prop_existente = propiedades_existentes[url]
-                    data['fecha_scraping'] = prop_existente.get('fecha_scraping', data['fecha_scraping'])
+                    print(f"  ⭐️ Sin cambios en {prop_existente.get('referencia', 'S/N')} (304)")
+                    registro.registrar_url_escaneada(url, prop_existente.get('precio'), prop_existente.get('estado'),
+                                                     prop_existente.get('inmobiliaria'), _lastmod_sitemap.get(url),
+                                                     datos_listado.get(url), orden)
+                    no_modificadas += 1
+                elif data:
+                    if url in propiedades_existentes and (E_COMPLETO or url in urls_cambio_listado):
+                        # Modo completo (o cambio visto en el listado): verificar cambios preservando fecha original
+                        prop_existente = propiedades_existentes[url]
+                        data['fecha_scraping'] = prop_existente.get('fecha_scraping', data['fecha_scraping'])
+                        
+                        if gestor.actualizar_propiedad_existente(url, data):
+                            cambios_detectados += 1
+                    else:
+                        # Modo incremental: agregar nueva propiedad
+                        gestor.agregar_propiedad(data, orden)
+                        propiedades_procesadas.append(data)
                     
-                    if gestor.actualizar_propiedad_existente(url, data):
-                        cambios_detectados += 1
-                else:
-                    # Modo incremental: agregar nueva propiedad
-                    gestor.agregar_propiedad(data)
-                    propiedades_procesadas.append(data)
-                
-                # Registrar URL como escaneada
-                registro.registrar_url_escaneada(url, data.get('precio'), data.get('estado'))
-                
-                # Guardar registro cada 20 propiedades
-                if i % 20 == 0:
-                    registro.guardar_registro()
-        
-        except Exception as e:
-            print(f"    ❌ Error procesando {url}: {e}")
-        
-        time.sleep(1)  # Pausa respetuosa
+                    # Registrar URL como escaneada
+                    registro.registrar_url_escaneada(url, data.get('precio'), data.get('estado'),
+                                                     data.get('inmobiliaria'), _lastmod_sitemap.get(url),
+                                                     datos_listado.get(url), orden)
+                    
+                    # Guardar registro cada 20 propiedades
+                    if i % 20 == 0:
+                        registro.guardar_registro()
+            
+            except Exception as e:
+                print(f"    ❌ Error procesando {url}: {e}")
     
     # Actualizar estadísticas
     registro.actualizar_estadisticas(cambios_detectados)
     registro.guardar_registro()
     
     resultado_count = len(propiedades_procesadas) + cambios_detectados
-    print(f"  ✅ {nombre_inmobiliaria}: {len(propiedades_procesadas)} nuevas, {cambios_detectados} actualizadas")
+    print(f"  ✅ {nombre_inmobiliaria}: {len(propiedades_procesadas)} nuevas, {cambios_detectados} actualizadas"
+          + (f", {no_modificadas} sin cambios (304)" if no_modificadas else ""))
     
     return propiedades_procesadas
 
-# Ejemplo de integración con un scraper existente (usando Fincas Llongas como ejemplo)
-def obtener_urls_sitemap_principal(sitemap_url, filtro_subsitemap=None):
-    """Obtener sub-sitemaps relevantes"""
-    try:
-        resp = requests.get(sitemap_url, headers=HEADERS)
-        resp.raise_for_status()
-        root = ET.fromstring(resp.content)
-        urls = []
+def _ejecutar_particion(scraper_func, nombre_inmobiliaria: str, obtener_urls_func, directorio: str,
+                        foto_propiedades: str, foto_registro: str) -> Dict:
+    """Proceso de una inmobiliaria: parte de la foto común y devuelve su partición (los cambios de su diario)"""
+    global etapa_parseo
+    etapa_parseo = None  # el paralelismo entre procesos ya lo dan las inmobiliarias
+    os.makedirs(directorio, exist_ok=True)
+    motor = MotorJSON(foto_propiedades, os.path.join(directorio, 'propiedades.jsonl'),
+                      foto_registro, os.path.join(directorio, 'registro.jsonl'))
+    registro = RegistroScraping(foto_registro, motor=motor)
+    gestor = GestorPropiedades(foto_propiedades, os.path.join(directorio, 'propiedades.jsonl'), motor=motor)
+    estadisticas_iniciales = dict(registro.registro['estadisticas'])
+    
+    nuevas = scraper_eficiente_website(scraper_func, nombre_inmobiliaria, registro, gestor, obtener_urls_func)
+    
+    motor.cerrar()
+    estadisticas = registro.registro['estadisticas']
+    return {
+        'nuevas': len(nuevas),
+        'propiedades': motor.cambios_propiedades(),
+        'registro': [e for e in motor.cambios_registro() if e.get('op') in ('escaneada', 'eliminada')],
+        'estadisticas': {clave: estadisticas[clave] - estadisticas_iniciales[clave]
+                         for clave in ('cambios_detectados', 'urls_eliminadas')},
+        'validadores': validadores_http.cambios() if validadores_http is not None else {},
+    }
 
-        if filtro_subsitemap:
-            sitemap_tags = root.findall(".//{http://www.sitemaps.org/schemas/sitemap/0.9}sitemap")
-            for sitemap in sitemap_tags:
-                loc = sitemap.find("{http://www.sitemaps.org/schemas/sitemap/0.9}loc")
-                if loc is not None and filtro_subsitemap in loc.text:
-                    urls.append(loc.text)
-        else:
-            urls.append(sitemap_url)
+def ejecutar_inmobiliarias_en_procesos(inmobiliarias: List[Tuple], registro: RegistroScraping,
+                                       gestor: GestorPropiedades) -> int:
+    """Ejecuta cada inmobiliaria en su propio proceso y fusiona sus particiones en el orden de la lista
+    (el resultado no depende de qué proceso termine antes). Retorna el número de propiedades nuevas."""
+    if DIR_PARTICIONES:
+        directorio = DIR_PARTICIONES
+        shutil.rmtree(directorio, ignore_errors=True)  # diarios de una ejecución anterior ya fusionada o abandonada
+        os.makedirs(directorio, exist_ok=True)
+    else:
+        directorio = tempfile.mkdtemp(prefix='particiones_')
+    
+    nuevas_total = 0
+    try:
+        foto_propiedades = os.path.join(directorio, 'propiedades.json')
+        foto_registro = os.path.join(directorio, 'registro.json')
+        gestor.exportar_foto(foto_propiedades)
+        registro.exportar_foto(foto_registro)
         
-        return urls
+        with ProcessPoolExecutor(max_workers=PROCESOS_INMOBILIARIAS,
+                                 mp_context=multiprocessing.get_context('spawn')) as executor:
+            futuros = [
+                (nombre, executor.submit(_ejecutar_particion, scraper_func, nombre, obtener_urls_func,
+                                         os.path.join(directorio, f'{i:02d}'), foto_propiedades, foto_registro))
+                for i, (scraper_func, nombre, obtener_urls_func) in enumerate(inmobiliarias)
+            ]
+            for nombre, futuro in futuros:
+                try:
+                    particion = futuro.result()
+                except Exception as e:
+                    print(f"❌ Error con {nombre}: {e}")
+                    continue
+                gestor.incorporar_cambios(particion['propiedades'])
+                registro.incorporar_cambios(particion['registro'], particion['estadisticas'])
+                if validadores_http is not None:
+                    validadores_http.incorporar(particion['validadores'])
+                nuevas_total += particion['nuevas']
+        
+        registro.guardar_registro()
+    finally:
+        # Lo fusionado ya está en los diarios propios: las particiones no se reutilizan
+        shutil.rmtree(directorio, ignore_errors=True)
+    return nuevas_total
+
+def unicas_por_url(entradas: List[Tuple]) -> List[Tuple]:
+    """Quita las entradas (referencia, url, ...) con URL repetida: queda la primera y se mantiene el orden"""
+    por_url = {}
+    for entrada in entradas:
+        por_url.setdefault(entrada[1], entrada)
+    return list(por_url.values())
+
+def recorrer_paginacion(plantilla_url: str, parametro: str,
+                        extraer: Callable[[BeautifulSoup, str], List[Tuple]], max_paginas: int) -> List[Tuple]:
+    """Recorre un listado paginado (plantilla_url con {} en el número de página) y junta lo que extraer saca de cada una.
+    El total de páginas se deduce de los enlaces ?parametro=N de la primera; el resto se piden en paralelo
+    (el ritmo lo marca cliente_http). Para en la primera página vacía, repetida o con error."""
+    patron = re.compile(rf'[?&]{re.escape(parametro)}=(\d+)')
+
+    def leer(nump: int) -> Tuple[BeautifulSoup, List[Tuple]]:
+        url_listado = plantilla_url.format(nump)
+        r = cliente_http.get(url_listado)
+        r.raise_for_status()
+        soup = crear_soup(r.text)
+        return soup, extraer(soup, url_listado)
+
+    resultados = []
+    urls_vistas = set()
+
+    def anotar(items: List[Tuple]) -> bool:
+        """Añade los items de una página; False si está vacía o repite otra (el sitio ya no tiene más)"""
+        urls = {item[1] for item in items}
+        if not urls or urls <= urls_vistas:
+            return False
+        urls_vistas.update(urls)
+        resultados.extend(items)
+        return True
+
+    try:
+        soup, items = leer(1)
     except Exception as e:
-        print(f"Error al obtener sitemap principal {sitemap_url}: {e}")
-        return []
+        print(f"Error en página 1: {e}")
+        return resultados
+    if not anotar(items):
+        return resultados
+    total = min(max((int(n) for a in soup.find_all('a', href=True) for n in patron.findall(a['href'])), default=0),
+                max_paginas)
+
+    siguiente = 2
+    with ThreadPoolExecutor(max_workers=MAX_PAGINAS_PARALELAS) as executor:
+        while siguiente <= max_paginas:
+            if siguiente <= total:
+                hasta = total                                        # páginas anunciadas: todas a la vez
+            elif total:
+                hasta = siguiente                                    # tras las anunciadas, comprobar una más
+            else:
+                hasta = min(siguiente + MAX_PAGINAS_PARALELAS - 1, max_paginas)  # sin total: por tandas
+            futuros = [(nump, executor.submit(leer, nump)) for nump in range(siguiente, hasta + 1)]
+            for nump, futuro in futuros:
+                try:
+                    _, items = futuro.result()
+                except Exception as e:
+                    print(f"Error en página {nump}: {e}")
+                    items = []
+                if not anotar(items):
+                    for _, pendiente in futuros:
+                        pendiente.cancel()
+                    return resultados
+            siguiente = hasta + 1
+    return resultados
+
+class _FlujoTrozos(io.RawIOBase):
+    """Archivo de solo lectura sobre un iterador de trozos de bytes (para pasárselo a gzip / iterparse)"""
+
+    def __init__(self, trozos: Iterator[bytes]):
+        self._trozos = trozos
+        self._resto = b''
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, destino) -> int:
+        while not self._resto:
+            self._resto = next(self._trozos, None)
+            if self._resto is None:
+                self._resto = b''
+                return 0
+        n = min(len(destino), len(self._resto))
+        destino[:n] = self._resto[:n]
+        self._resto = self._resto[n:]
+        return n
+
+def leer_sitemap(sitemap_url: str, filtro: Union[str, Callable[[str], bool], None] = None,
+                 filtro_indice: Optional[str] = None) -> Iterator[Tuple[str, Optional[str]]]:
+    """Recorre un sitemap (.xml o .xml.gz) en streaming y va devolviendo (url, lastmod) según se descarga.
+    filtro: subcadena (o función) que debe cumplir la URL. Si es un índice de sitemaps, sigue los
+    sub-sitemaps que contengan filtro_indice (todos si es None)."""
+    if isinstance(filtro, str):
+        subcadena = filtro
+        filtro = lambda url: subcadena in url
+
+    sub_sitemaps = []
+    with closing(cliente_http.trozos_con_cache(sitemap_url)) as trozos:
+        flujo = io.BufferedReader(_FlujoTrozos(trozos))
+        if flujo.peek(2)[:2] == b'\x1f\x8b':
+            flujo = gzip.GzipFile(fileobj=flujo)
+
+        raiz = None
+        for evento, elem in ET.iterparse(flujo, events=('start', 'end')):
+            if evento == 'start':
+                if raiz is None:
+                    raiz = elem
+                continue
+            etiqueta = elem.tag.rpartition('}')[2]
+            if etiqueta not in ('url', 'sitemap'):
+                continue
+
+            loc = lastmod = None
+            for hijo in elem:
+                nombre = hijo.tag.rpartition('}')[2]
+                if nombre == 'loc':
+                    loc = (hijo.text or '').strip()
+                elif nombre == 'lastmod':
+                    lastmod = (hijo.text or '').strip() or None
+            raiz.clear()  # ya leído: la memoria no crece con el tamaño del sitemap
 
-def obtener_urls_pisos_de_subsitemap(subsitemap_url, patrones_validos, max_urls=None):
+            if not loc:
+                continue
+            if etiqueta == 'sitemap':
+                if filtro_indice is None or filtro_indice in loc:
+                    sub_sitemaps.append(loc)
+            elif filtro is None or filtro(loc):
+                if lastmod:
+                    _lastmod_sitemap[loc] = lastmod
+                yield loc, lastmod
+
+    for sub_sitemap in sub_sitemaps:
+        yield from leer_sitemap(sub_sitemap, filtro, filtro_indice)
+
+def obtener_urls_pisos_de_subsitemap(subsitemap_url, patrones_validos, max_urls=None, filtro_indice=None):
     """Obtener URLs de propiedades según patrón configurado, filtrando por últimos 2 años"""
     try:
-        resp = requests.get(subsitemap_url, headers=HEADERS)
-        resp.raise_for_status()
-        root = ET.fromstring(resp.content)
         urls = []
         
         # Calcular fecha límite (hoy - 2 años)
         fecha_limite = datetime.now() - timedelta(days=2*365)
         
-        url_tags = root.findall(".//{http://www.sitemaps.org/schemas/sitemap/0.9}url")
-        for url_tag in url_tags:
-            loc = url_tag.find("{http://www.sitemaps.org/schemas/sitemap/0.9}loc")
-            lastmod = url_tag.find("{http://www.sitemaps.org/schemas/sitemap/0.9}lastmod")
-            
+        filtro = lambda url: any(pat in url for pat in patrones_validos)
+        for url, lastmod in leer_sitemap(subsitemap_url, filtro, filtro_indice):
             # Verificar fecha de modificación
-            fecha_valida = True
-            if lastmod is not None and lastmod.text:
+            if lastmod:
                 try:
-                    fecha_mod = datetime.strptime(lastmod.text, "%Y-%m-%dT%H:%M:%S%z")
-                    if fecha_mod.replace(tzinfo=None) < fecha_limite:
-                        fecha_valida = False
+                    # Solo fecha y hora con zona: lo demás (solo fecha, sin zona) no se descarta
+                    if datetime.strptime(lastmod, "%Y-%m-%dT%H:%M:%S%z").replace(tzinfo=None) < fecha_limite:
+                        continue
                 except ValueError:
                     # Si hay error en el formato de fecha, asumir que es válida
                     pass
             
-            if (fecha_valida and loc is not None and 
-                any(pat in loc.text for pat in patrones_validos)):
-                parsed_url = urlparse(loc.text)
-                path = parsed_url.path
-                if (not path.startswith(("/ca/", "/en/", "/fr/"))
-                    and "mallorca" not in loc.text.lower()):
-                    urls.append(loc.text)
-                    if max_urls and len(urls) >= max_urls:
-                        break
+            path = urlparse(url).path
+            if (not path.startswith(("/ca/", "/en/", "/fr/"))
+                and "mallorca" not in url.lower()):
+                urls.append(url)
+                if max_urls and len(urls) >= max_urls:
+                    break
         return urls
     except Exception as e:
         print(f"Error al obtener sitemap de pisos {subsitemap_url}: {e}")
@@ -716,24 +2667,15 @@ def obtener_urls_fincasllongas():
     base_url = f"https://{domain}"
     sitemap_url = urljoin(base_url, '/sitemap.xml')
     
-    subsitemaps = obtener_urls_sitemap_principal(sitemap_url, 'realestate')
-    
-    if not subsitemaps:
-        print(f"No se encontraron sitemaps válidos en {sitemap_url}")
-        return []
-    
-    all_property_urls = []
+    # Índice de sitemaps: solo se siguen los sub-sitemaps de inmuebles ('realestate')
     patrones_validos = ['/propiedad/']
-    
-    for subsitemap in subsitemaps:
-        property_urls = obtener_urls_pisos_de_subsitemap(subsitemap, patrones_validos, None)
-        all_property_urls.extend(property_urls)
+    all_property_urls = obtener_urls_pisos_de_subsitemap(sitemap_url, patrones_validos, None, filtro_indice='realestate')
     
     # Convertir URLs a tuplas (referencia, url)
     urls_con_ref = []
     for url in all_property_urls:
         # Extraer referencia de la URL o usar un identificador
-        ref_match = re.search(r'/(\d+)/?$', url)
+        ref_match = _RE_ID_FINAL_URL.search(url)
         if ref_match:
             referencia = ref_match.group(1)
         else:
@@ -747,9 +2689,9 @@ def obtener_urls_fincasllongas():
 def scrape_fincasllongas_detalle(url, referencia):
     """Scraper específico para una propiedad de fincasllongas.com"""
     try:
-        r = requests.get(url, headers=HEADERS, timeout=30)
+        r = cliente_http.get(url)
         r.raise_for_status()
-        soup = BeautifulSoup(r.text, 'html.parser')
+        soup = crear_soup(r.text)
         
         # ===========================
         # REFERENCIA & UBICACIÓN
@@ -779,9 +2721,7 @@ def scrape_fincasllongas_detalle(url, referencia):
                 .replace('Precio', '')
                 .strip()
             )
-            precio_limpio = re.sub(r'[^\d]', '', precio_text)
-            if precio_limpio.isdigit():
-                precio = int(precio_limpio)
+            precio = entero_de_digitos(precio_text)
 
         # ===========================
         # TÍTULO
@@ -914,24 +2854,26 @@ def scrape_fincasllongas_detalle(url, referencia):
         print(f"Error scrapeando Fincas Llongas {url}: {e}")
         return None
 
+_RE_HREF_ARTRUTX = re.compile(r'detalles-propiedad\.php\?id_p=\d+')
+
 def obtener_urls_artrutx():
     """Obtener todas las URLs de propiedades de Artrutx desde el listado con sus referencias"""
     url_listado = "https://www.inmobiliariaartrutx.com/venta.php"
     try:
-        r = requests.get(url_listado, headers=HEADERS, timeout=30)
+        r = cliente_http.get(url_listado)
         r.raise_for_status()
-        soup = BeautifulSoup(r.text, 'html.parser')
+        soup = crear_soup(r.text)
 
         urls_propiedades = []
         productos = soup.find_all('div', class_='product-img')
 
         for producto in productos:
-            enlace = producto.find('a', href=re.compile(r'detalles-propiedad\.php\?id_p=\d+'))
+            enlace = producto.find('a', href=_RE_HREF_ARTRUTX)
             referencia_elemento = producto.select_one('.product-img-gallery ul li')
             if enlace and referencia_elemento:
                 href = enlace.get('href')
                 referencia_texto = referencia_elemento.get_text(strip=True)
-                referencia_match = re.search(r'REF\.(\d+)', referencia_texto)
+                referencia_match = _RE_REF_PUNTO.search(referencia_texto)
                 if referencia_match:
                     referencia = referencia_match.group(1)
                     url_completa = urljoin(url_listado, href) if not href.startswith('http') else href
@@ -944,16 +2886,19 @@ def obtener_urls_artrutx():
         return []
 
 
+_buscador_titulo_artrutx = BuscadorClaves([
+    'APARTAMENTO','CASA','CHALET','PISO','ÁTICO','LOCAL','HUERTO',
+    'SOLAR','GARAJE','TERRENO','NAVE'
+])
+
 def scrape_artrutx_detalle(url, referencia):
     """Scraper específico para una propiedad de inmobiliariaartrutx.com"""
     try:
-        r = requests.get(url, headers=HEADERS, timeout=30)
+        r = cliente_http.get(url)
         r.raise_for_status()
-        soup = BeautifulSoup(r.text, 'html.parser')
-        for tag in soup(["header", "footer"]):
-            tag.decompose()
-        if (div_borrar := soup.find("div", id="ltn__utilize-mobile-menu")):
-            div_borrar.decompose()
+        soup = crear_soup(r.text, region=REGION_FICHA_ARTRUTX,
+                          fuera_de_region=("header", "footer", "div#ltn__utilize-mobile-menu"))
+        texto_pagina = TextoPagina(soup)
 
         # ===========================
         # TÍTULO
@@ -964,13 +2909,10 @@ def scrape_artrutx_detalle(url, referencia):
             t = h1.get_text(strip=True)
             titulo = t if len(t) > 4 else None
         if not titulo:
-            texto = soup.get_text()
+            texto = texto_pagina.texto()
             lineas = [l.strip() for l in texto.split('\n') if l.strip()]
             for linea in lineas[:10]:
-                if any(keyword in linea.upper() for keyword in [
-                    'APARTAMENTO','CASA','CHALET','PISO','ÁTICO','LOCAL','HUERTO',
-                    'SOLAR','GARAJE','TERRENO','NAVE'
-                ]) and len(linea) > 5:
+                if _buscador_titulo_artrutx.contiene(linea.upper()) and len(linea) > 5:
                     titulo = linea
                     break
 
@@ -978,14 +2920,11 @@ def scrape_artrutx_detalle(url, referencia):
         # PRECIO
         # ===========================
         precio = None
-        texto_completo = soup.get_text()
-        for pattern in [r'(\d{1,3}(?:[.,]\d{3})*)\s*€', r'€\s*(\d{1,3}(?:[.,]\d{3})*)']:
-            match = re.search(pattern, texto_completo)
-            if match:
-                precio_str = match.group(1).replace('.', '').replace(',', '')
-                if precio_str.isdigit():
-                    precio = int(precio_str)
-                    break
+        texto_completo = texto_pagina.texto()
+        for patron in (_RE_PRECIO_MILES, _RE_PRECIO_MILES_DELANTE):
+            precio = numero_con_miles(texto_completo, patron)
+            if precio is not None:
+                break
 
         # ===========================
         # UBICACIÓN
@@ -994,7 +2933,7 @@ def scrape_artrutx_detalle(url, referencia):
         label = soup.select_one('label:has(i.flaticon-pin)')
         if label:
             text = label.get_text(" ", strip=True)
-            partes = [re.sub(r"\s+", " ", re.sub(r"[´'`]", "'", p.strip())) for p in text.split(';')]
+            partes = [_RE_ESPACIOS.sub(" ", _RE_APOSTROFES.sub("'", p.strip())) for p in text.split(';')]
             ubicacion_list = []
             for p in partes:
                 if p and p not in ubicacion_list:
@@ -1045,7 +2984,7 @@ def scrape_artrutx_detalle(url, referencia):
         # ===========================
         # FLAGS
         # ===========================
-        flags = detectar_flags(texto_completo.upper())
+        flags = detectar_flags(texto_pagina)
         piscina, garaje, ascensor, vistas_mar, alquiler = (
             flags['piscina'], flags['garaje'], flags['ascensor'], flags['vistas_mar'], flags['alquiler']
         )
@@ -1099,33 +3038,36 @@ def scrape_artrutx_detalle(url, referencia):
         print(f"Error scrapeando Artrutx {url}: {e}")
         return None
 
+_RE_HREF_FINCASCIUTADELLA = re.compile(r'propiedad-v\.php\?id=\d+')
+_RE_HREF_DETALLES_FINCASCIUTADELLA = re.compile(r'detalles.*\.php\?id.*=\d+')
+
 def obtener_urls_fincasciutadella():
     """Obtener todas las URLs de propiedades de Fincas Ciutadella desde el listado con sus referencias"""
     url_listado = "https://www.fincasciutadella.com/propiedad-venta.php"
     try:
-        r = requests.get(url_listado, headers=HEADERS, timeout=30)
+        r = cliente_http.get(url_listado)
         r.raise_for_status()
-        soup = BeautifulSoup(r.text, 'html.parser')
+        soup = crear_soup(r.text)
 
         urls_propiedades = []
         productos = soup.find_all('div', class_=lambda x: x and 'listing-grid-box' in x)
 
         for producto in productos:
-            enlace = producto.find('a', href=re.compile(r'propiedad-v\.php\?id=\d+'))
+            enlace = producto.find('a', href=_RE_HREF_FINCASCIUTADELLA)
             if not enlace:
-                enlace = producto.find('a', href=re.compile(r'detalles.*\.php\?id.*=\d+'))
+                enlace = producto.find('a', href=_RE_HREF_DETALLES_FINCASCIUTADELLA)
 
             referencia = None
             if enlace:
                 texto_enlace = enlace.get_text()
-                match = re.search(r'REF:\s*(\d+)', texto_enlace, re.IGNORECASE)
+                match = _RE_REF_DOS_PUNTOS.search(texto_enlace)
                 if match:
                     referencia = match.group(1)
 
             if not referencia:
                 h4 = producto.find('h4')
                 if h4:
-                    match = re.search(r'REF:\s*(\d+)', h4.get_text(), re.IGNORECASE)
+                    match = _RE_REF_DOS_PUNTOS.search(h4.get_text())
                     if match:
                         referencia = match.group(1)
 
@@ -1140,14 +3082,17 @@ def obtener_urls_fincasciutadella():
         return []
 
 
+_buscador_vistas_mar = BuscadorClaves(['VISTAS AL MAR','SEA VIEW','VISTA MAR'])
+
 def scrape_fincasciutadella_detalle(url, referencia):
     """Scraper específico para una propiedad de fincasciutadella.com"""
     try:
-        r = requests.get(url, headers=HEADERS, timeout=30)
+        r = cliente_http.get(url)
         r.raise_for_status()
-        soup = BeautifulSoup(r.text, 'html.parser')
+        soup = crear_soup(r.text)
         for tag in soup(["header", "footer"]):
             tag.decompose()
+        texto_pagina = TextoPagina(soup)
 
         # ===========================
         # TÍTULO
@@ -1178,15 +3123,11 @@ def scrape_fincasciutadella_detalle(url, referencia):
         precio_tag = soup.select_one('.grid-price, .price, .precio, .property-price')
         if precio_tag:
             precio_txt = precio_tag.get_text(strip=True)
-            precio_limpio = re.sub(r'[^\d]', '', precio_txt)
-            if precio_limpio.isdigit():
-                precio = int(precio_limpio)
+            precio = entero_de_digitos(precio_txt)
 
         if not precio:
-            texto_completo = soup.get_text()
-            match = re.search(r'(\d{1,3}(?:\.\d{3})*)\s*€', texto_completo)
-            if match:
-                precio = int(match.group(1).replace('.', ''))
+            texto_completo = texto_pagina.texto()
+            precio = numero_con_miles(texto_completo, _RE_PRECIO_MILES_PUNTO)
 
         # ===========================
         # UBICACIÓN
@@ -1225,11 +3166,11 @@ def scrape_fincasciutadella_detalle(url, referencia):
             elif 'BAÑOS' in txt and val.isdigit():
                 banos = int(val)
             elif 'SUPERFICIE' in txt:
-                m = re.search(r'(\d+)', val)
+                m = _RE_ENTERO.search(val)
                 if m and m.group(1) != '2':
                     metros = int(m.group(1))
             elif 'PARCELA' in txt:
-                m = re.search(r'(\d+)', val)
+                m = _RE_ENTERO.search(val)
                 if m and m.group(1) != '2':
                     metros_parcela = int(m.group(1))
             elif 'PISCINA' in txt:
@@ -1252,11 +3193,11 @@ def scrape_fincasciutadella_detalle(url, referencia):
             if 'VENDIDO' in estado_txt or 'SOLD' in estado_txt:
                 estado, vendido = 'VENDIDO', True
 
-        texto_completo = soup.get_text().upper()
+        texto_completo = texto_pagina.mayusculas()
         if 'VENDIDO' in texto_completo:
             estado, vendido = 'VENDIDO', True
 
-        vistas_mar = any(t in texto_completo for t in ['VISTAS AL MAR','SEA VIEW','VISTA MAR'])
+        vistas_mar = _buscador_vistas_mar.contiene(texto_completo)
 
         # ===========================
         # GALERÍA
@@ -1308,24 +3249,6 @@ def scrape_fincasciutadella_detalle(url, referencia):
         return None
 
 
-def _pm_clean_int(txt):
-    """Convierte textos tipo '1.010.000 €' o '181 m2' en enteros"""
-    if not txt:
-        return None
-    s = (str(txt)
-         .replace('\xa0', ' ')
-         .replace('€','')
-         .replace('m²','').replace('m2','').replace('m','')
-         .replace('.','').replace(',','.')
-         .strip())
-    if s.endswith(('2','²')):
-        s = s[:-1].strip()
-    try:
-        f = float(s)
-        return int(round(f))
-    except:
-        return None
-
 def _safe_text(el):
     return el.get_text(" ", strip=True) if el else ""
 
@@ -1337,9 +3260,9 @@ def scrape_mobilia_listado(url_listado, nombre):
     """
     print(f"🏠 Iniciando scraping de {nombre} ({url_listado})")
 
-    r = requests.get(url_listado, headers=HEADERS, timeout=30)
+    r = cliente_http.get(url_listado)
     r.raise_for_status()
-    soup = BeautifulSoup(r.text, "lxml")
+    soup = crear_soup(r.text)
 
     filas = soup.select("#infoListado tbody > tr")
     if not filas:
@@ -1375,17 +3298,17 @@ def scrape_mobilia_listado(url_listado, nombre):
         if precio_el:
             pv = precio_el.select_one("span[data-info='precioVenta']")
             precio_txt = _safe_text(pv) if pv else _safe_text(precio_el)
-        precio = _pm_clean_int(precio_txt)
+        precio = numero_limpio(precio_txt)
 
         sup_el = celdas.get("superficie")
         metros = None
         if sup_el and sup_el.has_attr("data-order"):
-            metros = _pm_clean_int(sup_el["data-order"])
+            metros = numero_limpio(sup_el["data-order"])
         else:
-            metros = _pm_clean_int(_safe_text(sup_el)) if sup_el else None
+            metros = numero_limpio(_safe_text(sup_el)) if sup_el else None
 
-        habitaciones = _pm_clean_int(_safe_text(celdas.get("dormitorios")))
-        banos = _pm_clean_int(_safe_text(celdas.get("banos")))
+        habitaciones = numero_limpio(_safe_text(celdas.get("dormitorios")))
+        banos = numero_limpio(_safe_text(celdas.get("banos")))
 
         estado = ""
         vendido = False
@@ -1445,25 +3368,25 @@ def obtener_urls_inmomenorcacentro():
     """Obtener todas las URLs de propiedades de inmomenorcacentro desde el listado con sus referencias"""
     url_listado = "https://inmomenorcacentro.com/propiedades.php"
     try:
-        r = requests.get(url_listado, headers=HEADERS, timeout=30)
+        r = cliente_http.get(url_listado)
         r.raise_for_status()
-        soup = BeautifulSoup(r.text, 'html.parser')
+        soup = crear_soup(r.text)
 
         urls_propiedades = []
         productos = soup.find_all('div', class_=lambda x: x and ('property' in str(x) or 'inmueble' in str(x)))
 
         if not productos:
-            enlaces = soup.find_all('a', href=re.compile(r'propiedad\.php\?id=\d+'))
+            enlaces = soup.find_all('a', href=_RE_HREF_PROPIEDAD_PHP)
             for enlace in enlaces:
                 href = enlace.get('href')
                 contenedor = enlace.find_parent(['div', 'article', 'section'])
                 referencia = None
                 if contenedor:
-                    match = re.search(r'REF[:\s]*(\d+)', contenedor.get_text(), re.IGNORECASE)
+                    match = _RE_REF_NUMERO.search(contenedor.get_text())
                     if match:
                         referencia = match.group(1)
                 if not referencia:
-                    id_match = re.search(r'id=(\d+)', href)
+                    id_match = _RE_ID_PARAMETRO.search(href)
                     if id_match:
                         referencia = id_match.group(1)
                 if referencia:
@@ -1471,16 +3394,16 @@ def obtener_urls_inmomenorcacentro():
                     urls_propiedades.append((referencia, url_completa))
         else:
             for producto in productos:
-                enlace = producto.find('a', href=re.compile(r'propiedad\.php\?id=\d+'))
+                enlace = producto.find('a', href=_RE_HREF_PROPIEDAD_PHP)
                 if not enlace:
                     continue
                 href = enlace.get('href')
                 referencia = None
-                match = re.search(r'REF[:\s]*(\d+)', producto.get_text(), re.IGNORECASE)
+                match = _RE_REF_NUMERO.search(producto.get_text())
                 if match:
                     referencia = match.group(1)
                 if not referencia:
-                    id_match = re.search(r'id=(\d+)', href)
+                    id_match = _RE_ID_PARAMETRO.search(href)
                     if id_match:
                         referencia = id_match.group(1)
                 if referencia:
@@ -1496,11 +3419,12 @@ def obtener_urls_inmomenorcacentro():
 def scrape_inmomenorcacentro_detalle(url, referencia):
     """Scraper específico para una propiedad de inmomenorcacentro.com"""
     try:
-        r = requests.get(url, headers=HEADERS, timeout=30)
+        r = cliente_http.get(url)
         r.raise_for_status()
-        soup = BeautifulSoup(r.text, 'html.parser')
+        soup = crear_soup(r.text)
         for tag in soup(["header", "footer"]):
             tag.decompose()
+        texto_pagina = TextoPagina(soup)
 
         # ===========================
         # TÍTULO
@@ -1517,14 +3441,11 @@ def scrape_inmomenorcacentro_detalle(url, referencia):
         for selector in ['.property-price','.precio','.price']:
             precio_tag = soup.select_one(selector)
             if precio_tag:
-                precio_txt = re.sub(r'[^\d]', '', precio_tag.get_text(strip=True))
-                if precio_txt.isdigit():
-                    precio = int(precio_txt)
+                precio = entero_de_digitos(precio_tag.get_text(strip=True))
+                if precio is not None:
                     break
         if not precio:
-            match = re.search(r'(\d{1,3}(?:[.,]\d{3})*)\s*€', soup.get_text())
-            if match:
-                precio = int(match.group(1).replace('.','').replace(',',''))
+            precio = numero_con_miles(texto_pagina.texto())
 
         # ===========================
         # UBICACIÓN
@@ -1544,23 +3465,23 @@ def scrape_inmomenorcacentro_detalle(url, referencia):
             for item in soup.select(selector):
                 texto = item.get_text(" ", strip=True).upper()
                 if 'HABITACION' in texto or 'DORMITORIO' in texto:
-                    m = re.search(r'(\d+)', texto)
+                    m = _RE_ENTERO.search(texto)
                     if m: habitaciones = int(m.group(1))
                 elif 'BAÑO' in texto or 'ASEO' in texto:
-                    m = re.search(r'(\d+)', texto)
+                    m = _RE_ENTERO.search(texto)
                     if m: banos = int(m.group(1))
                 elif 'SUPERFICIE' in texto:
-                    m = re.search(r'(\d+)', texto)
+                    m = _RE_ENTERO.search(texto)
                     if m: metros = int(m.group(1))
                 elif 'PARCELA' in texto or 'TERRENO' in texto:
-                    m = re.search(r'(\d+)', texto)
+                    m = _RE_ENTERO.search(texto)
                     if m: metros_parcela = int(m.group(1))
 
         # ===========================
         # ESTADO / FLAGS
         # ===========================
-        texto_upper = soup.get_text().upper()
-        flags = detectar_flags(texto_upper)
+        texto_upper = texto_pagina.mayusculas()
+        flags = detectar_flags(texto_pagina)
         piscina, garaje, ascensor, vistas_mar, alquiler = (
             flags['piscina'], flags['garaje'], flags['ascensor'], flags['vistas_mar'], flags['alquiler']
         )
@@ -1612,26 +3533,33 @@ def scrape_inmomenorcacentro_detalle(url, referencia):
         print(f"Error scrapeando inmomenorcacentro {url}: {e}")
         return None
 
+_RE_REF_URL_PALAU = re.compile(r'/ref-(\d+)-')
+_RE_TITULO_EN_PALAU = re.compile(r'(.+?)\s+en\s+(.+)$', re.IGNORECASE)   # "Casa en Ciutadella"
+# Localidades buscadas en el texto cuando la ficha no trae ubicación
+_LOCALIDADES_PALAU = [(re.compile(rf"\b{patron}\b", re.IGNORECASE), normalizado) for patron, normalizado in {
+    "mahón": "Maó",
+    "mahon": "Maó",
+    "mao": "Maó",
+    "maó": "Maó",
+    "ciutadella": "Ciutadella",
+    "ciudadela": "Ciutadella",
+    "ferreries": "Ferreries",
+    "alaior": "Alaior",
+    "mercadal": "Es Mercadal"
+}.items()]
+
 def obtener_urls_inmobiliariapalau():
     """Obtener todas las URLs de propiedades de Inmobiliaria Palau desde el sitemap"""
     sitemap_url = "https://inmobiliariapalau.com/propiedad-sitemap.xml"
     try:
-        r = requests.get(sitemap_url, headers=HEADERS, timeout=30)
-        r.raise_for_status()
-        root = ET.fromstring(r.content)
-
         urls_propiedades = []
-        url_elements = root.findall(".//{http://www.sitemaps.org/schemas/sitemap/0.9}url")
-        for url_element in url_elements:
-            loc_element = url_element.find("{http://www.sitemaps.org/schemas/sitemap/0.9}loc")
-            if loc_element is not None:
-                url = loc_element.text
-                if '/propiedad/' in url and url != "https://inmobiliariapalau.com/propiedad/":
-                    referencia = None
-                    match = re.search(r'/ref-(\d+)-', url)
-                    if match:
-                        referencia = match.group(1)
-                    urls_propiedades.append((referencia, url))
+        for url, _ in leer_sitemap(sitemap_url, '/propiedad/'):
+            if url != "https://inmobiliariapalau.com/propiedad/":
+                referencia = None
+                match = _RE_REF_URL_PALAU.search(url)
+                if match:
+                    referencia = match.group(1)
+                urls_propiedades.append((referencia, url))
 
         return list(set(urls_propiedades))
     except Exception as e:
@@ -1642,9 +3570,9 @@ def obtener_urls_inmobiliariapalau():
 def scrape_inmobiliariapalau_detalle(url, referencia=None):
     """Scraper específico para una propiedad de inmobiliariapalau.com"""
     try:
-        r = requests.get(url, headers=HEADERS, timeout=30)
+        r = cliente_http.get(url)
         r.raise_for_status()
-        soup = BeautifulSoup(r.text, 'html.parser')
+        soup = crear_soup(r.text)
         for tag in soup(["header", "footer"]):
             tag.decompose()
 
@@ -1652,7 +3580,7 @@ def scrape_inmobiliariapalau_detalle(url, referencia=None):
         if not referencia:
             ref_tag = soup.find('p', class_='gb-headline-f29cb2dc')
             if ref_tag:
-                referencia = re.sub(r'\D', '', ref_tag.get_text(strip=True))  # solo números
+                referencia = solo_digitos(ref_tag.get_text(strip=True))
 
         # TÍTULO + UBICACIÓN
         titulo, ubicacion = None, None
@@ -1660,7 +3588,7 @@ def scrape_inmobiliariapalau_detalle(url, referencia=None):
         if h1:
             raw = h1.get_text(strip=True)
             raw = limpiar_texto(raw)
-            m = re.search(r'(.+?)\s+en\s+(.+)$', raw, re.IGNORECASE)
+            m = _RE_TITULO_EN_PALAU.search(raw)
             if m:
                 titulo, ubicacion = limpiar_texto(m.group(1)), limpiar_texto(m.group(2))
             else:
@@ -1669,21 +3597,8 @@ def scrape_inmobiliariapalau_detalle(url, referencia=None):
         #fallback
         if not ubicacion:
             texto_completo = soup.get_text(" ", strip=True)
-
-            localidades = {
-                "mahón": "Maó",
-                "mahon": "Maó",
-                "mao": "Maó",
-                "maó": "Maó",
-                "ciutadella": "Ciutadella",
-                "ciudadela": "Ciutadella",
-                "ferreries": "Ferreries",
-                "alaior": "Alaior",
-                "mercadal": "Es Mercadal"
-            }
-
-            for patron, normalizado in localidades.items():
-                if re.search(rf"\b{patron}\b", texto_completo, re.IGNORECASE):
+            for patron, normalizado in _LOCALIDADES_PALAU:
+                if patron.search(texto_completo):
                     ubicacion = normalizado
                     break
 
@@ -1799,25 +3714,13 @@ def obtener_urls_bonninsanso():
     """Obtener URLs de propiedades de Bonnin Sanso desde sitemap"""
     sitemap_url = "https://www.bonninsanso.com/es/sitemap.xml"
     try:
-        r = requests.get(sitemap_url, headers=HEADERS, timeout=30)
-        r.raise_for_status()
-        root = ET.fromstring(r.content)
-
         urls_propiedades = []
-        url_tags = root.findall(".//{http://www.sitemaps.org/schemas/sitemap/0.9}url")
-
-        for url_tag in url_tags:
-            loc = url_tag.find("{http://www.sitemaps.org/schemas/sitemap/0.9}loc")
-            if (
-                loc is not None 
-                and "/es/compra/" in loc.text 
-                and "mallorca" not in loc.text.lower()  # excluir Mallorca
-            ):
-                url = loc.text.strip()
-                match = re.search(r'/(\d+)/?$', url)
-                if match:
-                    referencia = match.group(1)
-                    urls_propiedades.append((referencia, url))
+        filtro = lambda url: "/es/compra/" in url and "mallorca" not in url.lower()  # excluir Mallorca
+        for url, _ in leer_sitemap(sitemap_url, filtro):
+            match = _RE_ID_FINAL_URL.search(url)
+            if match:
+                referencia = match.group(1)
+                urls_propiedades.append((referencia, url))
 
         return urls_propiedades
     except Exception as e:
@@ -1828,13 +3731,9 @@ def obtener_urls_bonninsanso():
 def scrape_bonninsanso_detalle(url, referencia):
     """Scraper específico para una propiedad de bonninsanso.com"""
     try:
-        r = requests.get(url, headers=HEADERS, timeout=30)
+        r = cliente_http.get(url)
         r.raise_for_status()
-        soup = BeautifulSoup(r.text, 'html.parser')
-
-        contenido = soup.find("div", id="contenido")
-        if contenido:
-            soup = BeautifulSoup(str(contenido), 'html.parser')
+        soup = crear_soup(r.text, region=REGION_CONTENIDO)
 
         # ===========================
         # TÍTULO
@@ -1856,9 +3755,7 @@ def scrape_bonninsanso_detalle(url, referencia):
             span = precio_elem.find('span')
             texto = span.next_sibling if span else precio_elem.get_text()
             if texto:
-                precio_limpio = re.sub(r'[^\d]', '', texto)
-                if precio_limpio.isdigit():
-                    precio = int(precio_limpio)
+                precio = entero_de_digitos(texto)
 
         # ===========================
         # UBICACIÓN
@@ -1877,28 +3774,29 @@ def scrape_bonninsanso_detalle(url, referencia):
             texto = (img.get('title') or img.get('alt') or '').upper()
             src = img.get('src', '')
             if 'DORMITORIO' in texto or 'HABITACION' in texto or '/DORMITORIOS_' in src.upper():
-                nums = re.findall(r'\d+', texto or src)
+                nums = _RE_ENTERO.findall(texto or src)
                 if nums: habitaciones = int(nums[0])
             elif 'BAÑO' in texto or 'ASEO' in texto or '/BANOS_' in src.upper():
-                nums = re.findall(r'\d+', texto or src)
+                nums = _RE_ENTERO.findall(texto or src)
                 if nums: banos = int(nums[0])
             elif 'CONSTRUID' in texto or 'M²' in texto and not any(k in texto for k in ['PARCELA','SOLAR']):
-                nums = re.findall(r'\d+', texto or src)
+                nums = _RE_ENTERO.findall(texto or src)
                 if nums: metros = int(nums[0])
             elif 'PARCELA' in texto or 'TERRENO' in texto or 'SOLAR' in texto or 'SOLAR_WEB' in src.upper():
-                nums = re.findall(r'\d+', texto or src)
+                nums = _RE_ENTERO.findall(texto or src)
                 if nums: metros_parcela = int(nums[0])
 
         # fallback con regex en todo el texto
-        texto_completo = soup.get_text()
+        texto_pagina = TextoPagina(soup)
+        texto_completo = texto_pagina.texto()
         if not habitaciones:
-            m = re.search(r'(\d+)\s*(?:habitacion|dormitorio)', texto_completo, re.IGNORECASE)
+            m = _RE_HABITACIONES.search(texto_completo)
             if m: habitaciones = int(m.group(1))
         if not banos:
-            m = re.search(r'(\d+)\s*baño', texto_completo, re.IGNORECASE)
+            m = _RE_BANOS.search(texto_completo)
             if m: banos = int(m.group(1))
         if not metros:
-            m = re.search(r'(\d+)\s*m[2²]?\s*construid', texto_completo, re.IGNORECASE)
+            m = _RE_METROS_CONSTRUIDOS.search(texto_completo)
             if m: metros = int(m.group(1))
 
         # ===========================
@@ -1915,7 +3813,7 @@ def scrape_bonninsanso_detalle(url, referencia):
         # ===========================
         # FLAGS
         # ===========================
-        flags = detectar_flags(texto_completo.upper())
+        flags = detectar_flags(texto_pagina)
         piscina, garaje, ascensor, vistas_mar, alquiler = (
             flags['piscina'], flags['garaje'], flags['ascensor'], flags['vistas_mar'], flags['alquiler']
         )
@@ -1965,23 +3863,20 @@ def scrape_bonninsanso_detalle(url, referencia):
         print(f"Error scrapeando Bonnin Sanso {url}: {e}")
         return None
 
+_RE_SLUG_ARMENGOL = re.compile(r'/propiedad/([^/]+)')
+_RE_REF_TITULO_ARMENGOL = re.compile(r'^[A-Z]-\d+(\s*\(\d+\))?\s*')                # "A-123 (4) "
+_RE_GUIONES = re.compile(r'[–—-]')
+_RE_UBICACION_TITULO_ARMENGOL = re.compile(r'\ben\s+([A-ZÁÉÍÓÚÜÑ][\w\s´’`]+)$', re.IGNORECASE)
+
 def obtener_urls_fincasarmengol():
     """Obtener URLs de propiedades de Fincas Armengol desde el sitemap"""
     sitemap_url = "https://fincasarmengol.com/propiedad-sitemap.xml"
     try:
-        r = requests.get(sitemap_url, headers=HEADERS, timeout=30)
-        r.raise_for_status()
-        root = ET.fromstring(r.content)
-
         urls_propiedades = []
-        url_tags = root.findall(".//{http://www.sitemaps.org/schemas/sitemap/0.9}url")
-        for url_tag in url_tags:
-            loc = url_tag.find("{http://www.sitemaps.org/schemas/sitemap/0.9}loc")
-            if loc is not None and "/propiedad/" in loc.text:
-                url = loc.text.strip()
-                match = re.search(r'/propiedad/([^/]+)', url)
-                referencia = match.group(1)[:10] if match else url.split("/")[-1]
-                urls_propiedades.append((referencia, url))
+        for url, _ in leer_sitemap(sitemap_url, "/propiedad/"):
+            match = _RE_SLUG_ARMENGOL.search(url)
+            referencia = match.group(1)[:10] if match else url.split("/")[-1]
+            urls_propiedades.append((referencia, url))
 
         return urls_propiedades
     except Exception as e:
@@ -1992,11 +3887,12 @@ def obtener_urls_fincasarmengol():
 def scrape_fincasarmengol_detalle(url, referencia):
     """Scraper específico para una propiedad de fincasarmengol.com"""
     try:
-        r = requests.get(url, headers=HEADERS, timeout=30)
+        r = cliente_http.get(url)
         r.raise_for_status()
-        soup = BeautifulSoup(r.text, 'html.parser')
+        soup = crear_soup(r.text)
         for tag in soup(["header","footer"]):
             tag.decompose()
+        texto_pagina = TextoPagina(soup)
 
         # ===========================
         # TÍTULO + UBICACIÓN
@@ -2005,9 +3901,9 @@ def scrape_fincasarmengol_detalle(url, referencia):
         titulo_elem = soup.select_one("h2")
         if titulo_elem:
             raw = titulo_elem.get_text(strip=True)
-            raw = re.sub(r'^[A-Z]-\d+(\s*\(\d+\))?\s*', '', raw)  # quitar ref inicial
-            raw = re.sub(r'[–—-]', '-', raw).strip()
-            m = re.search(r'\ben\s+([A-ZÁÉÍÓÚÜÑ][\w\s´’`]+)$', raw, re.IGNORECASE)
+            raw = _RE_REF_TITULO_ARMENGOL.sub('', raw)  # quitar ref inicial
+            raw = _RE_GUIONES.sub('-', raw).strip()
+            m = _RE_UBICACION_TITULO_ARMENGOL.search(raw)
             if m:
                 ubicacion = m.group(1).strip()
                 titulo = raw
@@ -2023,20 +3919,18 @@ def scrape_fincasarmengol_detalle(url, referencia):
         # PRECIO
         # ===========================
         precio = None
-        match = re.search(r'(\d{1,3}(?:[.,]\d{3})*)\s*€', soup.get_text())
-        if match:
-            precio = int(match.group(1).replace('.','').replace(',',''))
+        precio = numero_con_miles(texto_pagina.texto())
 
         # ===========================
         # CARACTERÍSTICAS
         # ===========================
         habitaciones = banos = metros = metros_parcela = None
-        texto = soup.get_text()
-        m = re.search(r'(\d+)\s*(?:habitacion|dormitorio)', texto, re.IGNORECASE)
+        texto = texto_pagina.texto()
+        m = _RE_HABITACIONES.search(texto)
         if m: habitaciones = int(m.group(1))
-        m = re.search(r'(\d+)\s*baño', texto, re.IGNORECASE)
+        m = _RE_BANOS.search(texto)
         if m: banos = int(m.group(1))
-        m = re.search(r'(\d+)\s*m[2²]?\s*construid', texto, re.IGNORECASE)
+        m = _RE_METROS_CONSTRUIDOS.search(texto)
         if m: metros = int(m.group(1))
 
         # ===========================
@@ -2050,7 +3944,7 @@ def scrape_fincasarmengol_detalle(url, referencia):
         # ===========================
         # FLAGS
         # ===========================
-        flags = detectar_flags(texto.upper())
+        flags = detectar_flags(texto_pagina)
         piscina, garaje, ascensor, vistas_mar, alquiler = (
             flags['piscina'], flags['garaje'], flags['ascensor'], flags['vistas_mar'], flags['alquiler']
         )
@@ -2104,23 +3998,15 @@ def obtener_urls_fincasfaro():
     """Obtener URLs de propiedades de Fincas Faro desde el sitemap"""
     sitemap_url = "https://fincasfaro.net/es/sitemap.xml"
     try:
-        r = requests.get(sitemap_url, headers=HEADERS, timeout=30)
-        r.raise_for_status()
-        root = ET.fromstring(r.content)
-
         urls_propiedades = []
-        url_tags = root.findall(".//{http://www.sitemaps.org/schemas/sitemap/0.9}url")
-        for url_tag in url_tags:
-            loc = url_tag.find("{http://www.sitemaps.org/schemas/sitemap/0.9}loc")
-            if loc is not None and "/es/ficha/" in loc.text:
-                url = loc.text.strip()
-                match = re.search(r'/(\d+)/?$', url)
-                if match:
-                    referencia = match.group(1)
-                else:
-                    ref = url.split("/")[-1] or url.split("/")[-2]
-                    referencia = ref[:10]
-                urls_propiedades.append((referencia, url))
+        for url, _ in leer_sitemap(sitemap_url, "/es/ficha/"):
+            match = _RE_ID_FINAL_URL.search(url)
+            if match:
+                referencia = match.group(1)
+            else:
+                ref = url.split("/")[-1] or url.split("/")[-2]
+                referencia = ref[:10]
+            urls_propiedades.append((referencia, url))
 
         return urls_propiedades
     except Exception as e:
@@ -2128,18 +4014,20 @@ def obtener_urls_fincasfaro():
         return []
 
 
+_RE_REF_PREFIJO_FARO = re.compile(r"^Ref\.\s*")
+_RE_SUFIJO_VENTA_FARO = re.compile(r"\s*-\s*Venta$")
+_RE_SRCSET = re.compile(r'(\S+)\s+(\d+)(w|x)')                # "foto.jpg 800w" / "foto.jpg 2x"
+_RE_TAMANO_IMAGEN = re.compile(r'/\d+x\d+(?=[^\d]|$)')       # miniaturas "/800x600"
+
 def scrape_fincasfaro_detalle(url, referencia):
     """Scraper específico para una propiedad de fincasfaro.net"""
     try:
-        r = requests.get(url, headers=HEADERS, timeout=30)
+        r = cliente_http.get(url)
         r.raise_for_status()
-        soup = BeautifulSoup(r.text, 'html.parser')
+        soup = crear_soup(r.text, region=REGION_CONTENIDO)
 
-        contenido = soup.find("div", id="contenido")
-        if contenido:
-            soup = BeautifulSoup(str(contenido), 'html.parser')
-
-        texto_completo = soup.get_text()
+        texto_pagina = TextoPagina(soup)
+        texto_mayusculas = texto_pagina.mayusculas()  # antes de recortar el árbol (los flags usan este mismo texto)
 
         # ===========================
         # TÍTULO
@@ -2156,8 +4044,8 @@ def scrape_fincasfaro_detalle(url, referencia):
         if ref_tag:
             texto = ref_tag.get_text(strip=True)  # "Ref. 1593V - Venta"
             # Eliminar "Ref." al inicio y "- Venta" al final
-            referencia = re.sub(r"^Ref\.\s*", "", texto)      # quita "Ref."
-            referencia = re.sub(r"\s*-\s*Venta$", "", referencia)  # quita "- Venta"
+            referencia = _RE_REF_PREFIJO_FARO.sub("", texto)      # quita "Ref."
+            referencia = _RE_SUFIJO_VENTA_FARO.sub("", referencia)  # quita "- Venta"
 
 
         # ===========================
@@ -2170,9 +4058,7 @@ def scrape_fincasfaro_detalle(url, referencia):
             primer_texto = precio_elem.find(text=True, recursive=False)
             if primer_texto:
                 precio_txt = primer_texto.strip()
-                precio_limpio = re.sub(r'[^\d]', '', precio_txt)
-                if precio_limpio.isdigit():
-                    precio = int(precio_limpio)
+                precio = entero_de_digitos(precio_txt)
 
 
         # ===========================
@@ -2214,12 +4100,12 @@ def scrape_fincasfaro_detalle(url, referencia):
         # ESTADO
         # ===========================
         estado = None
-        vendido = 'VENDIDO' in texto_completo.upper()
+        vendido = 'VENDIDO' in texto_mayusculas
 
         # ===========================
         # FLAGS
         # ===========================
-        flags = detectar_flags(texto_completo.upper())
+        flags = detectar_flags(texto_pagina)
         piscina, garaje, ascensor, vistas_mar, alquiler = (
             flags['piscina'], flags['garaje'], flags['ascensor'], flags['vistas_mar'], flags['alquiler']
         )
@@ -2237,7 +4123,7 @@ def scrape_fincasfaro_detalle(url, referencia):
             if srcset:
                 candidatos = []
                 for part in srcset.split(','):
-                    m = re.match(r'(\S+)\s+(\d+)(w|x)', part.strip())
+                    m = _RE_SRCSET.match(part.strip())
                     if m:
                         url_tmp, num, suf = m.groups()
                         ancho = int(num) * (1000 if suf == 'x' else 1)
@@ -2259,7 +4145,7 @@ def scrape_fincasfaro_detalle(url, referencia):
             abs_url = urljoin(url, url_rel)
             if any(x in abs_url.lower() for x in excluir):
                 continue
-            clave = re.sub(r'/\d+x\d+(?=[^\d]|$)', '', abs_url)
+            clave = _RE_TAMANO_IMAGEN.sub('', abs_url)
             if clave not in vistos or w > vistos[clave][0]:
                 vistos[clave] = (w, abs_url)
 
@@ -2300,20 +4186,20 @@ def obtener_urls_zenhousecredit():
     """Obtener todas las URLs de propiedades de Zenhouse Credit desde el listado con sus referencias"""
     url_listado = "https://zenhousecredit.com/venta.php"
     try:
-        r = requests.get(url_listado, headers=HEADERS, timeout=30)
+        r = cliente_http.get(url_listado)
         r.raise_for_status()
-        soup = BeautifulSoup(r.text, 'html.parser')
+        soup = crear_soup(r.text)
 
         urls_propiedades = []
         productos = soup.find_all('article', class_='property-item clearfix')
 
         for producto in productos:
-            enlace = producto.find('a', href=re.compile(r'propiedad\.php\?id=\d+'))
+            enlace = producto.find('a', href=_RE_HREF_PROPIEDAD_PHP)
             referencia_elemento = producto.select_one('h4')
             if enlace and referencia_elemento:
                 href = enlace.get('href')
                 referencia_texto = referencia_elemento.get_text(strip=True)
-                match = re.match(r'^\d+', referencia_texto)
+                match = _RE_ENTERO.match(referencia_texto)
                 if match:
                     referencia = match.group(0)
                     url_completa = href if href.startswith('http') else urljoin(url_listado, href)
@@ -2328,13 +4214,14 @@ def obtener_urls_zenhousecredit():
 def scrape_zenhousecredit_detalle(url, referencia):
     """Scraper específico para una propiedad de zenhousecredit.com"""
     try:
-        r = requests.get(url, headers=HEADERS, timeout=30)
+        r = cliente_http.get(url)
         r.raise_for_status()
-        soup = BeautifulSoup(r.text, 'html.parser')
+        soup = crear_soup(r.text)
         for tag in soup(["header","footer"]):
             tag.decompose()
 
-        texto_completo = soup.get_text(" ", strip=True)
+        texto_pagina = TextoPagina(soup, " ", strip=True)
+        texto_completo = texto_pagina.texto()
 
         # ===========================
         # TÍTULO
@@ -2344,19 +4231,16 @@ def scrape_zenhousecredit_detalle(url, referencia):
         if h1:
             titulo = h1.get_text(strip=True)
             if titulo:
-                titulo = re.sub(referencia, "", titulo).strip()
+                titulo = titulo.replace(referencia, "").strip()
 
         # ===========================
         # PRECIO
         # ===========================
         precio = None
-        for pattern in [r'(\d{1,3}(?:[.,]\d{3})*)\s*€', r'€\s*(\d{1,3}(?:[.,]\d{3})*)']:
-            match = re.search(pattern, texto_completo)
-            if match:
-                precio_str = match.group(1).replace('.', '').replace(',', '')
-                if precio_str.isdigit():
-                    precio = int(precio_str)
-                    break
+        for patron in (_RE_PRECIO_MILES, _RE_PRECIO_MILES_DELANTE):
+            precio = numero_con_miles(texto_completo, patron)
+            if precio is not None:
+                break
 
         # ===========================
         # UBICACIÓN
@@ -2379,27 +4263,27 @@ def scrape_zenhousecredit_detalle(url, referencia):
         for sp in soup.select(".property-meta span"):
             txt = sp.get_text(strip=True).lower()
             if "m2" in txt:
-                m = re.findall(r"\d+", txt)
+                m = _RE_ENTERO.findall(txt)
                 if m: metros = int(m[0])
             elif "dormitorio" in txt:
-                m = re.findall(r"\d+", txt)
+                m = _RE_ENTERO.findall(txt)
                 if m: habitaciones = int(m[0])
             elif "bañ" in txt:
-                m = re.findall(r"\d+", txt)
+                m = _RE_ENTERO.findall(txt)
                 if m: banos = int(m[0])
         for li in features:
             txt = li.get_text(strip=True).lower()
             if "superficie" in txt:
-                m = re.search(r'(\d+)', txt)
+                m = _RE_ENTERO.search(txt)
                 if m: metros = int(m.group(1))
             elif "parcela" in txt or "terreno" in txt:
-                m = re.search(r'(\d+)', txt)
+                m = _RE_ENTERO.search(txt)
                 if m: metros_parcela = int(m.group(1))
 
         # ===========================
         # ESTADO
         # ===========================
-        texto_upper = texto_completo.upper()
+        texto_upper = texto_pagina.mayusculas()
         estado = None
         vendido = False
         if "VENDIDO" in texto_upper:
@@ -2408,7 +4292,7 @@ def scrape_zenhousecredit_detalle(url, referencia):
         # ===========================
         # FLAGS
         # ===========================
-        flags = detectar_flags(texto_upper)
+        flags = detectar_flags(texto_pagina)
         piscina, garaje, ascensor, vistas_mar, alquiler = (
             flags['piscina'], flags['garaje'], flags['ascensor'], flags['vistas_mar'], flags['alquiler']
         )
@@ -2460,25 +4344,19 @@ def scrape_zenhousecredit_detalle(url, referencia):
         print(f"Error scrapeando Zenhouse Credit {url}: {e}")
         return None
 
+_RE_IDIOMA_URL = re.compile(r"/[a-z]{2}/")
+_RE_FICHA_ES_PRIMERALINEA = re.compile(r"-es\d{4,}\.html$")
+
 def obtener_urls_enprimeralinea():
     """Obtener URLs de propiedades de En Primera Línea desde el sitemap"""
     sitemap_url = "https://enprimeralinea.immo/sitemap.xml"
     try:
-        r = requests.get(sitemap_url, headers=HEADERS, timeout=30)
-        r.raise_for_status()
-        root = ET.fromstring(r.content)
-
         urls_propiedades = []
-        url_tags = root.findall(".//{http://www.sitemaps.org/schemas/sitemap/0.9}url")
-        for url_tag in url_tags:
-            loc = url_tag.find("{http://www.sitemaps.org/schemas/sitemap/0.9}loc")
-            if loc is None:  # ← CORRECCIÓN: usar 'is None' en lugar de 'not loc'
-                continue
-            url = loc.text.strip()
+        for url, _ in leer_sitemap(sitemap_url):
             # excluir idiomas (/gb/, /ru/, /cat/, etc.)
-            if re.search(r"/[a-z]{2}/", url):
+            if _RE_IDIOMA_URL.search(url):
                 continue
-            if re.search(r"-es\d{4,}\.html$", url):
+            if _RE_FICHA_ES_PRIMERALINEA.search(url):
                 # ← CORRECCIÓN: extraer referencia y devolver tupla (referencia, url)
                 referencia = url.split("-")[-1].replace(".html", "")
                 urls_propiedades.append((referencia, url))
@@ -2492,11 +4370,12 @@ def obtener_urls_enprimeralinea():
 def scrape_enprimeralinea_detalle(url, referencia=None):
     """Scraper específico para una propiedad de enprimeralinea.immo"""
     try:
-        r = requests.get(url, headers=HEADERS, timeout=30)
+        r = cliente_http.get(url)
         r.raise_for_status()
-        soup = BeautifulSoup(r.text, 'html.parser')
+        soup = crear_soup(r.text)
         for tag in soup(["header","footer"]):
             tag.decompose()
+        texto_pagina = TextoPagina(soup)
 
         # ===========================
         # TÍTULO
@@ -2537,9 +4416,7 @@ def scrape_enprimeralinea_detalle(url, referencia=None):
         # PRECIO
         # ===========================
         precio = None
-        match = re.search(r'(\d{1,3}(?:[.,]\d{3})*)\s*€', soup.get_text())
-        if match:
-            precio = int(match.group(1).replace('.','').replace(',',''))
+        precio = numero_con_miles(texto_pagina.texto())
 
         # ===========================
         # CARACTERÍSTICAS
@@ -2552,16 +4429,16 @@ def scrape_enprimeralinea_detalle(url, referencia=None):
             key = strong.get_text(strip=True).upper()
             val = li.get_text(" ", strip=True).replace(strong.get_text(strip=True), "").strip()
             if 'HABITACIONES' in key:
-                nums = re.findall(r'\d+', val)
+                nums = _RE_ENTERO.findall(val)
                 if nums: habitaciones = int(nums[0])
             elif 'BAÑOS' in key:
-                nums = re.findall(r'\d+', val)
+                nums = _RE_ENTERO.findall(val)
                 if nums: banos = int(nums[0])
             elif 'SUP. CONSTRUIDA' in key:
-                nums = re.findall(r'\d+', val)
+                nums = _RE_ENTERO.findall(val)
                 if nums: metros = int(nums[0])
             elif 'SUP. PARCELA' in key:
-                nums = re.findall(r'\d+', val)
+                nums = _RE_ENTERO.findall(val)
                 if nums: metros_parcela = int(nums[0])
 
         # ===========================
@@ -2582,7 +4459,7 @@ def scrape_enprimeralinea_detalle(url, referencia=None):
         # ===========================
         # FLAGS
         # ===========================
-        flags = detectar_flags(soup.get_text().upper())
+        flags = detectar_flags(texto_pagina)
         piscina, garaje, ascensor, vistas_mar, alquiler = (
             flags['piscina'], flags['garaje'], flags['ascensor'], flags['vistas_mar'], flags['alquiler']
         )
@@ -2632,249 +4509,500 @@ def scrape_enprimeralinea_detalle(url, referencia=None):
         print(f"Error scrapeando En Primera Línea {url}: {e}")
         return None
 
-def obtener_urls_casasenmenorca():
-    """Obtener URLs de propiedades de Casas en Menorca desde el sitemap"""
-    sitemap_url = "https://www.casasenmenorca.com/sitemap-es-es.xml"
-    try:
-        r = requests.get(sitemap_url, headers=HEADERS, timeout=30)
-        r.raise_for_status()
-        root = ET.fromstring(r.content)
+# EXTRACCIÓN DECLARATIVA
+# Las inmobiliarias de la plataforma JSON-LD (SITIOS_JSON_LD) y las de fichas HTML sencillas (SITIOS_SELECTORES) son
+# especificaciones. Al arrancar se validan y se registran en SITIOS por su clave; cada tipo de sitio tiene un único
+# recorrido (extraer) común a todos sus sitios. Lo que cambia entre sitios se describe con datos y funciones pequeñas.
+# Una inmobiliaria nueva es otra entrada en su tabla más su línea en main.
+CAMPOS_TEXTO_JSON_LD = ('titulo', 'descripcion', 'migas', 'pagina')   # fuentes posibles de 'texto_flags'
+URLS_REFERENCIA_JSON_LD = ('json_ld', 'pagina')                      # fuentes posibles de 'urls_referencia'
+
+def alquiler_por_flags(flags: Dict[str, bool], migas: List[str]) -> bool:
+    """Alquiler si el texto de flags lo menciona"""
+    return flags['alquiler']
+
+def alquiler_por_migas(flags: Dict[str, bool], migas: List[str]) -> bool:
+    """Alquiler si alguna miga de pan dice alquiler/rent"""
+    return any("alquiler" in n.lower() or "rent" in n.lower() for n in migas)
+
+def alquiler_nunca(flags: Dict[str, bool], migas: List[str]) -> bool:
+    """Nunca alquiler (el sitio solo publica ventas)"""
+    return False
+
+SITIOS_JSON_LD = {
+    'casasenmenorca': {
+        'inmobiliaria': 'Casas en Menorca',
+        'sitemap': 'https://www.casasenmenorca.com/sitemap-es-es.xml',
+        'filtro_urls': '/inmueble/',
+        'selector_estado': '.stickerRender .stickerText',   # None: buscar estados_vendido en el texto de la página
+        'estados_vendido': ('VENDIDO', 'RESERVADO'),
+        'estados_ignorados': ('DISPONIBLE', 'NOVEDAD'),
+        'texto_pagina': ('', False),                          # (separador, strip) del texto para flags y estado
+        'texto_flags': ('pagina',),                           # campos (CAMPOS_TEXTO_JSON_LD) que se buscan en los flags
+        'alquiler': alquiler_por_migas,                       # (flags, migas) -> bool
+        'alquiler_precio_max': None,                          # por encima de este precio no es alquiler
+        'urls_referencia': ('json_ld',),                      # de qué URLs sale el id si falta la referencia
+        'imagen_por_defecto': None,
+    },
+    'saimmobiliaria': {
+        'inmobiliaria': 'SA Inmobiliaria',
+        'sitemap': 'https://www.saimmobiliaria.com/sitemap-es-es.xml',
+        'filtro_urls': '/inmueble/',
+        'selector_estado': '.stickerRender .stickerText',
+        'estados_vendido': ('VENDIDO', 'RESERVADO', 'ALQUILADO'),
+        'estados_ignorados': ('DISPONIBLE', 'NOVEDAD'),
+        'texto_pagina': ('', False),
+        'texto_flags': ('titulo', 'descripcion', 'migas', 'pagina'),
+        'alquiler': alquiler_por_flags,
+        'alquiler_precio_max': None,
+        'urls_referencia': ('json_ld',),
+        'imagen_por_defecto': None,
+    },
+    '3villas': {
+        'inmobiliaria': '3Villas',
+        'sitemap': 'https://www.3villas.es/sitemap-es-es.xml',
+        'filtro_urls': '/inmueble/',
+        'selector_estado': None,
+        'estados_vendido': ('VENDIDO', 'RESERVADO'),
+        'estados_ignorados': (),
+        'texto_pagina': (' ', True),
+        'texto_flags': ('pagina',),
+        'alquiler': alquiler_por_flags,
+        'alquiler_precio_max': 6000,
+        'urls_referencia': ('json_ld', 'pagina'),
+        'imagen_por_defecto': '',
+    },
+}
 
-        ns = {
-            'sm': "http://www.sitemaps.org/schemas/sitemap/0.9",
-            'image': "http://www.google.com/schemas/sitemap-image/1.1"
-        }
+class SitioDeclarativo:
+    """Base de los sitios descritos con datos: se usan como una función scrape_*_detalle y, fuera del proceso
+    (cola de trabajo, etapa de parseo, particiones), se nombran por su clave en SITIOS"""
+
+    clave: str
+    inmobiliaria: str
+
+    def obtener_urls(self) -> List[Tuple]:
+        raise NotImplementedError
+
+    def extraer(self, url: str, referencia=None) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def __call__(self, url: str, referencia=None) -> Optional[Dict]:
+        return self.extraer(url, referencia)
+
+    def __reduce__(self):
+        return scraper_por_nombre, (self.clave,)
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.clave}>"
+
+class SitioJsonLd(SitioDeclarativo):
+    """Especificación de un sitio ya compilada: valores validados, listas de estados como conjuntos y el
+    selector de estado traducido a XPath una sola vez. extraer() es el recorrido común de todos los sitios."""
+
+    _CLAVES = {'inmobiliaria', 'sitemap', 'filtro_urls', 'selector_estado', 'estados_vendido', 'estados_ignorados',
+               'texto_pagina', 'texto_flags', 'alquiler', 'alquiler_precio_max', 'urls_referencia',
+               'imagen_por_defecto'}
+
+    def __init__(self, clave: str, espec: Dict):
+        faltan, sobran = self._CLAVES - set(espec), set(espec) - self._CLAVES
+        if faltan or sobran:
+            raise ValueError(f"Sitio {clave}: faltan {sorted(faltan)}, sobran {sorted(sobran)}")
+        if not callable(espec['alquiler']):
+            raise ValueError(f"Sitio {clave}: alquiler debe ser una función (flags, migas) -> bool")
+        if not espec['texto_flags'] or set(espec['texto_flags']) - set(CAMPOS_TEXTO_JSON_LD):
+            raise ValueError(f"Sitio {clave}: texto_flags debe tomar campos de {CAMPOS_TEXTO_JSON_LD}")
+        urls_referencia = tuple(espec['urls_referencia'])
+        if urls_referencia[:1] != ('json_ld',) or set(urls_referencia) - set(URLS_REFERENCIA_JSON_LD):
+            raise ValueError(f"Sitio {clave}: urls_referencia empieza por 'json_ld' y admite {URLS_REFERENCIA_JSON_LD}")
+        self.clave = clave
+        self.inmobiliaria = espec['inmobiliaria']
+        self.sitemap = espec['sitemap']
+        self.filtro_urls = espec['filtro_urls']
+        self.selector_estado = espec['selector_estado']
+        self.estados_vendido = tuple(e.upper() for e in espec['estados_vendido'])
+        self.estados_ignorados = frozenset(e.upper() for e in espec['estados_ignorados'])
+        self.separador, self.strip = espec['texto_pagina']
+        self.texto_flags = tuple(espec['texto_flags'])
+        self.alquiler = espec['alquiler']
+        self.alquiler_precio_max = espec['alquiler_precio_max']
+        self.urls_referencia = urls_referencia
+        self.imagen_por_defecto = espec['imagen_por_defecto']
+        if self.selector_estado:
+            PaginaLigera.xpath_de_selector(self.selector_estado)
+
+    def obtener_urls(self) -> List[Tuple[str, str]]:
+        """(referencia, url) de las fichas del sitemap; la referencia es el último tramo de la URL"""
+        try:
+            urls_propiedades = {}
+            for url, _ in leer_sitemap(self.sitemap, self.filtro_urls):
+                referencia = url.split("/")[-1] if not url.endswith("/") else url.split("/")[-2]
+                urls_propiedades[(referencia or "unknown", url)] = None
+            return list(urls_propiedades)
+        except Exception as e:
+            print(f"Error obteniendo URLs de {self.inmobiliaria}: {e}")
+            return []
 
-        urls_propiedades = []
-        for url_tag in root.findall("sm:url", ns):
-            loc = url_tag.find("sm:loc", ns)
-            if loc is None:  # ← CORRECCIÓN: usar 'is None' en lugar de 'not loc'
+    def _estado(self, pagina: 'PaginaLigera', texto_upper: Callable[[], str]) -> Tuple[Optional[str], bool]:
+        estado, vendido = None, False
+        if self.selector_estado:
+            for txt in pagina.textos(self.selector_estado):
+                txt = txt.upper()
+                if any(e in txt for e in self.estados_vendido):
+                    estado, vendido = 'VENDIDO', True
+                elif txt not in self.estados_ignorados:
+                    estado = txt
+        elif any(e in texto_upper() for e in self.estados_vendido):
+            estado, vendido = 'VENDIDO', True
+        return estado, vendido
+
+    def extraer(self, url: str, referencia=None) -> Optional[Dict]:
+        try:
+            r = cliente_http.get(url)
+            r.raise_for_status()
+            # Casi todo sale del JSON-LD, leído del HTML en bruto sin construir el árbol
+            bloques = extraer_json_ld(r.text)
+            data_listing = bloques.get("RealEstateListing")
+            data_breadcrumb = bloques.get("BreadcrumbList")
+            if not data_listing:
+                print(f"No JSON-LD RealEstateListing en {url}")
+                return None
+
+            campos = propiedad_desde_json_ld(data_listing, data_breadcrumb, referencia,
+                                             url_respaldo=url if 'pagina' in self.urls_referencia else "")
+            titulo, precio, galeria = campos["titulo"], campos["precio"], campos["galeria"]
+            migas = [it.get("name", "") for it in data_breadcrumb.get("itemListElement", [])] if data_breadcrumb else []
+
+            # Estado y flags no están en el JSON-LD: se leen del texto de la página
+            pagina = PaginaLigera(r.text)
+            texto = pagina.texto(self.separador, strip=self.strip)
+            fuentes = {
+                'titulo': [titulo] if titulo else [],
+                'descripcion': [campos["descripcion"]] if campos["descripcion"] else [],
+                'migas': migas,
+                'pagina': [texto],
+            }
+            texto_flags = " ".join(t for campo in self.texto_flags for t in fuentes[campo]).upper()
+            # El estado se busca solo en la página: si los flags usan lo mismo, se aprovecha su mayúscula
+            texto_upper = (lambda: texto_flags) if self.texto_flags == ('pagina',) else (lambda: texto.upper())
+            flags = detectar_flags(texto_flags)
+            estado, vendido = self._estado(pagina, texto_upper)
+
+            alquiler = self.alquiler(flags, migas)
+            if alquiler and self.alquiler_precio_max is not None and precio is not None and precio > self.alquiler_precio_max:
+                alquiler = False
+
+            return crear_propiedad_estandar(
+                referencia=campos["referencia"],
+                titulo=titulo,
+                ubicacion=campos["ubicacion"],
+                precio=precio,
+                metros=campos["metros"],
+                metros_parcela=campos["metros_parcela"],
+                habitaciones=campos["habitaciones"],
+                banos=campos["banos"],
+                tipo=detectar_tipo(titulo),
+                estado=estado,
+                piscina=flags["piscina"],
+                garaje=flags["garaje"],
+                ascensor=flags["ascensor"],
+                vistas_mar=flags["vistas_mar"],
+                vendido=vendido,
+                alquiler=alquiler,
+                url_detalle=url,
+                inmobiliaria=self.inmobiliaria,
+                imagen_destacada=galeria[0] if galeria else self.imagen_por_defecto,
+                galeria=galeria
+            )
+        except Exception as e:
+            print(f"Error scrapeando {self.inmobiliaria} {url}: {e}")
+            return None
+
+SITIOS: Dict[str, SitioDeclarativo] = {clave: SitioJsonLd(clave, espec) for clave, espec in SITIOS_JSON_LD.items()}
+
+def nombre_scraper(scraper: Callable) -> str:
+    """Nombre con el que un scraper viaja a otro proceso o a la cola: la clave de un sitio de SITIOS o el nombre de la
+    función scrape_*_detalle"""
+    return scraper.clave if isinstance(scraper, SitioDeclarativo) else scraper.__name__
+
+def scraper_por_nombre(nombre: str) -> Callable:
+    """El scraper que corresponde a un nombre de nombre_scraper"""
+    if nombre in SITIOS:
+        return SITIOS[nombre]
+    scraper_func = globals().get(nombre)
+    if not callable(scraper_func) or not nombre.startswith('scrape_'):
+        raise ValueError(f"Scraper desconocido: {nombre}")
+    return scraper_func
+
+# Fichas HTML sencillas: cada campo sale de un extractor (PaginaDetalle) -> valor, casi siempre creado con las
+# funciones de abajo a partir de un selector CSS
+CAMPOS_SELECTORES = ('titulo', 'precio', 'ubicacion', 'metros', 'metros_parcela', 'habitaciones', 'banos', 'tipo')
+
+class PaginaDetalle:
+    """Lo que reciben los extractores: el árbol ya limpio, la URL, el texto de la página y los cálculos que comparten
+    varios campos (una tabla de características se lee una sola vez)"""
+
+    __slots__ = ('soup', 'url', 'texto', '_calculos')
+
+    def __init__(self, soup: BeautifulSoup, url: str, texto: TextoPagina):
+        self.soup = soup
+        self.url = url
+        self.texto = texto
+        self._calculos = {}
+
+    def calcular(self, funcion: Callable[['PaginaDetalle'], Dict]) -> Dict:
+        """funcion(pagina), calculada en el primer uso"""
+        if funcion not in self._calculos:
+            self._calculos[funcion] = funcion(self)
+        return self._calculos[funcion]
+
+def texto_de(selector: str, limpiar: Optional[Callable] = None, separador: str = '', strip: bool = True) -> Callable:
+    """Texto del primer elemento del selector pasado por limpiar; None si no está"""
+    def extraer(pagina: PaginaDetalle):
+        el = pagina.soup.select_one(selector)
+        if el is None:
+            return None
+        texto = el.get_text(separador, strip=strip)
+        return limpiar(texto) if limpiar else texto
+    return extraer
+
+def texto_tras_icono(clase: str, limpiar: Optional[Callable] = None, separador: str = '', strip: bool = True,
+                     etiqueta: str = 'h5') -> Callable:
+    """Como texto_de, pero del primer <etiqueta> que sigue al icono <i class=clase>"""
+    def extraer(pagina: PaginaDetalle):
+        icono = pagina.soup.find("i", class_=clase)
+        el = icono.find_next(etiqueta) if icono else None
+        if el is None:
+            return None
+        texto = el.get_text(separador, strip=strip)
+        return limpiar(texto) if limpiar else texto
+    return extraer
+
+def grupo(patron: re.Pattern) -> Callable[[str], Optional[str]]:
+    """Limpieza que se queda con el grupo 1 de patron (sin espacios); None si no aparece"""
+    def limpiar(texto: str) -> Optional[str]:
+        m = patron.search(texto)
+        return m.group(1).strip() if m else None
+    return limpiar
+
+def tabla_clave_valor(filas: str, clave: str, valor: str) -> Callable[[PaginaDetalle], Dict[str, str]]:
+    """Tabla de características {CLAVE EN MAYÚSCULAS: valor} de las filas que tienen clave y valor"""
+    def leer(pagina: PaginaDetalle) -> Dict[str, str]:
+        tabla = {}
+        for fila in pagina.soup.select(filas):
+            clave_el, valor_el = fila.select_one(clave), fila.select_one(valor)
+            if clave_el and valor_el:
+                tabla[clave_el.get_text(strip=True).upper()] = valor_el.get_text(" ", strip=True).strip()
+        return tabla
+    return leer
+
+def valor_de(tabla: Callable[[PaginaDetalle], Dict], clave: str, limpiar: Optional[Callable] = None) -> Callable:
+    """Un valor de una tabla (de tabla_clave_valor o de una función del sitio) pasado por limpiar"""
+    def extraer(pagina: PaginaDetalle):
+        valor = pagina.calcular(tabla).get(clave)
+        return limpiar(valor) if limpiar else valor
+    return extraer
+
+def galeria_de(selector: str, atributo: str = 'src', absoluta: bool = True,
+               excluir: Tuple[str, ...] = ('logo', 'icon', 'banner'), sin_repetir: bool = True) -> Callable:
+    """URLs de imágenes del atributo de cada elemento, sin las que contienen algo de excluir"""
+    def extraer(pagina: PaginaDetalle) -> List[str]:
+        galeria, vistas = [], set()
+        for el in pagina.soup.select(selector):
+            if not el.has_attr(atributo):
                 continue
-            url = loc.text.strip()
-            if "/inmueble/" not in url:
+            src = urljoin(pagina.url, el[atributo]) if absoluta else el[atributo]
+            if any(x in src.lower() for x in excluir) or (sin_repetir and src in vistas):
                 continue
-            
-            # ← CORRECCIÓN: extraer referencia de la URL
-            referencia = url.split("/")[-1] if not url.endswith("/") else url.split("/")[-2]
-            if not referencia:
-                referencia = "unknown"
-            
-            # ← CORRECCIÓN: devolver solo tupla (referencia, url)
-            urls_propiedades.append((referencia, url))
+            galeria.append(src)
+            vistas.add(src)
+        return galeria
+    return extraer
+
+def estado_por_etiquetas(selector: str, vendido: Tuple[str, ...], otros: Tuple[str, ...] = (),
+                         maximo: Optional[int] = None) -> Callable:
+    """(estado, vendido) de las etiquetas del selector (las maximo primeras): VENDIDO si alguna contiene un estado de
+    vendido; si no, el primero de otros que aparezca"""
+    def estado(pagina: PaginaDetalle) -> Tuple[Optional[str], bool]:
+        etiquetas = [el.get_text(strip=True).upper() for el in pagina.soup.select(selector, limit=maximo or 0)]
+        if any(e in t for t in etiquetas for e in vendido):
+            return 'VENDIDO', True
+        for otro in otros:
+            if any(otro in t for t in etiquetas):
+                return otro, False
+        return None, False
+    return estado
+
+def estado_en_texto(palabras: Tuple[str, ...]) -> Callable:
+    """(estado, vendido): VENDIDO si el texto de la página menciona alguna de las palabras (en minúsculas)"""
+    def estado(pagina: PaginaDetalle) -> Tuple[Optional[str], bool]:
+        texto = pagina.texto.texto().lower()
+        return ('VENDIDO', True) if any(p in texto for p in palabras) else (None, False)
+    return estado
+
+def estado_del_listado(pagina: PaginaDetalle) -> Tuple[Optional[str], bool]:
+    """(estado, vendido) con el estado que mostraba el listado: vendido o reservado pasa a VENDIDO"""
+    estado = _estados_listado.get(pagina.url)
+    if estado and ("vendido" in estado.lower() or "reservado" in estado.lower()):
+        return 'VENDIDO', True
+    return estado, False
+
+def referencia_si_falta(extraer: Callable) -> Callable:
+    """La referencia del listado; si no la hay, la de la página"""
+    def referencia(pagina: PaginaDetalle, referencia_listado):
+        if referencia_listado:
+            return referencia_listado
+        encontrada = extraer(pagina)
+        return referencia_listado if encontrada is None else encontrada
+    return referencia
+
+def referencia_de_pagina(extraer: Callable) -> Callable:
+    """La referencia de la página; la del listado solo si la página no la muestra"""
+    def referencia(pagina: PaginaDetalle, referencia_listado):
+        encontrada = extraer(pagina)
+        return referencia_listado if encontrada is None else encontrada
+    return referencia
+
+def urls_de_sitemap(sitemap: str, filtro_urls: str) -> Callable[[], List[Tuple]]:
+    """obtener_urls de un sitio que da la referencia en el detalle: (None, url) de las fichas del sitemap"""
+    def obtener_urls() -> List[Tuple]:
+        return unicas_por_url([(None, url) for url, _ in leer_sitemap(sitemap, filtro_urls)])
+    return obtener_urls
+
+class SitioSelectores(SitioDeclarativo):
+    """Especificación de un sitio de fichas HTML ya validada. extraer() es el recorrido común: limpia el árbol, pasa
+    los extractores de cada campo y monta la propiedad"""
+
+    _CLAVES = {'inmobiliaria', 'obtener_urls', 'eliminar', 'texto_pagina', 'referencia', 'campos', 'estado',
+               'galeria', 'alquiler'}
+
+    def __init__(self, clave: str, espec: Dict):
+        faltan, sobran = self._CLAVES - set(espec), set(espec) - self._CLAVES
+        if faltan or sobran:
+            raise ValueError(f"Sitio {clave}: faltan {sorted(faltan)}, sobran {sorted(sobran)}")
+        if set(espec['campos']) - set(CAMPOS_SELECTORES):
+            raise ValueError(f"Sitio {clave}: campos debe tomar nombres de {CAMPOS_SELECTORES}")
+        funciones = [espec['obtener_urls'], espec['estado'], espec['galeria'], espec['alquiler'],
+                     *espec['campos'].values()]
+        if espec['referencia'] is not None:
+            funciones.append(espec['referencia'])
+        if not all(callable(f) for f in funciones):
+            raise ValueError(f"Sitio {clave}: obtener_urls, referencia, campos, estado, galeria y alquiler son funciones")
+        self.clave = clave
+        self.inmobiliaria = espec['inmobiliaria']
+        self._obtener_urls = espec['obtener_urls']
+        self.eliminar = tuple(espec['eliminar'])
+        self.separador, self.strip = espec['texto_pagina']
+        self.referencia = espec['referencia']
+        self.campos = tuple(espec['campos'].items())
+        self.estado = espec['estado']
+        self.galeria = espec['galeria']
+        self.alquiler = espec['alquiler']
+
+    def obtener_urls(self) -> List[Tuple]:
+        try:
+            return self._obtener_urls()
+        except Exception as e:
+            print(f"Error obteniendo URLs de {self.inmobiliaria}: {e}")
+            return []
 
-        return urls_propiedades
-    except Exception as e:
-        print(f"Error obteniendo URLs de Casas en Menorca: {e}")
-        return []
+    def extraer(self, url: str, referencia=None) -> Optional[Dict]:
+        try:
+            r = cliente_http.get(url)
+            r.raise_for_status()
+            soup = crear_soup(r.text)
+            for selector in self.eliminar:
+                for tag in soup.select(selector):
+                    tag.decompose()
+
+            pagina = PaginaDetalle(soup, url, TextoPagina(soup, self.separador, strip=self.strip))
+            campos = {campo: extraer(pagina) for campo, extraer in self.campos}
+            estado, vendido = self.estado(pagina)
+            flags = detectar_flags(pagina.texto)
+            galeria = self.galeria(pagina)
+            titulo = campos.get('titulo')
+
+            return crear_propiedad_estandar(
+                referencia=self.referencia(pagina, referencia) if self.referencia else referencia,
+                titulo=titulo,
+                ubicacion=campos.get('ubicacion'),
+                precio=campos.get('precio'),
+                metros=campos.get('metros'),
+                metros_parcela=campos.get('metros_parcela'),
+                habitaciones=campos.get('habitaciones'),
+                banos=campos.get('banos'),
+                tipo=detectar_tipo(campos.get('tipo') or titulo),
+                estado=estado,
+                piscina=flags["piscina"],
+                garaje=flags["garaje"],
+                ascensor=flags["ascensor"],
+                vistas_mar=flags["vistas_mar"],
+                vendido=vendido,
+                alquiler=self.alquiler(flags, []),
+                url_detalle=url,
+                inmobiliaria=self.inmobiliaria,
+                imagen_destacada=galeria[0] if galeria else "",
+                galeria=galeria
+            )
+        except Exception as e:
+            print(f"Error scrapeando {self.inmobiliaria} {url}: {e}")
+            return None
 
 
-def scrape_casasenmenorca_detalle(url, referencia=None):
-    """Scraper específico para una propiedad de Casas en Menorca usando JSON-LD"""
-    # ← CORRECCIÓN: cambiar parámetro de imagen_destacada a referencia
-    try:
-        r = requests.get(url, headers=HEADERS, timeout=30)
-        r.raise_for_status()
-        soup = BeautifulSoup(r.text, 'html.parser')
+_RE_REF_LISTADO_SEMINARI = re.compile(r'(\d[\w-]*)')
+_RE_NO_REFERENCIA = re.compile(r"[^\w\.-]")
 
-        json_blocks = soup.find_all("script", type="application/ld+json")
-        data_listing = data_breadcrumb = None
+def obtener_urls_fincasseminari(max_paginas=5):
+    """Obtener todas las URLs de propiedades de Fincas Seminari recorriendo paginación"""
+    base_url = "https://www.fincasseminari.com/venta.php"
 
-        for block in json_blocks:
-            try:
-                data = json.loads(block.string)
-            except Exception:
-                continue
-            if not isinstance(data, dict):
-                continue
-            if data.get("@type") == "RealEstateListing":
-                data_listing = data
-            elif data.get("@type") == "BreadcrumbList":
-                data_breadcrumb = data
+    def extraer(soup, url_listado):
+        urls_propiedades = []
+        for item in soup.select("div.item-wrap"):
+            enlace = item.select_one("a[href*='propiedad-venta.php']")
+            h6_tags = item.find_all("h6")
+            referencia = None
+            estado = None
 
-        if not data_listing:
-            print(f"No JSON-LD RealEstateListing en {url}")
-            return None
+            if h6_tags:
+                ref_text = h6_tags[0].get_text(strip=True)
+                m = _RE_REF_LISTADO_SEMINARI.search(ref_text)
+                if m:
+                    referencia = m.group(1)
 
-        # TÍTULO / REFERENCIA / PRECIO
-        titulo = data_listing.get("name")
-        descripcion = data_listing.get("description")
+            # Capturar estado desde el listado
+            estado_tag = item.select_one("span.label")
+            if estado_tag:
+                txt = estado_tag.get_text(strip=True).upper()
+                if txt not in ["NOVEDAD"]:  # omitimos novedad
+                    estado = txt
 
-        if not referencia:
-            match = re.search(r'/(\d+)$', data_listing.get("url", ""))
-            if match:
-                referencia = match.group(1)
+            if enlace and referencia:
+                url_detalle = urljoin(base_url, enlace["href"])
+                # El detalle no muestra el estado: lo lee del diccionario global
+                _estados_listado[url_detalle] = estado
+                precio = precio_en_texto(item.get_text(" ", strip=True))
+                urls_propiedades.append((referencia, url_detalle, precio, estado))
+        return urls_propiedades
 
-        precio = None
-        offers = data_listing.get("offers", {})
-        if isinstance(offers, dict):
-            precio_str = offers.get("price")
-            if precio_str and str(precio_str).isdigit():
-                precio = int(precio_str)
+    return unicas_por_url(recorrer_paginacion(base_url + "?&nump={}", "nump", extraer, max_paginas))
 
-        # UBICACIÓN (breadcrumb)
-        ubicacion = None
-        if data_breadcrumb:
-            items = [it.get("name") for it in data_breadcrumb.get("itemListElement", []) if it.get("name")]
-            if len(items) > 2:
-                items = items[2:-1]
-            seen = set()
-            ubic_list = []
-            for it in items:
-                if it not in seen:
-                    ubic_list.append(it)
-                    seen.add(it)
-            if ubic_list:
-                ubicacion = "; ".join(ubic_list)
-                ubicacion = estandarizar_ubicacion(ubicacion)
-
-        # CARACTERÍSTICAS (desde descripción)
-        habitaciones = banos = metros = metros_parcela = None
-        if descripcion:
-            desc = descripcion.lower()
-            m = re.search(r'(\d+)\s*(?:habitaciones?|dormitorios?)', desc)
-            if m: habitaciones = int(m.group(1))
-            m = re.search(r'(\d+)\s*(?:baños?|aseos?)', desc)
-            if m: banos = int(m.group(1))
-            m = re.search(r'(\d[\d\.,]*)\s*(?:m2|m²)', desc)
-            if m:
-                try: metros = int(m.group(1).replace('.','').replace(',',''))
-                except: pass
-            m = re.search(r'(\d[\d\.,]*)\s*(?:m2|m²).*(parcela|solar|terreno)', desc)
-            if m:
-                try: metros_parcela = int(m.group(1).replace('.','').replace(',',''))
-                except: pass
-
-        # GALERÍA
-        galeria = []
-        if data_listing.get("image"):
-            if isinstance(data_listing["image"], list):
-                galeria = data_listing["image"]
-            else:
-                galeria = [data_listing["image"]]
-        imagen_final = galeria[0] if galeria else None
-
-        # ESTADO
-        estado = None
-        vendido = False
-        for st in soup.select('.stickerRender .stickerText'):
-            txt = st.get_text(strip=True).upper()
-            if 'VENDIDO' in txt or 'RESERVADO' in txt:
-                estado, vendido = 'VENDIDO', True
-            elif txt not in ['DISPONIBLE','NOVEDAD']:
-                estado = txt
-
-        # FLAGS
-        flags = detectar_flags(soup.get_text().upper())
-        piscina, garaje, ascensor, vistas_mar, alquiler = (
-            flags['piscina'], flags['garaje'], flags['ascensor'], flags['vistas_mar'], flags['alquiler']
-        )
-
-        alquiler = False
-
-        if data_breadcrumb:
-            items = data_breadcrumb.get("itemListElement", [])
-            for it in items:
-                nombre = it.get("name", "").lower()
-                if "alquiler" in nombre or "rent" in nombre:
-                    alquiler = True
-                    break
-
-
-        # CREAR PROPIEDAD
-        tipo = detectar_tipo(titulo)
-        return crear_propiedad_estandar(
-            referencia=referencia,
-            titulo=titulo,
-            ubicacion=ubicacion,
-            precio=precio,
-            metros=metros,
-            metros_parcela=metros_parcela,
-            habitaciones=habitaciones,
-            banos=banos,
-            tipo=tipo,
-            estado=estado,
-            piscina=piscina,
-            garaje=garaje,
-            ascensor=ascensor,
-            vistas_mar=vistas_mar,
-            vendido=vendido,
-            alquiler=alquiler,
-            url_detalle=url,
-            inmobiliaria="Casas en Menorca",
-            imagen_destacada=imagen_final,
-            galeria=galeria
-        )
-    except Exception as e:
-        print(f"Error scrapeando Casas en Menorca {url}: {e}")
-        return None
-
-
-def obtener_urls_fincasseminari(max_paginas=5):
-    """Obtener todas las URLs de propiedades de Fincas Seminari recorriendo paginación"""
-    base_url = "https://www.fincasseminari.com/venta.php"
-    urls_propiedades = []
-
-    for nump in range(1, max_paginas+1):
-        url_listado = f"{base_url}?&nump={nump}"
-        try:
-            r = requests.get(url_listado, headers=HEADERS, timeout=30)
-            r.raise_for_status()
-            soup = BeautifulSoup(r.text, "html.parser")
-
-            items = soup.select("div.item-wrap")
-            if not items:  # si ya no hay resultados → parar
-                break
-
-            for item in items:
-                enlace = item.select_one("a[href*='propiedad-venta.php']")
-                h6_tags = item.find_all("h6")
-                referencia = None
-                estado = None
-
-                if h6_tags:
-                    ref_text = h6_tags[0].get_text(strip=True)
-                    m = re.search(r'(\d[\w-]*)', ref_text)
-                    if m:
-                        referencia = m.group(1)
-
-                # Capturar estado desde el listado
-                estado_tag = item.select_one("span.label")
-                if estado_tag:
-                    txt = estado_tag.get_text(strip=True).upper()
-                    if txt not in ["NOVEDAD"]:  # omitimos novedad
-                        estado = txt
-
-                if enlace and referencia:
-                    url_detalle = urljoin(base_url, enlace["href"])
-                    # Retornar (referencia, url) pero guardar estado en un diccionario global
-                    _estados_fincasseminari[url_detalle] = estado
-                    urls_propiedades.append((referencia, url_detalle))
-            
-            time.sleep(1)
-
-        except Exception as e:
-            print(f"Error en página {nump}: {e}")
-            break
-
-    return list(set(urls_propiedades))
 
+_RE_ZONA_SEMINARI = re.compile("Zona", re.I)
 
 def scrape_fincasseminari_detalle(url, referencia=None):
     """Scraper específico para una propiedad de fincasseminari.com"""
     try:
-        r = requests.get(url, headers=HEADERS, timeout=30)
+        r = cliente_http.get(url)
         r.raise_for_status()
-        soup = BeautifulSoup(r.text, "html.parser")
-        for tag in soup(["header","footer"]):
-            tag.decompose()
-
-        texto_completo = soup.get_text(" ", strip=True).upper()
+        soup = crear_soup(r.text, region=REGION_FICHA_SEMINARI, fuera_de_region=("header", "footer"))
+        texto_pagina = TextoPagina(soup, " ", strip=True)
 
         # REFERENCIA
         if not referencia:
             ref_tag = soup.select_one(".detail-amenities-list li .media-body")
             if ref_tag and "REF" in ref_tag.get_text().upper():
-                referencia = re.sub(r"[^\w\.-]", "", ref_tag.get_text())
+                referencia = _RE_NO_REFERENCIA.sub("", ref_tag.get_text())
 
         # TÍTULO
         titulo = None
@@ -2884,7 +5012,7 @@ def scrape_fincasseminari_detalle(url, referencia=None):
 
         # UBICACIÓN
         ubicacion = None
-        zona_tag = soup.find("div", class_="media-body", string=re.compile("Zona", re.I))
+        zona_tag = soup.find("div", class_="media-body", string=_RE_ZONA_SEMINARI)
         if not zona_tag:
             for li in soup.select(".detail-amenities-list li .media-body"):
                 if "zona" in li.get_text(strip=True).lower():
@@ -2904,36 +5032,34 @@ def scrape_fincasseminari_detalle(url, referencia=None):
         precio = None
         precio_tag = soup.select_one(".detail-bar .title-right h3")
         if precio_tag:
-            precio_txt = re.sub(r"[^\d]", "", precio_tag.get_text(strip=True))
-            if precio_txt.isdigit():
-                precio = int(precio_txt)
+            precio = entero_de_digitos(precio_tag.get_text(strip=True))
 
         # CARACTERÍSTICAS
         habitaciones = banos = metros = metros_parcela = None
         for li in soup.select(".detail-amenities-list li .media-body"):
             txt = li.get_text(" ", strip=True).lower()
             if "habitacion" in txt or "dormitorio" in txt:
-                m = re.search(r"(\d+)", txt)
+                m = _RE_ENTERO.search(txt)
                 if m: habitaciones = int(m.group(1))
             elif "baño" in txt or "aseo" in txt:
-                m = re.search(r"(\d+)", txt)
+                m = _RE_ENTERO.search(txt)
                 if m: banos = int(m.group(1))
             elif "construid" in txt or "m2" in txt:
-                m = re.search(r"(\d+)", txt.replace(".", ""))
+                m = _RE_ENTERO.search(txt.replace(".", ""))
                 if m: metros = int(m.group(1))
             elif "parcela" in txt or "terreno" in txt:
-                m = re.search(r"(\d+)", txt.replace(".", ""))
+                m = _RE_ENTERO.search(txt.replace(".", ""))
                 if m: metros_parcela = int(m.group(1))
 
         # ESTADO - CORRIGIDO: usar el estado capturado desde el listado
-        estado = _estados_fincasseminari.get(url, None)
+        estado = _estados_listado.get(url, None)
         vendido = False
         if estado:
             if 'VENDIDO' in estado or 'RESERVADO' in estado:
                 vendido = True
 
         # FLAGS
-        flags = detectar_flags(texto_completo)
+        flags = detectar_flags(texto_pagina)
         piscina, garaje, ascensor, vistas_mar, alquiler = (
             flags["piscina"], flags["garaje"], flags["ascensor"], flags["vistas_mar"], flags["alquiler"]
         )
@@ -2983,9 +5109,9 @@ def obtener_urls_inmocampsbosch(max_paginas=5):
     urls_propiedades = []
 
     try:
-        r = requests.get(base_url, headers=HEADERS, timeout=30)
+        r = cliente_http.get(base_url)
         r.raise_for_status()
-        soup = BeautifulSoup(r.text, "html.parser")
+        soup = crear_soup(r.text)
 
         items = soup.select("div.single-feature")
         for item in items:
@@ -3005,1090 +5131,303 @@ def obtener_urls_inmocampsbosch(max_paginas=5):
 
             if enlace and referencia:
                 url_detalle = urljoin(base_url, enlace["href"])
-                _estados_inmocampsbosch[url_detalle] = estado
-                urls_propiedades.append((referencia, url_detalle))
+                _estados_listado[url_detalle] = estado
+                precio = precio_en_texto(item.get_text(" ", strip=True))
+                urls_propiedades.append((referencia, url_detalle, precio, estado))
 
-        return list(set(urls_propiedades))
+        return unicas_por_url(urls_propiedades)
     except Exception as e:
         print(f"Error obteniendo URLs de inmocampsbosch: {e}")
         return []
 
-def scrape_inmocampsbosch_detalle(url, referencia=None):
-    """Scraper específico para una propiedad de inmocampsbosch.com"""
-    try:
-        r = requests.get(url, headers=HEADERS, timeout=30)
-        r.raise_for_status()
-        soup = BeautifulSoup(r.text, "html.parser")
-        for tag in soup(["header","footer"]):
-            tag.decompose()
-
-        texto_completo = soup.get_text(" ", strip=True)
-
-        # TÍTULO
-        titulo = None
-        h3 = soup.select_one(".property-details-slider-info h3")
-        if h3:
-            titulo = h3.get_text(strip=True)
-
-        # PRECIO
-        precio = None
-        h4 = soup.select_one(".property-details-slider-info h4")
-        if h4:
-            txt = re.sub(r"[^\d]", "", h4.get_text(strip=True))
-            if txt.isdigit():
-                precio = int(txt)
-
-        # UBICACIÓN
-        caracteristicas = {}
-        for media in soup.select(".single-floor-list .media-body"):
-            key_el = media.select_one("h6")
-            val_el = media.select_one("p")
-            if key_el and val_el:
-                key = key_el.get_text(strip=True).upper()
-                val = val_el.get_text(" ", strip=True)
-                caracteristicas[key] = val.strip()
-
-        ubicacion    = estandarizar_ubicacion(caracteristicas.get("ZONA"))
-
-        habitaciones = None
-        if caracteristicas.get("HABITACIONES") and caracteristicas["HABITACIONES"].isdigit():
-            habitaciones = int(caracteristicas["HABITACIONES"])
-
-        banos = None
-        if caracteristicas.get("BAÑOS") and caracteristicas["BAÑOS"].isdigit():
-            banos = int(caracteristicas["BAÑOS"])
-
-        metros = None
-        if caracteristicas.get("SUPERFICIE"):
-            m = re.search(r"\d+", caracteristicas["SUPERFICIE"])
-            if m:
-                metros = int(m.group())
-
-        metros_parcela = None
-        if caracteristicas.get("PARCELA"):
-            m = re.search(r"\d+", caracteristicas["PARCELA"])
-            if m:
-                metros_parcela = int(m.group())
-
-        # ESTADO (desde listado)
-        estado = _estados_inmocampsbosch.get(url)
-        vendido = False
-        if estado:
-            estado_low = estado.lower()
-            if "vendido" in estado_low or "reservado" in estado_low:
-                vendido = True
-                estado = "VENDIDO"
-
-        # FLAGS
-        flags = detectar_flags(texto_completo.upper())
-        piscina, garaje, ascensor, vistas_mar, alquiler = (
-            flags["piscina"], flags["garaje"], flags["ascensor"], flags["vistas_mar"], flags["alquiler"]
-        )
-
-        alquiler = False
-        # GALERÍA
-        galeria = []
-        for img in soup.select(".property-details-slider img, .owl-carousel img"):
-            if img.has_attr("src"):
-                src = urljoin(url, img["src"])
-                if not any(x in src.lower() for x in ["logo","icon","banner"]):
-                    if src not in galeria:
-                        galeria.append(src)
-        imagen_destacada = galeria[0] if galeria else ""
-
-        # CREAR PROPIEDAD
-        tipo = detectar_tipo(titulo)
-        return crear_propiedad_estandar(
-            referencia=referencia,
-            titulo=titulo,
-            ubicacion=ubicacion,
-            precio=precio,
-            metros=metros,
-            metros_parcela=metros_parcela,
-            habitaciones=habitaciones,
-            banos=banos,
-            tipo=tipo,
-            estado=estado,
-            piscina=piscina,
-            garaje=garaje,
-            ascensor=ascensor,
-            vistas_mar=vistas_mar,
-            vendido=vendido,
-            alquiler=alquiler,
-            url_detalle=url,
-            inmobiliaria="Inmobiliaria Camps Bosch",
-            imagen_destacada=imagen_destacada,
-            galeria=galeria
-        )
-    except Exception as e:
-        print(f"Error scrapeando inmocampsbosch {url}: {e}")
-        return None
-
 def obtener_urls_portalmenorca(max_paginas=20):
     """Obtener todas las URLs de portalmenorca.com recorriendo paginación"""
     base_url = "https://www.portalmenorca.com/es/comprar?pag={}"
-    urls_propiedades = []
-
-    for nump in range(1, max_paginas+1):
-        url_listado = base_url.format(nump)
-        try:
-            r = requests.get(url_listado, headers=HEADERS, timeout=30)
-            r.raise_for_status()
-            soup = BeautifulSoup(r.text, "html.parser")
-
-            items = soup.select("div.real-estate-item")
-            if not items:
-                break  # no más resultados → parar
 
-            for item in items:
-                enlace = item.select_one("a[href*='/es/']")
-                precio_tag = item.select_one(".real-estate-item-price span")
-
-                referencia = None
-                url_detalle = None
-
-                if enlace:
-                    href = enlace.get("href")
-                    url_detalle = urljoin(url_listado, href)
-
-                if precio_tag:
-                    txt = precio_tag.get_text(strip=True)
-                    m = re.search(r"REF[: ]?(.+)", txt, re.I)
-                    if m:
-                        referencia = m.group(1).strip()
-
-                if url_detalle and referencia:
-                    urls_propiedades.append((referencia, url_detalle))
-
-            time.sleep(1)
-
-        except Exception as e:
-            print(f"Error en página {nump}: {e}")
-            break
-
-    # eliminar duplicados
-    return list(set(urls_propiedades))
-
-def scrape_portalmenorca_detalle(url, referencia=None):
-    """Scraper para un anuncio de portalmenorca.com"""
-    try:
-        r = requests.get(url, headers=HEADERS, timeout=30)
-        r.raise_for_status()
-        soup = BeautifulSoup(r.text, "html.parser")
-        for tag in soup(["header", "footer"]):
-            tag.decompose()
+    def extraer(soup, url_listado):
+        urls_propiedades = []
+        for item in soup.select("div.real-estate-item"):
+            enlace = item.select_one("a[href*='/es/']")
+            precio_tag = item.select_one(".real-estate-item-price span")
 
-        texto_completo = soup.get_text(" ", strip=True)
+            referencia = None
+            url_detalle = None
 
-        # Estado
-        estado = None
-        vendido = False
-        estado_tag = soup.select_one(".fslider .label.badge")
-        if estado_tag:
-            estado_txt = estado_tag.get_text(strip=True).upper()
-            if "VENDIDO" in estado_txt or "RESERVADO" in estado_txt:
-                estado = "VENDIDO"
-                vendido = True
+            if enlace:
+                href = enlace.get("href")
+                url_detalle = urljoin(url_listado, href)
 
-        # Referencia
-        if not referencia:
-            ref_tag = soup.find("h5", string=re.compile("REF", re.I))
-            if ref_tag:
-                ref_txt = ref_tag.get_text(strip=True)
-                m = re.search(r"REF[: ]?(.+)", ref_txt, re.I)
+            if precio_tag:
+                txt = precio_tag.get_text(strip=True)
+                m = _RE_REF_TEXTO.search(txt)
                 if m:
                     referencia = m.group(1).strip()
 
-        # Título
-        titulo = None
-        h1 = soup.select_one("h1")
-        if h1:
-            titulo = h1.get_text(strip=True)
+            # Precio y estado tal como los muestra el listado (para detectar bajadas y ventas sin re-escanear)
+            bloque_precio = item.select_one(".real-estate-item-price")
+            precio = precio_en_texto(bloque_precio.get_text(" ", strip=True)) if bloque_precio else None
+            estado_tag = item.select_one(".label.badge")
+            estado = (estado_tag.get_text(strip=True).upper() or None) if estado_tag else None
 
-        # Precio
-        precio = None
-        h3_precio = soup.select_one("h3")
-        if h3_precio:
-            precio_txt = h3_precio.get_text(strip=True)
-            m = re.search(r"([\d\.]+)", precio_txt.replace(".", ""))
-            if m:
-                try:
-                    precio = int(m.group(1).replace(".", ""))
-                except:
-                    precio = None
+            if url_detalle and referencia:
+                urls_propiedades.append((referencia, url_detalle, precio, estado))
+        return urls_propiedades
 
-        # Tipo
-        tipo = None
-        tipo_tag = soup.find("i", class_="icon-realestate-incision-plan")
-        if tipo_tag:
-            h5 = tipo_tag.find_next("h5")
-            if h5:
-                tipo = h5.get_text(strip=True)
+    # eliminar duplicados
+    return unicas_por_url(recorrer_paginacion(base_url, "pag", extraer, max_paginas))
 
-        # Ubicación
-        ubicacion = None
-        ubic_tag = soup.find("i", class_="icon-realestate-map")
-        if ubic_tag:
-            h5 = ubic_tag.find_next("h5")
-            if h5:
-                ubicacion_raw = h5.get_text(" ", strip=True)
-                if ubicacion_raw:
-                    # separar por coma o punto y coma
-                    partes = re.split(r"[;,]", ubicacion_raw)
-                    # limpiar espacios, descartar vacíos y quitar duplicados manteniendo orden
-                    seen = set()
-                    partes_unicas = []
-                    for p in partes:
-                        clean = p.strip()
-                        if clean and clean not in seen:
-                            partes_unicas.append(clean)
-                            seen.add(clean)
-                    ubicacion = "; ".join(partes_unicas)
-
-        if ubicacion:
-            ubicacion = estandarizar_ubicacion(ubicacion)
+_RE_REF_PORTALMENORCA = re.compile("REF", re.I)
 
-        # Metros, habitaciones, baños
-        metros = habitaciones = banos = metros_parcela = None
-        metros_tag = soup.find("i", class_="icon-realestate-plan2")
-        if metros_tag:
-            h5 = metros_tag.find_next("h5")
-            if h5:
-                m = re.search(r"(\d+)", h5.get_text())
-                if m: metros = int(m.group(1))
+def _referencia_portalmenorca(pagina: PaginaDetalle) -> Optional[str]:
+    ref_tag = pagina.soup.find("h5", string=_RE_REF_PORTALMENORCA)
+    return grupo(_RE_REF_TEXTO)(ref_tag.get_text(strip=True)) if ref_tag else None
 
-        habs_tag = soup.find("i", class_="icon-realestate-bed")
-        if habs_tag:
-            h5 = habs_tag.find_next("h5")
-            if h5:
-                m = re.search(r"(\d+)", h5.get_text())
-                if m: habitaciones = int(m.group(1))
+def _ubicacion_portalmenorca(texto: str) -> Optional[str]:
+    """Partes separadas por coma o punto y coma, limpias y sin repetir (manteniendo el orden)"""
+    if not texto:
+        return None
+    partes = dict.fromkeys(p.strip() for p in _RE_SEPARADORES_UBICACION.split(texto))
+    ubicacion = "; ".join(p for p in partes if p)
+    return estandarizar_ubicacion(ubicacion) if ubicacion else ubicacion
+
+def _parcela_portalmenorca(pagina: PaginaDetalle) -> Optional[int]:
+    """Parcela de la lista de características (si sale varias veces, la última)"""
+    metros_parcela = None
+    for li in pagina.soup.select(".iconlist li"):
+        txt = li.get_text(strip=True).upper()
+        numero = primer_entero(txt) if "PARCELA" in txt else None
+        if numero is not None:
+            metros_parcela = numero
+    return metros_parcela
+
+def _ubicacion_vidalmenorca(pagina: PaginaDetalle) -> Optional[str]:
+    marcador = pagina.soup.find("span", class_="fa fa-map-marker")
+    return estandarizar_ubicacion(marcador.parent.get_text(strip=True) if marcador and marcador.parent else None)
+
+def _datos_vidalmenorca(pagina: PaginaDetalle) -> Dict[str, int]:
+    """metros, habitaciones y banos de los rótulos del banner"""
+    datos = {}
+    for span in pagina.soup.select(".banner span.info"):
+        txt = span.get_text(" ", strip=True).lower()
+        campo = "metros" if "m" in txt else "habitaciones" if "habit" in txt else "banos" if "baño" in txt else None
+        numero = primer_entero(txt) if campo else None
+        if numero is not None:
+            datos[campo] = numero
+    return datos
+
+def _precio_portalmenorca(texto: str) -> Optional[int]:
+    return primer_entero(texto.replace(".", ""))
+
+def _precio_menorcasa(texto: str) -> Optional[int]:
+    texto = texto.replace("€", "").replace(".", "").replace(",", "").strip()
+    return int(texto) if texto.isdigit() else None
+
+def _ubicacion_menorcasa(pagina: PaginaDetalle) -> Optional[str]:
+    """Migas de pan sin las dos primeras (genéricas) ni repetidas"""
+    migas = pagina.soup.select_one("#breadcrumbs")
+    if migas is None:
+        return None
+    partes = [a.get_text(strip=True) for a in migas.select("a")]
+    return estandarizar_ubicacion("; ".join(dict.fromkeys(partes[2:])))
+
+def _entero_si_digitos(texto: Optional[str]) -> Optional[int]:
+    return int(texto) if texto and texto.isdigit() else None
+
+def _entero_de_cifras(texto: str) -> int:
+    return int(solo_digitos(texto))
+
+_CARACTERISTICAS_CAMPSBOSCH = tabla_clave_valor(".single-floor-list .media-body", "h6", "p")
+
+SITIOS_SELECTORES = {
+    'inmocampsbosch': {
+        'inmobiliaria': 'Inmobiliaria Camps Bosch',
+        'obtener_urls': obtener_urls_inmocampsbosch,       # () -> [(referencia, url, ...)]
+        'eliminar': ('header', 'footer'),                   # selectores que se quitan antes de leer nada
+        'texto_pagina': (' ', True),                        # (separador, strip) del texto para flags y estado
+        'referencia': None,                                 # (pagina, referencia del listado) -> referencia
+        'campos': {                                         # campo de CAMPOS_SELECTORES -> (pagina) -> valor
+            'titulo': texto_de(".property-details-slider-info h3"),
+            'precio': texto_de(".property-details-slider-info h4", entero_de_digitos),
+            'ubicacion': valor_de(_CARACTERISTICAS_CAMPSBOSCH, "ZONA", estandarizar_ubicacion),
+            'habitaciones': valor_de(_CARACTERISTICAS_CAMPSBOSCH, "HABITACIONES", _entero_si_digitos),
+            'banos': valor_de(_CARACTERISTICAS_CAMPSBOSCH, "BAÑOS", _entero_si_digitos),
+            'metros': valor_de(_CARACTERISTICAS_CAMPSBOSCH, "SUPERFICIE", primer_entero),
+            'metros_parcela': valor_de(_CARACTERISTICAS_CAMPSBOSCH, "PARCELA", primer_entero),
+        },
+        'estado': estado_del_listado,                       # (pagina) -> (estado, vendido)
+        'galeria': galeria_de(".property-details-slider img, .owl-carousel img"),
+        'alquiler': alquiler_nunca,                         # (flags, migas) -> bool
+    },
+    'portalmenorca': {
+        'inmobiliaria': 'Portal Menorca',
+        'obtener_urls': obtener_urls_portalmenorca,
+        'eliminar': ('header', 'footer'),
+        'texto_pagina': (' ', True),
+        'referencia': referencia_si_falta(_referencia_portalmenorca),
+        'campos': {
+            'titulo': texto_de("h1"),
+            'precio': texto_de("h3", _precio_portalmenorca),
+            'tipo': texto_tras_icono("icon-realestate-incision-plan"),
+            'ubicacion': texto_tras_icono("icon-realestate-map", _ubicacion_portalmenorca, separador=" "),
+            'metros': texto_tras_icono("icon-realestate-plan2", primer_entero, strip=False),
+            'habitaciones': texto_tras_icono("icon-realestate-bed", primer_entero, strip=False),
+            'banos': texto_tras_icono("icon-realestate-bathtub", primer_entero, strip=False),
+            'metros_parcela': _parcela_portalmenorca,
+        },
+        'estado': estado_por_etiquetas(".fslider .label.badge", ('VENDIDO', 'RESERVADO'), maximo=1),
+        'galeria': galeria_de(".fslider img", absoluta=False),
+        'alquiler': alquiler_por_flags,
+    },
+    'vidalmenorca': {
+        'inmobiliaria': 'Vidal Menorca',
+        'obtener_urls': urls_de_sitemap("https://www.vidalmenorca.com/sitemap.xml", '/propiedades/'),
+        'eliminar': ('header', 'footer', 'div#politica_privacidad'),
+        'texto_pagina': (' ', True),
+        'referencia': referencia_si_falta(texto_de("span.text-muted", grupo(_RE_REF_ALFANUMERICA), strip=False)),
+        'campos': {
+            'titulo': texto_de(".accommodation-title"),
+            'precio': texto_de(".price-number", entero_de_digitos),
+            'ubicacion': _ubicacion_vidalmenorca,
+            'metros': valor_de(_datos_vidalmenorca, "metros"),
+            'habitaciones': valor_de(_datos_vidalmenorca, "habitaciones"),
+            'banos': valor_de(_datos_vidalmenorca, "banos"),
+        },
+        'estado': estado_en_texto(('vendido', 'reservado')),
+        'galeria': galeria_de(".media-gallery img"),
+        'alquiler': alquiler_por_flags,
+    },
+    'menorcasa': {
+        'inmobiliaria': 'Menorcasa',
+        'obtener_urls': urls_de_sitemap("https://menorcasa.com/property-sitemap.xml", "/es/property/"),
+        'eliminar': ('header', 'footer', 'section.rh_property__similar_properties'),
+        'texto_pagina': ('', False),
+        'referencia': referencia_de_pagina(texto_de(".rh_property__id .id")),
+        'campos': {
+            'titulo': texto_de("h1.rh_page__title"),
+            'precio': texto_de(".rh_page__property_price .price", _precio_menorcasa),
+            'ubicacion': _ubicacion_menorcasa,
+            'habitaciones': texto_de(".prop_bedrooms .figure", int),
+            'banos': texto_de(".prop_bathrooms .figure", int),
+            'metros': texto_de(".prop_area .figure", _entero_de_cifras),
+            'metros_parcela': texto_de(".prop_lot_size .figure", _entero_de_cifras),
+        },
+        'estado': estado_por_etiquetas(".rh_label__wrap", ('VENDIDA', 'RESERVADO'), otros=('EXCLUSIVA',)),
+        'galeria': galeria_de("a.slider-img", 'href', absoluta=False, excluir=(), sin_repetir=False),
+        'alquiler': alquiler_por_flags,
+    },
+}
 
-        banos_tag = soup.find("i", class_="icon-realestate-bathtub")
-        if banos_tag:
-            h5 = banos_tag.find_next("h5")
-            if h5:
-                m = re.search(r"(\d+)", h5.get_text())
-                if m: banos = int(m.group(1))
+SITIOS.update((clave, SitioSelectores(clave, espec)) for clave, espec in SITIOS_SELECTORES.items())
 
-        # Parcela (en sección CARACTERÍSTICAS)
-        for li in soup.select(".iconlist li"):
-            txt = li.get_text(strip=True).upper()
-            if "PARCELA" in txt:
-                m = re.search(r"(\d+)", txt)
-                if m: metros_parcela = int(m.group(1))
+def main():
+    """Función principal con sistema eficiente mejorado"""
+    modo = "PRODUCCIÓN" if PRODUCCION else f"TEST (máx. {LIMITE_TEST} propiedades por inmobiliaria)"
+    tipo_escaneo = "COMPLETO" if E_COMPLETO else "INCREMENTAL"
+    
+    print(f"🏠🏠🏠 SCRAPER EFICIENTE DE INMOBILIARIAS 🏠🏠🏠")
+    print(f"Modo: {modo}")
+    print(f"Tipo de escaneo: {tipo_escaneo}")
+    print("=" * 60)
+    
+    # Inicializar sistemas
+    motor = crear_motor_almacenamiento()
+    registro = RegistroScraping(ARCHIVO_REGISTRO, motor=motor)
+    gestor = GestorPropiedades(ARCHIVO_PROPIEDADES, ARCHIVO_TEMP, motor=motor)
+    registro.asignar_inmobiliarias(gestor.obtener_urls_existentes())
+    
+    # Mostrar estadísticas iniciales
+    total_conocidas = len(registro.obtener_urls_conocidas())
+    total_existentes = len(gestor.propiedades_actuales)
+    print(f"📊 URLs conocidas en registro: {total_conocidas}")
+    print(f"📊 Propiedades existentes: {total_existentes}")
+    
+    if E_COMPLETO:
+        print("🔄 Modo COMPLETO: Verificando cambios en todas las propiedades...")
+    else:
+        print("⚡ Modo INCREMENTAL: Buscando solo propiedades nuevas...")
+    
+    # Con cola compartida este proceso también trabaja: sin otras máquinas, la ejecución avanza igual
+    parar_trabajadores = threading.Event()
+    trabajadores = []
+    if cola_trabajo is not None:
+        print(f"📬 Cola de trabajo: {COLA_TRABAJO}")
+        trabajadores = iniciar_trabajadores(cola_trabajo, MAX_HILOS_DETALLE * MAX_INMOBILIARIAS_PARALELAS,
+                                            parar_trabajadores)
+    
+    nuevas_total = 0
+    actualizadas_total = 0
+    
+    # Ejecutar scrapers
+    inmobiliarias = [
+        (scrape_fincasllongas_detalle, "Fincas Llongas", obtener_urls_fincasllongas),
+        (scrape_artrutx_detalle, "Inmobiliaria Artrutx", obtener_urls_artrutx),
+        (scrape_fincasciutadella_detalle, "Fincas Ciutadella", obtener_urls_fincasciutadella),
+        (scrape_inmomenorcacentro_detalle, "Inmo Menorca Centro", obtener_urls_inmomenorcacentro),
+        (scrape_inmobiliariapalau_detalle, "Inmobiliaria Palau", obtener_urls_inmobiliariapalau),
+        (scrape_bonninsanso_detalle, "Bonnin Sanso", obtener_urls_bonninsanso),
+        (scrape_fincasarmengol_detalle, "Fincas Armengol", obtener_urls_fincasarmengol),
+        (scrape_fincasfaro_detalle, "Fincas Faro", obtener_urls_fincasfaro),
+        (scrape_zenhousecredit_detalle, "Zenhouse Credit", obtener_urls_zenhousecredit),
+        (scrape_enprimeralinea_detalle, "En Primera Línea", obtener_urls_enprimeralinea),
+        (SITIOS['casasenmenorca'], "Casas en Menorca", SITIOS['casasenmenorca'].obtener_urls),
+        (scrape_fincasseminari_detalle, "Fincas Seminari", obtener_urls_fincasseminari),
+        (SITIOS['inmocampsbosch'], "Inmobiliaria Camps Bosch", SITIOS['inmocampsbosch'].obtener_urls),
+        (SITIOS['portalmenorca'], "Portal Menorca", SITIOS['portalmenorca'].obtener_urls),
+        (SITIOS['vidalmenorca'], "Vidal Menorca", SITIOS['vidalmenorca'].obtener_urls),
+        (SITIOS['menorcasa'], "Menorcasa", SITIOS['menorcasa'].obtener_urls),
+        (SITIOS['saimmobiliaria'], "SA Inmobiliaria", SITIOS['saimmobiliaria'].obtener_urls),
+        (SITIOS['3villas'], "3Villas", SITIOS['3villas'].obtener_urls),
+    ]
 
-        # Flags
-        flags = detectar_flags(texto_completo.upper())
-        piscina, garaje, ascensor, vistas_mar, alquiler = (
-            flags["piscina"],
-            flags["garaje"],
-            flags["ascensor"],
-            flags["vistas_mar"],
-            flags["alquiler"],
-        )
+    """ Prortal menorca incluye
+    -HOME MENORCA
+    -FINCAS MANTOLAN
+    -MENORCA IN PERSON
+    -FINCAS SANT LLUIS
+    -FINCAS SUNSHINE
+    -FINCAS VENALIS
+    """
 
-        # Galería
-        galeria = []
-        for img in soup.select(".fslider img"):
-            if img.has_attr("src"):
-                src = img["src"]
-                if not any(x in src.lower() for x in ["logo", "icon", "banner"]):
-                    if src not in galeria:
-                        galeria.append(src)
-        imagen_destacada = galeria[0] if galeria else ""
-
-        # Descripción
-        descripcion = None
-        desc_p = soup.select("h1 + h3 + p")
-        if desc_p:
-            descripcion = " ".join(p.get_text(" ", strip=True) for p in desc_p)
-
-        # Crear propiedad
-        tipo_norm = detectar_tipo(tipo or titulo)
-        return crear_propiedad_estandar(
-            referencia=referencia,
-            titulo=titulo,
-            ubicacion=ubicacion,
-            precio=precio,
-            metros=metros,
-            metros_parcela=metros_parcela,
-            habitaciones=habitaciones,
-            banos=banos,
-            tipo=tipo_norm,
-            estado=estado,
-            piscina=piscina,
-            garaje=garaje,
-            ascensor=ascensor,
-            vistas_mar=vistas_mar,
-            vendido=vendido,
-            alquiler=alquiler,
-            url_detalle=url,
-            inmobiliaria="Portal Menorca",
-            imagen_destacada=imagen_destacada,
-            galeria=galeria,
-            descripcion=descripcion,
-        )
-    except Exception as e:
-        print(f"Error scrapeando Portal Menorca {url}: {e}")
-        return None
-
-def obtener_urls_vidalmenorca():
-    """Obtener todas las URLs de propiedades de Vidal Menorca desde el sitemap"""
-    sitemap_url = "https://www.vidalmenorca.com/sitemap.xml"
-    try:
-        r = requests.get(sitemap_url, headers=HEADERS, timeout=30)
-        r.raise_for_status()
-        root = ET.fromstring(r.content)
-
-        urls_propiedades = []
-        url_elements = root.findall(".//{http://www.sitemaps.org/schemas/sitemap/0.9}url")
-        for url_element in url_elements:
-            loc_element = url_element.find("{http://www.sitemaps.org/schemas/sitemap/0.9}loc")
-            if loc_element is not None:
-                url = loc_element.text
-                if '/propiedades/' in url:
-                    # En Vidal Menorca la referencia se extrae en el detalle
-                    urls_propiedades.append((None, url))
-
-        return list(set(urls_propiedades))
-    except Exception as e:
-        print(f"Error obteniendo URLs de Vidal Menorca: {e}")
-        return []
-
-
-
-def scrape_vidalmenorca_detalle(url, referencia=None):
-    """Scraper para un anuncio de Vidal Menorca"""
-    try:
-        r = requests.get(url, headers=HEADERS, timeout=30)
-        r.raise_for_status()
-        soup = BeautifulSoup(r.text, "html.parser")
-        for tag in soup(["header", "footer"]):
-            tag.decompose()
-
-        # Eliminar div con id="politica_privacidad"
-        politica = soup.find("div", id="politica_privacidad")
-        if politica:
-            politica.decompose()
-
-        texto_completo = soup.get_text(" ", strip=True)
-
-        # Referencia
-        if not referencia:
-            ref_tag = soup.find("span", class_="text-muted")
-            if ref_tag:
-                m = re.search(r"Ref\.\s*[:\-]?\s*(\w+)", ref_tag.get_text())
-                if m:
-                    referencia = m.group(1).strip()
-
-        # Título
-        titulo = None
-        h2 = soup.select_one(".accommodation-title")
-        if h2:
-            titulo = h2.get_text(strip=True)
-
-        # Precio
-        precio = None
-        precio_tag = soup.select_one(".price-number")
-        if precio_tag:
-            txt = precio_tag.get_text(strip=True)
-            num = re.sub(r"[^\d]", "", txt)
-            if num.isdigit():
-                precio = int(num)
-
-        # Ubicación
-        ubicacion = None
-        ubic_tag = soup.find("span", class_="fa fa-map-marker")
-        if ubic_tag and ubic_tag.parent:
-            ubicacion = ubic_tag.parent.get_text(strip=True)
-        ubicacion = estandarizar_ubicacion(ubicacion)
-
-        # Características principales
-        habitaciones = banos = metros = None
-        metros_parcela = None
-        for span in soup.select(".banner span.info"):
-            txt = span.get_text(" ", strip=True).lower()
-            if "m" in txt:
-                m = re.search(r"(\d+)", txt)
-                if m: metros = int(m.group(1))
-            elif "habit" in txt:
-                m = re.search(r"(\d+)", txt)
-                if m: habitaciones = int(m.group(1))
-            elif "baño" in txt:
-                m = re.search(r"(\d+)", txt)
-                if m: banos = int(m.group(1))
-
-        # Descripción
-        descripcion = None
-        desc_div = soup.select_one(".description")
-        if desc_div:
-            descripcion = desc_div.get_text(" ", strip=True)
-
-        # Galería
-        galeria = []
-        for img in soup.select(".media-gallery img"):
-            if img.has_attr("src"):
-                src = urljoin(url, img["src"])
-                if not any(x in src.lower() for x in ["logo", "icon", "banner"]):
-                    if src not in galeria:
-                        galeria.append(src)
-        imagen_destacada = galeria[0] if galeria else ""
-
-        # Estado
-        estado = None
-        vendido = False
-        if "vendido" in texto_completo.lower() or "reservado" in texto_completo.lower():
-            estado = "VENDIDO"
-            vendido = True
-
-        # Flags
-        flags = detectar_flags(texto_completo.upper())
-        piscina, garaje, ascensor, vistas_mar, alquiler = (
-            flags["piscina"],
-            flags["garaje"],
-            flags["ascensor"],
-            flags["vistas_mar"],
-            flags["alquiler"],
-        )
-
-        tipo = detectar_tipo(titulo)
-
-        return crear_propiedad_estandar(
-            referencia=referencia,
-            titulo=titulo,
-            ubicacion=ubicacion,
-            precio=precio,
-            metros=metros,
-            metros_parcela=metros_parcela,
-            habitaciones=habitaciones,
-            banos=banos,
-            tipo=tipo,
-            estado=estado,
-            piscina=piscina,
-            garaje=garaje,
-            ascensor=ascensor,
-            vistas_mar=vistas_mar,
-            vendido=vendido,
-            alquiler=alquiler,
-            url_detalle=url,
-            inmobiliaria="Vidal Menorca",
-            imagen_destacada=imagen_destacada,
-            galeria=galeria,
-            descripcion=descripcion,
-        )
-    except Exception as e:
-        print(f"Error scrapeando Vidal Menorca {url}: {e}")
-        return None
-
-def obtener_urls_menorcasa():
-    """Obtener todas las URLs de propiedades de Menorcasa desde el sitemap"""
-    sitemap_url = "https://menorcasa.com/property-sitemap.xml"
-    try:
-        r = requests.get(sitemap_url, headers=HEADERS, timeout=30)
-        r.raise_for_status()
-        root = ET.fromstring(r.content)
-
-        urls_propiedades = []
-        url_elements = root.findall(".//{http://www.sitemaps.org/schemas/sitemap/0.9}url")
-        for url_element in url_elements:
-            loc_element = url_element.find("{http://www.sitemaps.org/schemas/sitemap/0.9}loc")
-            if loc_element is not None:
-                url = loc_element.text
-                if "/es/property/" in url:
-                    urls_propiedades.append((None, url))  # referencia se extrae en el detalle
-
-        return list(set(urls_propiedades))
-    except Exception as e:
-        print(f"Error obteniendo URLs de Menorcasa: {e}")
-        return []
-
-
-def scrape_menorcasa_detalle(url, referencia=None):
-    """Scraper específico para un detalle de propiedad en Menorcasa"""
-    try:
-        r = requests.get(url, headers=HEADERS, timeout=30)
-        r.raise_for_status()
-        soup = BeautifulSoup(r.text, "html.parser")
-        for selector in ["header", "footer", "section.rh_property__similar_properties"]:
-            for tag in soup.select(selector):
-                tag.decompose()
-
-        # Referencia
-        ref_tag = soup.select_one(".rh_property__id .id")
-        if ref_tag:
-            referencia = ref_tag.get_text(strip=True)
-
-        # Título
-        titulo = None
-        h1 = soup.select_one("h1.rh_page__title")
-        if h1:
-            titulo = h1.get_text(strip=True)
-
-        # Precio
-        precio = None
-        precio_tag = soup.select_one(".rh_page__property_price .price")
-        if precio_tag:
-            raw_precio = precio_tag.get_text(strip=True)
-            # Eliminar símbolo de euro, espacios, puntos y comas
-            raw_precio = raw_precio.replace("€", "").replace(".", "").replace(",", "").strip()
-            if raw_precio.isdigit():
-                precio = int(raw_precio)
-
-
-        # Estado (vendida / reservada)
-        estado = None
-        vendido = False
-
-        labels = [lbl.get_text(strip=True).upper() for lbl in soup.select(".rh_label__wrap")]
-
-        if any("VENDIDA" in l or "RESERVADO" in l for l in labels):
-            estado = "VENDIDO"
-            vendido = True
-        elif any("EXCLUSIVA" in l for l in labels):
-            estado = "EXCLUSIVA"
-
-        # Ubicación (breadcrumbs)
-        ubicacion = None
-        breadcrumb = soup.select_one("#breadcrumbs")
-        if breadcrumb:
-            partes = [a.get_text(strip=True) for a in breadcrumb.select("a")]
-            ubicacion = "; ".join(dict.fromkeys(partes[2:]))  # quitar duplicados y primeros genéricos
-            ubicacion = estandarizar_ubicacion(ubicacion)
-
-        # Características
-        habitaciones = None
-        banos = None
-        metros = None
-        metros_parcela = None
-
-        hab = soup.select_one(".prop_bedrooms .figure")
-        if hab: habitaciones = int(hab.get_text(strip=True))
-
-        ban = soup.select_one(".prop_bathrooms .figure")
-        if ban: banos = int(ban.get_text(strip=True))
-
-        area = soup.select_one(".prop_area .figure")
-        if area: metros = int(re.sub(r"\D", "", area.get_text(strip=True)))
-
-        lot = soup.select_one(".prop_lot_size .figure")
-        if lot: metros_parcela = int(re.sub(r"\D", "", lot.get_text(strip=True)))
-
-        # Descripción
-        descripcion = None
-        desc_tag = soup.select_one("#the_content")
-        if desc_tag:
-            descripcion = limpiar_texto(desc_tag.get_text(" ", strip=True))
-
-        # Imágenes
-        imagenes = []
-        for img_tag in soup.select("a.slider-img"):
-            if img_tag.has_attr("href"):
-                imagenes.append(img_tag["href"])
-
-        imagen_destacada = imagenes[0] if imagenes else ""
-
-         # Flags
-        texto_completo = soup.get_text()
-        flags = detectar_flags(texto_completo.upper())
-        piscina, garaje, ascensor, vistas_mar, alquiler = (
-            flags["piscina"],
-            flags["garaje"],
-            flags["ascensor"],
-            flags["vistas_mar"],
-            flags["alquiler"],
-        )
-
-         # CREAR PROPIEDAD
-        tipo = detectar_tipo(titulo)
-        return crear_propiedad_estandar(
-            referencia=referencia,
-            titulo=titulo,
-            ubicacion=ubicacion,
-            precio=precio,
-            metros=metros,
-            metros_parcela=metros_parcela,
-            habitaciones=habitaciones,
-            banos=banos,
-            tipo=tipo,
-            estado=estado,
-            piscina=piscina,
-            garaje=garaje,
-            ascensor=ascensor,
-            vistas_mar=vistas_mar,
-            vendido=vendido,
-            alquiler=alquiler,
-            url_detalle=url,
-            inmobiliaria="Menorcasa",
-            imagen_destacada=imagen_destacada,
-            galeria=imagenes,
-            descripcion=descripcion,
-        )
-
-    except Exception as e:
-        print(f"Error scrapeando Menorcasa {url}: {e}")
-        return None
-
-def obtener_urls_saimmobiliaria():
-    """Obtener todas las URLs de propiedades de SA Inmobiliaria desde el sitemap"""
-    sitemap_url = "https://www.saimmobiliaria.com/sitemap-es-es.xml"
-    try:
-        r = requests.get(sitemap_url, headers=HEADERS, timeout=30)
-        r.raise_for_status()
-        root = ET.fromstring(r.content)
-
-        ns = {"sm": "http://www.sitemaps.org/schemas/sitemap/0.9"}
-        urls_propiedades = []
-        for url_tag in root.findall("sm:url", ns):
-            loc = url_tag.find("sm:loc", ns)
-            if loc is None:
-                continue
-            url = loc.text.strip()
-            if "/inmueble/" not in url:
-                continue
-
-            referencia = url.split("/")[-1] if not url.endswith("/") else url.split("/")[-2]
-            if not referencia:
-                referencia = "unknown"
-            urls_propiedades.append((referencia, url))
-
-        return urls_propiedades
-    except Exception as e:
-        print(f"Error obteniendo URLs de SA Inmobiliaria: {e}")
-        return []
-
-def scrape_saimmobiliaria_detalle(url, referencia=None):
-    """Scraper específico para una propiedad de saimmobiliaria.com usando JSON-LD"""
-    try:
-        r = requests.get(url, headers=HEADERS, timeout=30)
-        r.raise_for_status()
-        soup = BeautifulSoup(r.text, "html.parser")
-
-        # Buscar bloques JSON-LD
-        json_blocks = soup.find_all("script", type="application/ld+json")
-        data_listing = data_breadcrumb = None
-
-        for block in json_blocks:
-            try:
-                data = json.loads(block.string)
-            except Exception:
-                continue
-            if not isinstance(data, dict):
-                continue
-            if data.get("@type") == "RealEstateListing":
-                data_listing = data
-            elif data.get("@type") == "BreadcrumbList":
-                data_breadcrumb = data
-
-        if not data_listing:
-            print(f"No JSON-LD RealEstateListing en {url}")
-            return None
-
-        # ======================
-        # REFERENCIA
-        # ======================
-        if not referencia:
-            match = re.search(r"/(\d+)$", data_listing.get("url", ""))
-            if match:
-                referencia = match.group(1)
-
-        # ======================
-        # TÍTULO, DESCRIPCIÓN
-        # ======================
-        titulo = data_listing.get("name")
-        descripcion = data_listing.get("description")
-
-        # ======================
-        # PRECIO
-        # ======================
-        precio = None
-        offers = data_listing.get("offers", {})
-        if isinstance(offers, dict):
-            precio_str = offers.get("price")
-            if precio_str and str(precio_str).isdigit():
-                precio = int(precio_str)
-
-        # ======================
-        # UBICACIÓN (breadcrumb)
-        # ======================
-        ubicacion = None
-        if data_breadcrumb:
-            items = [it.get("name") for it in data_breadcrumb.get("itemListElement", []) if it.get("name")]
-            if len(items) > 2:
-                items = items[2:-1]  # quitamos niveles genéricos + el último (título)
-            seen, ubic_list = set(), []
-            for it in items:
-                if it not in seen:
-                    ubic_list.append(it)
-                    seen.add(it)
-            if ubic_list:
-                ubicacion = "; ".join(ubic_list)
-                ubicacion = estandarizar_ubicacion(ubicacion)
-
-        # ======================
-        # CARACTERÍSTICAS (extraer de descripción)
-        # ======================
-        habitaciones = banos = metros = metros_parcela = None
-        if descripcion:
-            desc = descripcion.lower()
-            m = re.search(r"(\d+)\s*(?:habitaciones?|dormitorios?)", desc)
-            if m: habitaciones = int(m.group(1))
-            m = re.search(r"(\d+)\s*(?:baños?|aseos?)", desc)
-            if m: banos = int(m.group(1))
-            m = re.search(r"(\d[\d\.,]*)\s*(?:m2|m²)", desc)
-            if m:
-                try: metros = int(m.group(1).replace(".","").replace(",",""))
-                except: pass
-            m = re.search(r"(\d[\d\.,]*)\s*(?:m2|m²).*(parcela|solar|terreno)", desc)
-            if m:
-                try: metros_parcela = int(m.group(1).replace(".","").replace(",",""))
-                except: pass
-
-        # ======================
-        # IMÁGENES
-        # ======================
-        galeria = []
-        if data_listing.get("image"):
-            if isinstance(data_listing["image"], list):
-                galeria = data_listing["image"]
-            else:
-                galeria = [data_listing["image"]]
-        imagen_destacada = galeria[0] if galeria else None
-
-        # ======================
-        # ESTADO
-        # ======================
-        estado, vendido = None, False
-        for st in soup.select(".stickerRender .stickerText"):
-            txt = st.get_text(strip=True).upper()
-            if "VENDIDO" in txt or "RESERVADO" in txt or "ALQUILADO" in txt:
-                estado, vendido = "VENDIDO", True
-            elif txt not in ["DISPONIBLE", "NOVEDAD"]:
-                estado = txt
-
-        # ======================
-        # FLAGS
-        # ======================
-        extra_txt = []
-
-        # añadir título
-        if titulo:
-            extra_txt.append(titulo)
-
-        # añadir descripción
-        if descripcion:
-            extra_txt.append(descripcion)
-
-        # añadir breadcrumb
-        if data_breadcrumb:
-            nombres = [it.get("name", "") for it in data_breadcrumb.get("itemListElement", [])]
-            extra_txt.extend(nombres)
-
-        # añadir todo el texto visible
-        extra_txt.append(soup.get_text())
-
-        # crear el string final
-        texto_flags = " ".join(extra_txt).upper()
-
-        # pasar a detectar_flags
-        flags = detectar_flags(texto_flags)
-        piscina, garaje, ascensor, vistas_mar, alquiler = (
-            flags["piscina"], flags["garaje"], flags["ascensor"], flags["vistas_mar"], flags["alquiler"]
-        )
-
-        # CREAR PROPIEDAD
-        tipo = detectar_tipo(titulo)
-        return crear_propiedad_estandar(
-            referencia=referencia,
-            titulo=titulo,
-            ubicacion=ubicacion,
-            precio=precio,
-            metros=metros,
-            metros_parcela=metros_parcela,
-            habitaciones=habitaciones,
-            banos=banos,
-            tipo=tipo,
-            estado=estado,
-            piscina=piscina,
-            garaje=garaje,
-            ascensor=ascensor,
-            vistas_mar=vistas_mar,
-            vendido=vendido,
-            alquiler=alquiler,
-            url_detalle=url,
-            inmobiliaria="SA Inmobiliaria",
-            imagen_destacada=imagen_destacada,
-            galeria=galeria
-        )
-    except Exception as e:
-        print(f"Error scrapeando SA Inmobiliaria {url}: {e}")
-        return None
-
-def obtener_urls_3villas():
-    """Obtener todas las URLs de propiedades de 3Villas desde el sitemap (solo /inmueble/)."""
-    sitemap_url = "https://www.3villas.es/sitemap-es-es.xml"
-    try:
-        r = requests.get(sitemap_url, headers=HEADERS, timeout=30)
-        r.raise_for_status()
-        root = ET.fromstring(r.content)
-
-        ns = {"sm": "http://www.sitemaps.org/schemas/sitemap/0.9"}
-        urls_propiedades = []
-        for url_tag in root.findall("sm:url", ns):
-            loc = url_tag.find("sm:loc", ns)
-            if loc is None:
-                continue
-            url = loc.text.strip()
-            if "/inmueble/" not in url:
-                continue
-
-            # referencia = el último segmento de la URL
-            referencia = url.split("/")[-1] if not url.endswith("/") else url.split("/")[-2]
-            if not referencia:
-                referencia = "unknown"
-
-            urls_propiedades.append((referencia, url))
-
-        # eliminar duplicados por si acaso
-        return list(set(urls_propiedades))
-    except Exception as e:
-        print(f"Error obteniendo URLs de 3Villas: {e}")
-        return []
-
-
-def scrape_3villas_detalle(url, referencia=None):
-    """Scraper específico para una propiedad de 3villas.es usando JSON-LD (misma plataforma que SA Inmobiliaria)."""
-    try:
-        r = requests.get(url, headers=HEADERS, timeout=30)
-        r.raise_for_status()
-        soup = BeautifulSoup(r.text, "html.parser")
-
-        # Buscar bloques JSON-LD
-        json_blocks = soup.find_all("script", type="application/ld+json")
-        data_listing = data_breadcrumb = None
-
-        for block in json_blocks:
-            try:
-                data = json.loads(block.string)
-            except Exception:
-                continue
-            if not isinstance(data, dict):
-                continue
-            if data.get("@type") == "RealEstateListing":
-                data_listing = data
-            elif data.get("@type") == "BreadcrumbList":
-                data_breadcrumb = data
-
-        if not data_listing:
-            print(f"No JSON-LD RealEstateListing en {url}")
-            return None
-
-        # ======================
-        # REFERENCIA
-        # ======================
-        if not referencia:
-            match = re.search(r"/(\d+)$", data_listing.get("url", "") or url)
-            if match:
-                referencia = match.group(1)
-
-        # ======================
-        # TÍTULO, DESCRIPCIÓN
-        # ======================
-        titulo = data_listing.get("name")
-        descripcion = data_listing.get("description")
-
-        # ======================
-        # PRECIO
-        # ======================
-        precio = None
-        offers = data_listing.get("offers", {})
-        if isinstance(offers, dict):
-            precio_str = offers.get("price")
-            if precio_str and str(precio_str).isdigit():
-                precio = int(precio_str)
-
-        # ======================
-        # UBICACIÓN (breadcrumb)
-        # ======================
-        ubicacion = None
-        if data_breadcrumb:
-            items = [it.get("name") for it in data_breadcrumb.get("itemListElement", []) if it.get("name")]
-            # quitar niveles genéricos y el último (título)
-            if len(items) > 2:
-                items = items[2:-1]
-            seen, ubic_list = set(), []
-            for it in items:
-                if it and it not in seen:
-                    ubic_list.append(it)
-                    seen.add(it)
-            if ubic_list:
-                ubicacion = "; ".join(ubic_list)
-                ubicacion = estandarizar_ubicacion(ubicacion)
-
-        # ======================
-        # CARACTERÍSTICAS (desde descripción si aparecen)
-        # ======================
-        habitaciones = banos = metros = metros_parcela = None
-        if descripcion:
-            desc = descripcion.lower()
-            m = re.search(r"(\d+)\s*(?:habitaciones?|dormitorios?)", desc)
-            if m: habitaciones = int(m.group(1))
-            m = re.search(r"(\d+)\s*(?:baños?|aseos?)", desc)
-            if m: banos = int(m.group(1))
-            m = re.search(r"(\d[\d\.,]*)\s*(?:m2|m²)", desc)
-            if m:
-                try:
-                    metros = int(m.group(1).replace(".", "").replace(",", ""))
-                except:
-                    pass
-            m = re.search(r"(\d[\d\.,]*)\s*(?:m2|m²).*(parcela|solar|terreno)", desc)
-            if m:
-                try:
-                    metros_parcela = int(m.group(1).replace(".", "").replace(",", ""))
-                except:
-                    pass
-
-        # ======================
-        # ESTADO / FLAGS / GALERÍA
-        # ======================
-        texto_upper = soup.get_text(" ", strip=True).upper()
-        flags = detectar_flags(texto_upper)
-        piscina = flags["piscina"]
-        garaje = flags["garaje"]
-        ascensor = flags["ascensor"]
-        vistas_mar = flags["vistas_mar"]
-        alquiler = flags["alquiler"]
-
-        # Galería (si la plataforma incluye array de imágenes en el JSON-LD)
-        galeria = []
-        images = data_listing.get("image")
-        if images:
-            galeria = images if isinstance(images, list) else [images]
-        imagen_destacada = galeria[0] if galeria else ""
-
-        # Estado (vendido/reservado a partir de stickers/texto)
-        estado = None
-        vendido = False
-        if "VENDIDO" in texto_upper or "RESERVADO" in texto_upper:
-            estado, vendido = "VENDIDO", True
-
-        # Tipo
-        tipo = detectar_tipo(titulo)
-
-        # Crear propiedad estandarizada
-        return crear_propiedad_estandar(
-            referencia=referencia,
-            titulo=titulo,
-            ubicacion=ubicacion,
-            precio=precio,
-            metros=metros,
-            metros_parcela=metros_parcela,
-            habitaciones=habitaciones,
-            banos=banos,
-            tipo=tipo,
-            estado=estado,
-            piscina=piscina,
-            garaje=garaje,
-            ascensor=ascensor,
-            vistas_mar=vistas_mar,
-            vendido=vendido,
-            alquiler=alquiler if alquiler and (precio is None or precio <= 6000) else False,
-            url_detalle=url,
-            inmobiliaria="3Villas",
-            imagen_destacada=imagen_destacada,
-            galeria=galeria
-        )
-    except Exception as e:
-        print(f"Error scrapeando 3Villas {url}: {e}")
-        return None
-
-
-
-def main():
-    """Función principal con sistema eficiente mejorado"""
-    modo = "PRODUCCIÓN" if PRODUCCION else f"TEST (máx. {LIMITE_TEST} propiedades por inmobiliaria)"
-    tipo_escaneo = "COMPLETO" if E_COMPLETO else "INCREMENTAL"
-    
-    print(f"🏠🏠🏠 SCRAPER EFICIENTE DE INMOBILIARIAS 🏠🏠🏠")
-    print(f"Modo: {modo}")
-    print(f"Tipo de escaneo: {tipo_escaneo}")
-    print("=" * 60)
-    
-    # Inicializar sistemas
-    registro = RegistroScraping(ARCHIVO_REGISTRO)
-    gestor = GestorPropiedades(ARCHIVO_PROPIEDADES, ARCHIVO_TEMP)
-    
-    # Mostrar estadísticas iniciales
-    total_conocidas = len(registro.obtener_urls_conocidas())
-    total_existentes = len(gestor.propiedades_actuales)
-    print(f"📊 URLs conocidas en registro: {total_conocidas}")
-    print(f"📊 Propiedades existentes: {total_existentes}")
-    
-    if E_COMPLETO:
-        print("🔄 Modo COMPLETO: Verificando cambios en todas las propiedades...")
-    else:
-        print("⚡ Modo INCREMENTAL: Buscando solo propiedades nuevas...")
-    
-    nuevas_total = 0
-    actualizadas_total = 0
-    
-    # Ejecutar scrapers
-    inmobiliarias = [
-        (scrape_fincasllongas_detalle, "Fincas Llongas", obtener_urls_fincasllongas),
-        (scrape_artrutx_detalle, "Inmobiliaria Artrutx", obtener_urls_artrutx),
-        (scrape_fincasciutadella_detalle, "Fincas Ciutadella", obtener_urls_fincasciutadella),
-        (scrape_inmomenorcacentro_detalle, "Inmo Menorca Centro", obtener_urls_inmomenorcacentro),
-        (scrape_inmobiliariapalau_detalle, "Inmobiliaria Palau", obtener_urls_inmobiliariapalau),
-        (scrape_bonninsanso_detalle, "Bonnin Sanso", obtener_urls_bonninsanso),
-        (scrape_fincasarmengol_detalle, "Fincas Armengol", obtener_urls_fincasarmengol),
-        (scrape_fincasfaro_detalle, "Fincas Faro", obtener_urls_fincasfaro),
-        (scrape_zenhousecredit_detalle, "Zenhouse Credit", obtener_urls_zenhousecredit),
-        (scrape_enprimeralinea_detalle, "En Primera Línea", obtener_urls_enprimeralinea),
-        (scrape_casasenmenorca_detalle, "Casas en Menorca", obtener_urls_casasenmenorca),
-        (scrape_fincasseminari_detalle, "Fincas Seminari", obtener_urls_fincasseminari),
-        (scrape_inmocampsbosch_detalle, "Inmobiliaria Camps Bosch", obtener_urls_inmocampsbosch),
-        (scrape_portalmenorca_detalle, "Portal Menorca", obtener_urls_portalmenorca),
-        (scrape_vidalmenorca_detalle, "Vidal Menorca", obtener_urls_vidalmenorca),
-        (scrape_menorcasa_detalle, "Menorcasa", obtener_urls_menorcasa),
-        (scrape_saimmobiliaria_detalle, "SA Inmobiliaria", obtener_urls_saimmobiliaria),
-        (scrape_3villas_detalle, "3Villas",obtener_urls_3villas),
-    ]
-
-    """ Prortal menorca incluye
-    -HOME MENORCA
-    -FINCAS MANTOLAN
-    -MENORCA IN PERSON
-    -FINCAS SANT LLUIS
-    -FINCAS SUNSHINE
-    -FINCAS VENALIS
-    """
-
-    for scraper_func, nombre, obtener_urls_func in inmobiliarias:
-        try:
-            propiedades_nuevas = scraper_eficiente_website(
-                scraper_func=scraper_func,
-                nombre_inmobiliaria=nombre,
-                registro=registro,
-                gestor=gestor,
-                obtener_urls_func=obtener_urls_func
-            )
-            nuevas_total += len(propiedades_nuevas)
-        except Exception as e:
-            print(f"❌ Error con {nombre}: {e}")
+    # Cada inmobiliaria está en un host distinto: se procesan en paralelo y la cortesía se aplica por host
+    if PROCESOS_INMOBILIARIAS > 1:
+        nuevas_total += ejecutar_inmobiliarias_en_procesos(inmobiliarias, registro, gestor)
+    else:
+        # Cada cambio se anota al momento con la posición de su inmobiliaria; el orden de la lista se aplica al compactar
+        with ThreadPoolExecutor(max_workers=MAX_INMOBILIARIAS_PARALELAS) as executor:
+            futuros = [
+                (nombre, executor.submit(
+                    scraper_eficiente_website,
+                    scraper_func=scraper_func,
+                    nombre_inmobiliaria=nombre,
+                    registro=registro,
+                    gestor=gestor,
+                    obtener_urls_func=obtener_urls_func,
+                    orden=i
+                ))
+                for i, (scraper_func, nombre, obtener_urls_func) in enumerate(inmobiliarias)
+            ]
+            for nombre, futuro in futuros:
+                try:
+                    propiedades_nuevas = futuro.result()
+                    nuevas_total += len(propiedades_nuevas)
+                except Exception as e:
+                    print(f"❌ Error con {nombre}: {e}")
 
 
     # Pons Morales
     propiedades_ponsmorales = scrape_mobilia_listado("https://www.ponsmorales.com/es/venta", "Pons Morales")
     for prop in propiedades_ponsmorales:
         gestor.agregar_propiedad(prop)
-        registro.registrar_url_escaneada(prop['url_detalle'], prop.get('precio'), prop.get('estado'))
+        registro.registrar_url_escaneada(prop['url_detalle'], prop.get('precio'), prop.get('estado'),
+                                         prop.get('inmobiliaria'))
  
 
     # Finques Torres
     propiedades_finquestorres = scrape_mobilia_listado("https://www.finquestorres.net/es/venta", "Finques Torres")
     for prop in propiedades_finquestorres:
         gestor.agregar_propiedad(prop)
-        registro.registrar_url_escaneada(prop['url_detalle'], prop.get('precio'), prop.get('estado'))
+        registro.registrar_url_escaneada(prop['url_detalle'], prop.get('precio'), prop.get('estado'),
+                                         prop.get('inmobiliaria'))
     
     # Finalizar y guardar (con opción de organizar por inmobiliaria)
     GUARDAR_POR_INMOBILIARIA = False  # Configurar según preferencia
@@ -4097,7 +5436,18 @@ def main():
     if E_COMPLETO:
         registro.marcar_ejecucion_completa()
     
-    registro.guardar_registro()
+    registro.guardar_registro(compactar=True)
+    motor.cerrar()
+    parar_trabajadores.set()
+    for trabajador in trabajadores:
+        trabajador.join()
+    if cola_trabajo is not None:
+        cola_trabajo.cerrar()
+    politicas_robots.guardar()
+    if validadores_http is not None:
+        validadores_http.guardar()
+    if etapa_parseo is not None:
+        etapa_parseo.cerrar()
     
     print("\n" + "=" * 60)
     print("✅ SCRAPING COMPLETADO")
@@ -4113,5 +5463,30 @@ def main():
     else:
         print(f"⚡ Propiedades nuevas encontradas: {nuevas_total}")
 
+    info_ubicaciones = estandarizar_ubicacion.cache_info()
+    if info_ubicaciones.hits + info_ubicaciones.misses:
+        # Solo las de este proceso: los de parseo e inmobiliarias llevan su propia caché
+        print(f"📍 Ubicaciones normalizadas: {info_ubicaciones.hits} desde caché, {info_ubicaciones.misses} calculadas")
+
+def main_trabajador():
+    """Máquina trabajadora: consume la cola compartida hasta pasar INACTIVIDAD_MAX_TRABAJADOR segundos sin tareas"""
+    if cola_trabajo is None:
+        print("❌ ROL_COLA=trabajador necesita COLA_TRABAJO")
+        return
+    print(f"👷 Trabajador de la cola {COLA_TRABAJO} ({socket.gethostname()})")
+    for trabajador in iniciar_trabajadores(cola_trabajo, MAX_HILOS_DETALLE * MAX_INMOBILIARIAS_PARALELAS,
+                                           threading.Event(), INACTIVIDAD_MAX_TRABAJADOR):
+        trabajador.join()
+    cola_trabajo.cerrar()
+    politicas_robots.guardar()
+    if validadores_http is not None:
+        validadores_http.guardar()
+    if etapa_parseo is not None:
+        etapa_parseo.cerrar()
+    print("✅ Trabajador sin tareas pendientes: fin")
+
 if __name__ == "__main__":
-    main()
+    if ROL_COLA == 'trabajador':
+        main_trabajador()
+    else:
+        main()
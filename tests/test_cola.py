@@ -0,0 +1,67 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scraper_historico as sh
+
+URL = 'https://inmobiliaria.example/propiedad/1'
+
+
+class TestColaSQLite(unittest.TestCase):
+    """Encolar, tomar, completar y volver a tomar cuando vence la reserva"""
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.cola = sh.ColaSQLite(os.path.join(directorio.name, 'cola.sqlite3'))
+        self.addCleanup(self.cola.cerrar)
+        self.cola.encolar({'url': URL, 'scraper': 'casasenmenorca', 'referencia': 'R1', 'condicional': True,
+                           'estado_listado': 'Reservado'})
+
+    def test_tomar_y_completar(self):
+        tarea = self.cola.tomar('t1')
+        self.assertEqual(tarea, {'url': URL, 'scraper': 'casasenmenorca', 'referencia': 'R1', 'condicional': True,
+                                 'estado_listado': 'Reservado'})
+        self.assertIsNone(self.cola.tomar('t2'))
+        self.assertEqual(self.cola.consultar(URL), ('en_curso', None))
+
+        self.cola.completar(URL, 't2', {'precio': 1})  # la reserva no es suya: no cambia nada
+        self.assertEqual(self.cola.consultar(URL), ('en_curso', None))
+        self.cola.completar(URL, 't1', {'precio': 100000})
+        self.assertEqual(self.cola.consultar(URL), ('hecha', {'precio': 100000}))
+
+        self.assertEqual(sh.FuturoCola(self.cola, URL).result(), {'precio': 100000})
+        self.assertEqual(self.cola.consultar(URL), ('fusionada', None))
+        self.assertIsNone(self.cola.tomar('t1'))
+
+    def test_reserva_vencida(self):
+        ahora = time.time()
+        with mock.patch.object(sh.time, 'time', return_value=ahora):
+            self.assertIsNotNone(self.cola.tomar('t1'))
+        with mock.patch.object(sh.time, 'time', return_value=ahora + sh.LEASE_COLA - 1):
+            self.assertIsNone(self.cola.tomar('t2'))
+        with mock.patch.object(sh.time, 'time', return_value=ahora + sh.LEASE_COLA + 1):
+            self.assertEqual(self.cola.tomar('t2')['url'], URL)
+        self.cola.completar(URL, 't1', {'precio': 1})  # el primero perdió la reserva
+        self.assertEqual(self.cola.consultar(URL), ('en_curso', None))
+        self.cola.completar(URL, 't2', {'precio': 2})
+        self.assertEqual(self.cola.consultar(URL), ('hecha', {'precio': 2}))
+
+    def test_el_futuro_despierta_con_el_resultado(self):
+        tarea = self.cola.tomar('t1')
+        hilo = threading.Timer(0.1, self.cola.completar, (tarea['url'], 't1', {'precio': 3}))
+        hilo.start()
+        self.addCleanup(hilo.join)
+        inicio = time.monotonic()
+        self.assertEqual(sh.FuturoCola(self.cola, URL).result(), {'precio': 3})
+        self.assertLess(time.monotonic() - inicio, sh.ColaTrabajo.ESPERA_SIN_AVISO)
+
+
+if __name__ == '__main__':
+    unittest.main()
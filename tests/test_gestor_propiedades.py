@@ -0,0 +1,106 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scraper_historico as sh
+
+URL = 'https://inmobiliaria.example/propiedad/123'
+
+
+class TestRecuperarDiario(unittest.TestCase):
+    """Una ejecución cortada deja sus altas en el diario: la siguiente debe tratarlas como existentes"""
+
+    def setUp(self):
+        self.directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directorio.cleanup)
+
+    def _abrir(self):
+        propiedades, diario, registro = (os.path.join(self.directorio.name, nombre)
+                                         for nombre in ('propiedades.json', 'propiedades.jsonl', 'registro.json'))
+        motor = sh.MotorJSON(propiedades, diario, registro)
+        self.addCleanup(motor.cerrar)
+        return (sh.RegistroScraping(registro, motor=motor),
+                sh.GestorPropiedades(propiedades, diario, motor=motor))
+
+    def _ejecucion_cortada(self):
+        registro, gestor = self._abrir()
+        propiedad = sh.crear_propiedad_estandar(referencia='123', precio=250000, inmobiliaria='Ejemplo',
+                                                url_detalle=URL)
+        gestor.agregar_propiedad(propiedad)
+        registro.registrar_url_escaneada(URL, propiedad['precio'], propiedad['estado'], 'Ejemplo')
+        # Sin finalizar_y_guardar: solo queda lo anotado en los diarios
+        gestor.motor.cerrar()
+
+    def test_alta_recuperada_es_existente(self):
+        self._ejecucion_cortada()
+        _, gestor = self._abrir()
+        self.assertIn(URL, gestor.obtener_urls_existentes())
+        self.assertEqual(gestor.obtener_propiedad(URL)['referencia'], '123')
+        self.assertEqual(gestor.propiedades_procesadas, [])
+
+    def test_alta_recuperada_no_se_vuelve_a_descargar(self):
+        self._ejecucion_cortada()
+        registro, gestor = self._abrir()
+        # Sin red: lo que se mandara a descargar queda apuntado
+        with mock.patch.object(sh, 'descargar_detalle', return_value=None) as descargar:
+            nuevas = sh.scraper_eficiente_website(lambda url, referencia: None, 'Ejemplo', registro, gestor,
+                                                  lambda: [('123', URL)])
+        self.assertEqual(nuevas, [])
+        descargar.assert_not_called()
+        self.assertEqual(gestor.finalizar_y_guardar(), 1)
+
+
+
+class TestOrdenInmobiliarias(unittest.TestCase):
+    """Las inmobiliarias anotan en paralelo; el catálogo y el registro se compactan en el orden de la lista"""
+
+    def setUp(self):
+        self.directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directorio.cleanup)
+        propiedades, diario, registro = (os.path.join(self.directorio.name, nombre)
+                                         for nombre in ('propiedades.json', 'propiedades.jsonl', 'registro.json'))
+        self.motor = sh.MotorJSON(propiedades, diario, registro)
+        self.addCleanup(self.motor.cerrar)
+        self.registro = sh.RegistroScraping(registro, motor=self.motor)
+        self.gestor = sh.GestorPropiedades(propiedades, diario, motor=self.motor)
+
+    def _alta(self, url, inmobiliaria, orden):
+        propiedad = sh.crear_propiedad_estandar(url_detalle=url, inmobiliaria=inmobiliaria)
+        self.gestor.agregar_propiedad(propiedad, orden)
+        self.registro.registrar_url_escaneada(url, None, '', inmobiliaria, orden=orden)
+
+    def test_se_compacta_en_el_orden_de_la_lista(self):
+        # La segunda inmobiliaria termina antes; lo que no lleva orden (listados de main) va al final
+        self._alta('https://b.example/1', 'B', 1)
+        self._alta('https://a.example/1', 'A', 0)
+        self._alta('https://b.example/2', 'B', 1)
+        self._alta('https://c.example/1', 'C', None)
+        self._alta('https://a.example/2', 'A', 0)
+        esperado = ['https://a.example/1', 'https://a.example/2', 'https://b.example/1', 'https://b.example/2',
+                    'https://c.example/1']
+
+        self.gestor.finalizar_y_guardar()
+        self.registro.guardar_registro(compactar=True)
+        self.assertEqual([p['url_detalle'] for p in self.motor.cargar_propiedades()], esperado)
+        self.assertEqual(list(self.motor.cargar_registro()['urls_escaneadas']), esperado)
+
+    def test_el_diario_se_escribe_al_momento(self):
+        self._alta('https://b.example/1', 'B', 1)
+        entradas = self.motor.cambios_propiedades()
+        self.assertEqual([(e['op'], e['orden']) for e in entradas], [('alta', 1)])
+        self.assertEqual([e['orden'] for e in self.motor.cambios_registro()], [1])
+
+    def test_altas_recuperadas_en_el_orden_de_la_lista(self):
+        self._alta('https://b.example/1', 'B', 1)
+        self._alta('https://a.example/1', 'A', 0)
+        gestor = sh.GestorPropiedades(self.motor.archivo_propiedades, self.gestor.archivo_temp, motor=self.motor)
+        self.assertEqual([p['url_detalle'] for p in gestor.propiedades_actuales],
+                         ['https://a.example/1', 'https://b.example/1'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scraper_historico as sh
+
+A = 'https://a.example/venta'
+B = 'https://b.example/venta'
+
+
+class RelojFalso:
+    """time.monotonic que solo avanza cuando el test lo pide; las esperas se anotan en vez de dormir"""
+
+    def __init__(self):
+        self.ahora = 1000.0
+        self.esperas = []
+
+    def monotonic(self):
+        return self.ahora
+
+    def sleep(self, segundos):
+        self.esperas.append(round(segundos, 6))
+
+
+class TestLimitadorTasa(unittest.TestCase):
+    """Token bucket por host: ráfaga inicial, luego el ritmo de la tasa"""
+
+    def setUp(self):
+        self.reloj = RelojFalso()
+        for nombre in ('monotonic', 'sleep'):
+            parche = mock.patch.object(sh.time, nombre, getattr(self.reloj, nombre))
+            parche.start()
+            self.addCleanup(parche.stop)
+        self.limitador = sh.LimitadorTasa(tasa=2.0, rafaga=3, limites={'b.example': (1.0, 1)})
+
+    def test_rafaga_y_tasa(self):
+        for _ in range(3):
+            self.limitador.esperar(A)
+        self.assertEqual(self.reloj.esperas, [])
+        self.limitador.esperar(A)
+        self.limitador.esperar(A)
+        self.assertEqual(self.reloj.esperas, [0.5, 1.0])
+
+    def test_la_rafaga_no_se_acumula(self):
+        self.reloj.ahora += 60
+        for _ in range(3):
+            self.limitador.esperar(A)
+        self.limitador.esperar(A)
+        self.assertEqual(self.reloj.esperas, [0.5])
+
+    def test_los_hosts_no_se_frenan_entre_si(self):
+        for _ in range(5):
+            self.limitador.esperar(A)
+        self.limitador.esperar(B)
+        self.assertEqual(self.reloj.esperas, [0.5, 1.0])
+        self.limitador.esperar(B)
+        self.assertEqual(self.reloj.esperas, [0.5, 1.0, 1.0])
+
+    def test_backoff_y_retry_after(self):
+        for _ in range(3):
+            self.limitador.esperar(A)
+        self.limitador.registrar_respuesta(A, 429, '7')
+        self.limitador.esperar(A)
+        self.assertEqual(self.reloj.esperas, [7.0])
+        self.reloj.ahora += 8
+        self.limitador.esperar(A)  # pasado el Retry-After el cubo vuelve a estar lleno
+        self.assertEqual(self.reloj.esperas, [7.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
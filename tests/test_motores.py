@@ -0,0 +1,115 @@
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scraper_historico as sh
+
+A, B, C = ('https://inmobiliaria.example/propiedad/%d' % i for i in (1, 2, 3))
+
+
+class FechaFija(sh.datetime):
+    """datetime.now() fijo: las fechas de las dos ejecuciones deben coincidir entre motores"""
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls(2026, 1, 15, 12, 0, 0)
+
+
+class TestMotorSQLite(unittest.TestCase):
+    """El motor SQLite guarda y recupera lo mismo que el motor JSON"""
+
+    def setUp(self):
+        self.directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directorio.cleanup)
+        parche = mock.patch.object(sh, 'datetime', FechaFija)
+        parche.start()
+        self.addCleanup(parche.stop)
+
+    def _rutas(self, nombre):
+        carpeta = os.path.join(self.directorio.name, nombre)
+        os.makedirs(carpeta, exist_ok=True)
+        return {clave: os.path.join(carpeta, archivo) for clave, archivo in (
+            ('propiedades', 'propiedades.json'), ('diario', 'propiedades.jsonl'),
+            ('registro', 'registro.json'), ('bd', os.path.join('local', 'scraper.sqlite3')))}
+
+    def _motor(self, tipo, rutas):
+        if tipo == 'sqlite':
+            return sh.MotorSQLite(rutas['bd'], rutas['propiedades'], rutas['registro'])
+        return sh.MotorJSON(rutas['propiedades'], rutas['diario'], rutas['registro'])
+
+    def _abrir(self, tipo, rutas):
+        motor = self._motor(tipo, rutas)
+        return (motor, sh.RegistroScraping(rutas['registro'], motor=motor),
+                sh.GestorPropiedades(rutas['propiedades'], rutas['diario'], motor=motor))
+
+    def _alta(self, registro, gestor, url, precio, orden):
+        propiedad = sh.crear_propiedad_estandar(url_detalle=url, referencia=url[-1], precio=precio,
+                                                inmobiliaria='Ejemplo')
+        gestor.agregar_propiedad(propiedad, orden)
+        registro.registrar_url_escaneada(url, precio, propiedad['estado'], 'Ejemplo', orden=orden)
+
+    def _cerrar(self, motor, registro, gestor):
+        registro.actualizar_estadisticas(1)
+        gestor.finalizar_y_guardar()
+        registro.guardar_registro(compactar=True)
+        motor.cerrar()
+
+    def _ejecutar(self, tipo):
+        """Dos ejecuciones (altas; luego cambio de precio, baja y otra alta) y lo que queda al volver a abrir"""
+        rutas = self._rutas(tipo)
+        motor, registro, gestor = self._abrir(tipo, rutas)
+        self._alta(registro, gestor, B, 200000, 1)
+        self._alta(registro, gestor, A, 100000, 0)
+        self._cerrar(motor, registro, gestor)
+
+        motor, registro, gestor = self._abrir(tipo, rutas)
+        gestor.actualizar_propiedad_existente(A, sh.crear_propiedad_estandar(
+            url_detalle=A, referencia='1', precio=95000, inmobiliaria='Ejemplo'))
+        registro.registrar_url_escaneada(A, 95000, '', 'Ejemplo', orden=0)
+        registro.marcar_urls_eliminadas({B}, orden=1)
+        gestor.marcar_propiedades_eliminadas({B})
+        self._alta(registro, gestor, C, 300000, 1)
+        self._cerrar(motor, registro, gestor)
+
+        motor, registro, gestor = self._abrir(tipo, rutas)
+        self.addCleanup(motor.cerrar)
+        with open(rutas['propiedades'], encoding='utf-8') as f, open(rutas['registro'], encoding='utf-8') as g:
+            exportado = (json.load(f), json.load(g))
+        return gestor.propiedades_actuales, registro.registro, exportado
+
+    def test_ida_y_vuelta_igual_que_json(self):
+        propiedades, registro, exportado = self._ejecutar('sqlite')
+        esperado_propiedades, esperado_registro, esperado_exportado = self._ejecutar('json')
+        self.assertEqual(propiedades, esperado_propiedades)
+        self.assertEqual(registro, esperado_registro)
+        self.assertEqual(exportado, esperado_exportado)
+        self.assertEqual([p['url_detalle'] for p in propiedades], [A, B, C])
+        self.assertEqual(propiedades[0]['precio'], 95000)
+        self.assertEqual(propiedades[1]['estado'], 'ELIMINADO_WEB')
+        self.assertEqual(list(registro['urls_eliminadas']), [B])
+
+    def test_los_cambios_se_confirman_en_el_checkpoint(self):
+        rutas = self._rutas('checkpoint')
+        motor, registro, _ = self._abrir('sqlite', rutas)
+        self.addCleanup(motor.cerrar)
+        otra = sqlite3.connect(rutas['bd'])
+        self.addCleanup(otra.close)
+
+        def escaneadas():
+            return otra.execute('SELECT COUNT(*) FROM urls_escaneadas').fetchone()[0]
+
+        registro.registrar_url_escaneada(A, 1, '', 'Ejemplo')
+        registro.registrar_url_escaneada(B, 2, '', 'Ejemplo')
+        self.assertEqual(escaneadas(), 0)
+        registro.guardar_registro()
+        self.assertEqual(escaneadas(), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,26 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scraper_historico as sh
+
+
+class TestNumeroLimpio(unittest.TestCase):
+    """numero_limpio quita unidades y separadores de miles sin tocar las cifras"""
+
+    def test_cifras_acabadas_en_2(self):
+        for texto, esperado in (('2', 2), ('12', 12), ('350.002 €', 350002), ('182 m2', 182), ('92 m²', 92)):
+            with self.subTest(texto=texto):
+                self.assertEqual(sh.numero_limpio(texto), esperado)
+
+    def test_formatos(self):
+        for texto, esperado in (('1.010.000 €', 1010000), ('181\xa0m2', 181), ('2,5', 2), ('3,5', 4),
+                                ('', None), (None, None), ('consultar', None)):
+            with self.subTest(texto=texto):
+                self.assertEqual(sh.numero_limpio(texto), esperado)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import sys
+import unittest
+from unittest import mock
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scraper_historico as sh
+
+LISTADO = 'https://inmobiliaria.example/venta?pag={}'
+
+
+def _respuesta(html):
+    r = requests.Response()
+    r.status_code = 200
+    r._content = html.encode()
+    r.encoding = 'utf-8'
+    return r
+
+
+def _pagina(nump, fichas=2):
+    enlaces = ''.join(f'<a class="ficha" href="/propiedad/{nump}-{i}">{i}</a>' for i in range(fichas))
+    return f'<html><body>{enlaces}</body></html>'
+
+
+def _extraer(soup, url_listado):
+    return [(None, a['href']) for a in soup.select('a.ficha')]
+
+
+class TestRecorrerPaginacion(unittest.TestCase):
+    """Sin total anunciado el listado se pide por tandas y se corta en la primera página vacía o con error"""
+
+    def _recorrer(self, paginas):
+        """paginas: {número: html o excepción}; las que no están dan 404"""
+        def get(url):
+            contenido = paginas.get(int(url.rsplit('=', 1)[1]))
+            if isinstance(contenido, Exception):
+                raise contenido
+            if contenido is None:
+                r = _respuesta('')
+                r.status_code = 404
+                return r
+            return _respuesta(contenido)
+
+        with mock.patch.object(sh.cliente_http, 'get', side_effect=get):
+            return [url for _, url in sh.recorrer_paginacion(LISTADO, 'pag', _extraer, 10)]
+
+    def _fichas(self, *paginas):
+        return [f'/propiedad/{nump}-{i}' for nump in paginas for i in range(2)]
+
+    def test_para_en_la_pagina_vacia(self):
+        paginas = {1: _pagina(1), 2: _pagina(2), 3: _pagina(3), 4: _pagina(4, fichas=0), 5: _pagina(5)}
+        self.assertEqual(self._recorrer(paginas), self._fichas(1, 2, 3))
+
+    def test_para_en_la_pagina_repetida(self):
+        paginas = {1: _pagina(1), 2: _pagina(2), 3: _pagina(2), 4: _pagina(4)}
+        self.assertEqual(self._recorrer(paginas), self._fichas(1, 2))
+
+    def test_para_en_el_error(self):
+        paginas = {1: _pagina(1), 2: _pagina(2), 3: requests.ConnectionError('caída'), 4: _pagina(4)}
+        self.assertEqual(self._recorrer(paginas), self._fichas(1, 2))
+        self.assertEqual(self._recorrer({1: _pagina(1), 2: _pagina(2)}), self._fichas(1, 2))  # 404 en la 3
+
+    def test_error_en_la_primera(self):
+        self.assertEqual(self._recorrer({1: requests.Timeout('lenta'), 2: _pagina(2)}), [])
+
+    def test_total_anunciado(self):
+        primera = _pagina(1).replace('</body>', '<a href="?pag=2">2</a><a href="?pag=3">3</a></body>')
+        paginas = {1: primera, 2: _pagina(2), 3: _pagina(3), 4: _pagina(4, fichas=0)}
+        self.assertEqual(self._recorrer(paginas), self._fichas(1, 2, 3))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scraper_historico as sh
+
+
+class TestFiltroLastmod(unittest.TestCase):
+    """El corte de 2 años solo descarta lastmod con fecha, hora y zona; el resto se conserva"""
+
+    def _filtrar(self, lastmod):
+        url = 'https://inmobiliaria.example/propiedad/1'
+        with mock.patch.object(sh, 'leer_sitemap', return_value=iter([(url, lastmod)])):
+            return sh.obtener_urls_pisos_de_subsitemap('https://inmobiliaria.example/sitemap.xml', ['/propiedad/'])
+
+    def test_antigua_con_zona_se_descarta(self):
+        self.assertEqual(self._filtrar('2015-03-01T10:00:00+00:00'), [])
+
+    def test_reciente_con_zona_se_conserva(self):
+        self.assertEqual(len(self._filtrar(sh.datetime.now().strftime('%Y-%m-%dT%H:%M:%S+0000'))), 1)
+
+    def test_formatos_sin_hora_o_sin_zona_se_conservan(self):
+        for lastmod in ('2015-03-01', '2015-03-01T10:00:00', None):
+            with self.subTest(lastmod=lastmod):
+                self.assertEqual(len(self._filtrar(lastmod)), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import os
+import pickle
+import sys
+import unittest
+from unittest import mock
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scraper_historico as sh
+
+FICHA_MENORCASA = """<html><body><header>Vendida</header>
+<div class="rh_property__id"><span class="id"> MC-77 </span></div>
+<h1 class="rh_page__title">Villa con piscina</h1>
+<div class="rh_page__property_price"><span class="price">€1.500.000</span></div>
+<span class="rh_label__wrap">Exclusiva</span>
+<div id="breadcrumbs"><a>Inicio</a><a>Propiedades</a><a>Ciutadella</a><a>Ciutadella</a></div>
+<div class="prop_bedrooms"><span class="figure">5</span></div>
+<div class="prop_area"><span class="figure">350 m²</span></div>
+<a class="slider-img" href="/s/1.jpg"></a><a class="slider-img" href="/s/2.jpg"></a>
+</body></html>"""
+
+
+def _respuesta(html):
+    r = requests.Response()
+    r.status_code = 200
+    r._content = html.encode()
+    r.encoding = 'utf-8'
+    return r
+
+
+class TestSitiosDeclarativos(unittest.TestCase):
+    """Los sitios de SITIOS viajan por su clave y comparten el recorrido de extracción"""
+
+    def test_viajan_por_su_clave(self):
+        for clave, sitio in sh.SITIOS.items():
+            with self.subTest(clave=clave):
+                self.assertEqual(sh.nombre_scraper(sitio), clave)
+                self.assertIs(sh.scraper_por_nombre(clave), sitio)
+                self.assertIs(pickle.loads(pickle.dumps(sitio)), sitio)
+        self.assertIs(sh.scraper_por_nombre(sh.nombre_scraper(sh.scrape_artrutx_detalle)), sh.scrape_artrutx_detalle)
+        with self.assertRaises(ValueError):
+            sh.scraper_por_nombre('main')
+
+    def test_ficha_por_selectores(self):
+        with mock.patch.object(sh.cliente_http, 'get', return_value=_respuesta(FICHA_MENORCASA)):
+            data = sh.SITIOS['menorcasa']('https://menorcasa.com/es/property/villa/', None)
+        self.assertEqual(data['referencia'], 'MC-77')
+        self.assertEqual(data['precio'], 1500000)
+        self.assertEqual(data['estado'], 'EXCLUSIVA')
+        self.assertFalse(data['vendido'])
+        self.assertEqual((data['habitaciones'], data['metros'], data['banos']), (5, 350, None))
+        self.assertEqual(data['galeria'], ['/s/1.jpg', '/s/2.jpg'])
+        self.assertTrue(data['piscina'])
+        self.assertEqual(data['inmobiliaria'], 'Menorcasa')
+
+    def test_especificacion_incompleta(self):
+        espec = dict(sh.SITIOS_SELECTORES['menorcasa'])
+        del espec['galeria']
+        with self.assertRaises(ValueError):
+            sh.SitioSelectores('prueba', espec)
+
+
+if __name__ == '__main__':
+    unittest.main()